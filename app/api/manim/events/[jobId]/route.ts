@@ -0,0 +1,35 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { isJobId } from '@/lib/manim-status'
+
+// Server-sent status events, relayed from the worker's job service
+// (scripts/manim_worker/job_service.py) when MANIM_SERVICE_URL points at it.
+// Without the service this answers 501 and clients poll /api/manim/status/<jobId>.
+export async function GET(req: NextRequest, { params }: { params: { jobId: string } }) {
+  const service = process.env.MANIM_SERVICE_URL
+  if (!service) {
+    return NextResponse.json({ error: 'Job service not configured' }, { status: 501 })
+  }
+  try {
+    const { jobId } = params
+    if (!isJobId(jobId)) {
+      return NextResponse.json({ error: 'Job not found' }, { status: 404 })
+    }
+    const upstream = await fetch(`${service.replace(/\/$/, '')}/jobs/${jobId}/events`, {
+      headers: { 'Last-Event-ID': req.headers.get('last-event-id') ?? '' },
+      signal: req.signal,
+      cache: 'no-store',
+    })
+    if (!upstream.ok || !upstream.body) {
+      return NextResponse.json(
+        { error: upstream.status === 404 ? 'Job not found' : 'Job service error' },
+        { status: upstream.status === 404 ? 404 : 502 }
+      )
+    }
+    return new Response(upstream.body, {
+      headers: { 'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache, no-transform' },
+    })
+  } catch (err) {
+    console.error('Manim events error:', err)
+    return NextResponse.json({ error: 'Server error' }, { status: 502 })
+  }
+}
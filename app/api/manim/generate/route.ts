@@ -1,12 +1,16 @@
 import { NextRequest, NextResponse } from "next/server"
 import fs from "fs"
+import crypto from "crypto"
 import path from "path"
 import OpenAI from "openai"
+import { writeFileAtomic, writeJobStatus } from "@/lib/manim-status"
+import presets from "@/lib/manim-presets.json"
 
 const JOB_DIR = path.join(process.cwd(), "manim_jobs")
+const QUEUED_DIR = path.join(JOB_DIR, "queue", "queued")
 
 function ensureJobDir() {
-  if (!fs.existsSync(JOB_DIR)) fs.mkdirSync(JOB_DIR, { recursive: true })
+  if (!fs.existsSync(QUEUED_DIR)) fs.mkdirSync(QUEUED_DIR, { recursive: true })
 }
 
 // Simple in-memory rate limiter: maps key -> array of timestamps (ms)
@@ -32,6 +36,15 @@ function isRateLimited(key: string) {
   return filtered.length > RATE_LIMIT_MAX
 }
 
+// "high" (e.g. a teacher's live demo) needs the x-manim-priority-key header to match
+// MANIM_PRIORITY_KEY; anyone may ask for "low".
+function jobPriority(request: NextRequest, requested?: string) {
+  const key = process.env.MANIM_PRIORITY_KEY
+  if (requested === "high" && key && request.headers.get("x-manim-priority-key") === key) return "high"
+  if (requested === "low") return "low"
+  return "normal"
+}
+
 function sanitizePrompt(prompt: string) {
   const lowered = prompt.toLowerCase()
 
@@ -73,83 +86,8 @@ function getOpenAIClient() {
 }
 
 // Preset scene specifications to use when prompt matches common topics.
-const PRESETS: Record<string, any> = {
-  dfa: {
-    sceneType: "dfa",
-    title: "DFA for strings ending with 01",
-    params: {
-      nodes: [
-        { id: "q0", label: "q0", start: true },
-        { id: "q1", label: "q1" },
-        { id: "q2", label: "q2", accept: true }
-      ],
-      edges: [
-        { from: "q0", to: "q1", label: "0" },
-        { from: "q0", to: "q0", label: "1" },
-        { from: "q1", to: "q1", label: "0" },
-        { from: "q1", to: "q2", label: "1" },
-        { from: "q2", to: "q1", label: "0" },
-        { from: "q2", to: "q0", label: "1" }
-      ]
-    }
-  },
-  pythagoras: {
-    sceneType: "triangle",
-    title: "Pythagoras Theorem",
-    params: {
-      labels: { a: "a", b: "b", c: "c" },
-      showRightAngle: true
-    }
-  },
-  dbaas: {
-    sceneType: "diagram",
-    title: "DBaaS Architecture",
-    params: {
-      nodes: [
-        { id: "client", label: "Client" },
-        { id: "app", label: "Application" },
-        { id: "db", label: "DBaaS Provider" }
-      ],
-      edges: [
-        { from: "client", to: "app", label: "Uses API" },
-        { from: "app", to: "db", label: "Managed DB Calls" },
-        { from: "db", to: "app", label: "Responses" }
-      ]
-    }
-  },
-  dbms: {
-    sceneType: "diagram",
-    title: "DBMS Components",
-    params: {
-      nodes: [
-        { id: "user", label: "User" },
-        { id: "dbms", label: "DBMS" },
-        { id: "storage", label: "Storage Engine" }
-      ],
-      edges: [
-        { from: "user", to: "dbms", label: "Queries" },
-        { from: "dbms", to: "storage", label: "Reads/Writes" }
-      ]
-    }
-  },
-  clientServer: {
-    sceneType: "diagram",
-    title: "Client-Server Architecture",
-    params: {
-      nodes: [
-        { id: "client", label: "Client" },
-        { id: "server", label: "Server" },
-        { id: "db", label: "Database" }
-      ],
-      edges: [
-        { from: "client", to: "server", label: "HTTP Request" },
-        { from: "server", to: "client", label: "HTTP Response" },
-        { from: "server", to: "db", label: "Query" },
-        { from: "db", to: "server", label: "Result" }
-      ]
-    }
-  }
-}
+// Shared with the worker, which pre-renders them (scripts/manim_worker/README.md)
+const PRESETS: Record<string, any> = presets
 
 function matchPreset(prompt: string) {
   const p = (prompt || "").toLowerCase()
@@ -460,7 +398,7 @@ export async function POST(request: NextRequest) {
     }
 
     const body = await request.json()
-    const { prompt, quality } = body as { prompt?: string; quality?: string }
+    const { prompt, quality, priority } = body as { prompt?: string; quality?: string; priority?: string }
 
     if (!prompt || typeof prompt !== "string") {
       return NextResponse.json({ error: "Missing prompt" }, { status: 400 })
@@ -505,10 +443,25 @@ export async function POST(request: NextRequest) {
       status: "queued",
       createdAt: new Date().toISOString(),
       sceneParams: sceneSpec,
+      // Workers share slots round-robin between users, keyed like the rate limit (hashed, not the raw address)
+      userKey: crypto.createHash("sha256").update(clientKey).digest("hex").slice(0, 16),
+      priority: jobPriority(request, priority),
     }
 
+    // Index the job so workers find it without rescanning every job file;
+    // the marker carries what the worker's scheduler orders by. It is written
+    // under a hidden name before the job JSON and renamed into place after,
+    // so no worker claims the job before it can read it or adopts the JSON
+    // as an unmarked job in between
+    const hiddenMarker = path.join(QUEUED_DIR, `.${jobId}`)
+    fs.writeFileSync(
+      hiddenMarker,
+      JSON.stringify({ user: job.userKey, priority: job.priority, createdAt: job.createdAt })
+    )
     const jobPath = path.join(JOB_DIR, `${jobId}.json`)
-    fs.writeFileSync(jobPath, JSON.stringify(job, null, 2))
+    writeFileAtomic(jobPath, JSON.stringify(job, null, 2))
+    writeJobStatus(job)
+    fs.renameSync(hiddenMarker, path.join(QUEUED_DIR, jobId))
 
     return NextResponse.json(
       {
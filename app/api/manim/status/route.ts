@@ -0,0 +1,30 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { readJobStatus } from '@/lib/manim-status'
+
+const MAX_IDS = 100
+
+// Batched status lookup for dashboards: GET /api/manim/status?ids=manim-1,manim-2
+// Returns { jobs: { [jobId]: status | null } }, null for unknown jobs
+export async function GET(req: NextRequest) {
+  try {
+    const ids = (req.nextUrl.searchParams.get('ids') ?? '')
+      .split(',')
+      .map((id) => id.trim())
+      .filter(Boolean)
+    if (ids.length === 0) {
+      return NextResponse.json({ error: 'Missing ids' }, { status: 400 })
+    }
+    if (ids.length > MAX_IDS) {
+      return NextResponse.json({ error: `At most ${MAX_IDS} ids per request` }, { status: 400 })
+    }
+
+    const jobs: Record<string, unknown> = {}
+    for (const id of ids) {
+      jobs[id] = readJobStatus(id)
+    }
+    return NextResponse.json({ jobs })
+  } catch (err) {
+    console.error('Manim status error:', err)
+    return NextResponse.json({ error: 'Server error' }, { status: 500 })
+  }
+}
@@ -16,13 +16,44 @@ import { Textarea } from './textarea'
 import { Input } from './input'
 import { Spinner } from './spinner'
 
+// Written by the worker while Manim runs (scripts/manim_worker/progress.py)
+type RenderProgress = {
+  stage: string
+  animation: number
+  of: number
+  pct: number
+  etaSeconds?: number
+}
+
+function progressText(progress?: RenderProgress) {
+  if (!progress) return null
+  const stage = progress.stage === 'preview_render' ? 'Rendering preview' : 'Rendering'
+  const eta = progress.etaSeconds != null ? `, about ${Math.max(1, Math.round(progress.etaSeconds))}s left` : ''
+  return `${stage}: animation ${progress.animation} of ${progress.of} (${progress.pct}%)${eta}`
+}
+
 export default function ManimPromptModal() {
   const [open, setOpen] = useState(false)
   const [prompt, setPrompt] = useState('')
   const [quality, setQuality] = useState('low')
   const [loading, setLoading] = useState(false)
-  const [result, setResult] = useState<null | { jobId?: string; url?: string; message?: string; status?: string }>(null)
+  const [result, setResult] = useState<null | {
+    jobId?: string
+    url?: string
+    resultUrl?: string
+    previewUrl?: string
+    playlistUrl?: string
+    message?: string
+    status?: string
+    progress?: RenderProgress
+  }>(null)
   const [polling, setPolling] = useState(false)
+  // HLS playlists only play where the browser supports them natively (Safari, iOS, recent Chrome).
+  const [canPlayHls, setCanPlayHls] = useState(false)
+
+  React.useEffect(() => {
+    setCanPlayHls(document.createElement('video').canPlayType('application/vnd.apple.mpegurl') !== '')
+  }, [])
 
   async function handleSubmit(e?: React.FormEvent) {
     e?.preventDefault()
@@ -49,28 +80,51 @@ export default function ManimPromptModal() {
   React.useEffect(() => {
     if (!polling || !result?.jobId) return
     let cancelled = false
+    let finished = false
+    let interval: ReturnType<typeof setInterval> | undefined
     const jobId = result.jobId
-    const interval = setInterval(async () => {
-      try {
-        const res = await fetch(`/api/manim/status/${jobId}`)
-        if (!res.ok) return
-        const data = await res.json()
-        if (cancelled) return
-        setResult((r) => ({ ...(r ?? {}), ...data }))
-        if (data.status === 'completed' || data.status === 'failed') {
-          setPolling(false)
-        }
-      } catch (e) {
-        // ignore transient errors
+
+    function update(data: any) {
+      if (cancelled) return
+      setResult((r) => ({ ...(r ?? {}), ...data }))
+      if (data.status === 'completed' || data.status === 'failed') {
+        finished = true
+        setPolling(false)
       }
-    }, 3000)
+    }
+
+    function poll() {
+      interval = setInterval(async () => {
+        try {
+          const res = await fetch(`/api/manim/status/${jobId}`)
+          if (!res.ok) return
+          update(await res.json())
+        } catch (e) {
+          // ignore transient errors
+        }
+      }, 3000)
+    }
+
+    // Pushed by the job service when it runs (scripts/manim_worker/README.md); otherwise poll
+    const events = new EventSource(`/api/manim/events/${jobId}`)
+    events.addEventListener('status', (e) => update(JSON.parse((e as MessageEvent).data)))
+    events.onerror = () => {
+      events.close()
+      if (!finished && !cancelled && !interval) poll()
+    }
 
     return () => {
       cancelled = true
-      clearInterval(interval)
+      events.close()
+      if (interval) clearInterval(interval)
     }
   }, [polling, result?.jobId])
 
+  const videoUrl =
+    result && (result.resultUrl ?? result.previewUrl ?? (canPlayHls ? result.playlistUrl : undefined) ?? result.url)
+  const progress =
+    result && result.status !== 'completed' && result.status !== 'failed' ? progressText(result.progress) : null
+
   return (
     <Dialog open={open} onOpenChange={setOpen}>
       <DialogTrigger asChild>
@@ -131,11 +185,22 @@ export default function ManimPromptModal() {
 
         {result && (
           <div className="mt-4">
-            {result.url ? (
-              <video controls src={result.url} className="w-full rounded-md" />
+            {videoUrl ? (
+              <div className="grid gap-1">
+                {/* The stream and the preview play while rendering; each is replaced once something better lands */}
+                <video key={videoUrl} controls src={videoUrl} className="w-full rounded-md" />
+                {!result.resultUrl && result.previewUrl && (
+                  <div className="text-sm text-muted-foreground">Preview — rendering full quality…</div>
+                )}
+                {!result.resultUrl && !result.previewUrl && videoUrl === result.playlistUrl && (
+                  <div className="text-sm text-muted-foreground">Streaming — still rendering…</div>
+                )}
+                {progress && <div className="text-sm text-muted-foreground">{progress}</div>}
+              </div>
             ) : (
               <div className="rounded-md border p-3">
                 <strong>Status:</strong> {result.message ?? 'Queued'}
+                {progress && <div className="text-sm text-muted-foreground">{progress}</div>}
                 {result.jobId && (
                   <div className="text-sm text-muted-foreground">Job: {result.jobId}</div>
                 )}
@@ -0,0 +1,56 @@
+/**
+ * Manim job status records
+ *
+ * The worker keeps a compact record per job in manim_jobs/status/<jobId>.json
+ * (status, progress and result URLs only; see STATUS_FIELDS in
+ * scripts/manim_worker/job_queue.py) and replaces it atomically, so polls
+ * never parse the full job spec or see a half-written file.
+ */
+
+import fs from "fs"
+import path from "path"
+
+const JOB_DIR = path.join(process.cwd(), "manim_jobs")
+const STATUS_DIR = path.join(JOB_DIR, "status")
+const JOB_ID = /^[A-Za-z0-9_-]{1,100}$/
+
+const STATUS_FIELDS = [
+  "jobId", "status", "progress", "resultUrl", "previewUrl", "playlistUrl", "error", "failureReason",
+  "renderQuality", "cacheHit", "coalescedWith", "attempts", "retryAt", "deadLetter", "createdAt", "processedAt",
+]
+
+export type ManimJobStatus = Record<string, unknown>
+
+export function isJobId(jobId: string) {
+  return JOB_ID.test(jobId)
+}
+
+export function statusRecord(job: Record<string, unknown>): ManimJobStatus {
+  return Object.fromEntries(STATUS_FIELDS.filter((k) => k in job).map((k) => [k, job[k]]))
+}
+
+// Write via a temporary file and rename, so readers never see a partial file
+export function writeFileAtomic(file: string, data: string) {
+  const tmp = path.join(path.dirname(file), `.${path.basename(file)}.${process.pid}.tmp`)
+  fs.writeFileSync(tmp, data)
+  fs.renameSync(tmp, file)
+}
+
+export function writeJobStatus(job: Record<string, unknown>) {
+  fs.mkdirSync(STATUS_DIR, { recursive: true })
+  writeFileAtomic(path.join(STATUS_DIR, `${job.jobId}.json`), JSON.stringify(statusRecord(job)))
+}
+
+export function readJobStatus(jobId: string): ManimJobStatus | null {
+  if (!isJobId(jobId)) return null
+  try {
+    return JSON.parse(fs.readFileSync(path.join(STATUS_DIR, `${jobId}.json`), "utf8"))
+  } catch {
+    // No record yet (job from an older build): fall back to the full job file
+  }
+  try {
+    return statusRecord(JSON.parse(fs.readFileSync(path.join(JOB_DIR, `${jobId}.json`), "utf8")))
+  } catch {
+    return null
+  }
+}
@@ -0,0 +1,84 @@
+"""
+Compare throughput of one manim invocation per job with batched rendering.
+
+Usage:
+  python bench_batch.py [--depths 1,10,100] [--batch 10] [--quality low]
+
+For each queue depth N, renders N distinct jobs (the sample scenes from
+bench_renderer.py with numbered titles, so nothing is shared by accident)
+once with a `manim` CLI run per job and once in batches of `--batch` scenes
+per run, and prints jobs per minute for both. Uses scratch directories for
+the work and the media cache. Requires manim.
+"""
+
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import media_cache
+import render_worker
+from bench_renderer import SAMPLE_SCENES
+
+
+def make_jobs(depth):
+    names = list(SAMPLE_SCENES)
+    jobs = []
+    for i in range(depth):
+        spec = dict(SAMPLE_SCENES[names[i % len(names)]])
+        spec["title"] = f"{spec['title']} {i}"
+        jobs.append((f"bench-{i}", spec))
+    return jobs
+
+
+def per_job(jobs, tier, tmp: Path):
+    start = time.perf_counter()
+    for job_id, spec in jobs:
+        workdir = tmp / job_id
+        workdir.mkdir()
+        render_worker.run_manim(workdir, render_worker.scene_spec("Benchmark", spec), tier, workdir / "out.mp4")
+    return time.perf_counter() - start
+
+
+def batched(jobs, tier, batch, tmp: Path):
+    start = time.perf_counter()
+    for i in range(0, len(jobs), batch):
+        workdir = tmp / f"batch-{i}"
+        workdir.mkdir()
+        specs = {
+            render_worker.batch_scene_name(job_id): render_worker.scene_spec("Benchmark", spec)
+            for job_id, spec in jobs[i:i + batch]
+        }
+        outputs, error = render_worker.run_manim_batch(workdir, specs, tier)
+        if error is not None or len(outputs) != len(specs):
+            raise SystemExit(f"batch render failed: {error}")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched rendering benchmark")
+    parser.add_argument("--depths", default="1,10,100")
+    parser.add_argument("--batch", type=int, default=10)
+    parser.add_argument("--quality", default="low")
+    args = parser.parse_args()
+
+    tier = render_worker.resolve_quality(args.quality)
+    tmp = Path(tempfile.mkdtemp(prefix="manim-batch-bench-"))
+    media_cache.SHARED_DIR = tmp / "media"
+    media_cache.SLOTS_DIR = tmp / "media-slots"
+    try:
+        print(f"{'depth':>6}  {'per-job jobs/min':>16}  {'batched jobs/min':>16}  {'speedup':>7}")
+        for depth in (int(d) for d in args.depths.split(",")):
+            jobs = make_jobs(depth)
+            (tmp / f"single-{depth}").mkdir()
+            (tmp / f"batched-{depth}").mkdir()
+            single = per_job(jobs, tier, tmp / f"single-{depth}")
+            batch = batched(jobs, tier, args.batch, tmp / f"batched-{depth}")
+            print(f"{depth:>6}  {60 * depth / single:>16.1f}  {60 * depth / batch:>16.1f}  {single / batch:>6.2f}x")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Measure what grouped scene composition (MANIM_COMPOSE=grouped) saves.
+
+Usage:
+  python bench_compose.py            # partial movie files per scene, counted without rendering
+  python bench_compose.py --render   # also render both variants and time them (needs manim)
+
+Manim writes one partial movie file per `self.play` / `self.wait` call and
+concatenates them with ffmpeg, so the number of calls is the per-job
+overhead this option removes. Grouping keeps each animation's run time and
+order, so the final video looks the same.
+"""
+
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import render_worker
+from bench_renderer import SAMPLE_SCENES
+
+
+def render(spec, grouped, tmp: Path, tier: str):
+    workdir = Path(tempfile.mkdtemp(prefix="grouped-" if grouped else "sequential-", dir=tmp))
+    start = time.perf_counter()
+    render_worker.run_manim(workdir, render_worker.scene_spec("Benchmark", spec, grouped), tier, workdir / "out.mp4")
+    elapsed = time.perf_counter() - start
+    partials = len(list(workdir.glob("media/**/partial_movie_files/**/*.mp4")))
+    return partials, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grouped composition benchmark")
+    parser.add_argument("--render", action="store_true", help="render with manim and time it")
+    parser.add_argument("--quality", default="low")
+    args = parser.parse_args()
+
+    tier = render_worker.resolve_quality(args.quality)
+    tmp = Path(tempfile.mkdtemp(prefix="manim-compose-bench-"))
+    try:
+        header = f"{'scene':>10}  {'sequential':>10}  {'grouped':>8}"
+        if args.render:
+            header += f"  {'seq files':>9}  {'grp files':>9}  {'seq s':>6}  {'grp s':>6}"
+        print(header)
+        for name, spec in SAMPLE_SCENES.items():
+            seq = render_worker.animation_count(render_worker.scene_spec("Benchmark", spec, grouped=False))
+            grp = render_worker.animation_count(render_worker.scene_spec("Benchmark", spec, grouped=True))
+            row = f"{name:>10}  {seq:>10}  {grp:>8}"
+            if args.render:
+                seq_files, seq_s = render(spec, False, tmp, tier)
+                grp_files, grp_s = render(spec, True, tmp, tier)
+                row += f"  {seq_files:>9}  {grp_files:>9}  {seq_s:>6.2f}  {grp_s:>6.2f}"
+            print(row)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
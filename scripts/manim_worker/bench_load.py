@@ -0,0 +1,256 @@
+"""
+End-to-end load test: queue wait, render time and throughput under load.
+
+Usage:
+  python bench_load.py [--worker mock|real|none] [--slots 4] [--jobs 200] [--rate 2]
+                       [--mix text=3,list=2,dfa=1,diagram=1,quadratic=1,graph=1]
+                       [--render-time lognormal:2,0.5] [--users 20] [--duplicates 0.1]
+                       [--quality low] [--json report.json]
+
+Writes jobs exactly as app/api/manim/generate/route.ts does (a hidden queued
+marker carrying the scheduling fields, the job JSON, then the marker renamed
+into place) at `--rate` jobs per second,
+with scene types drawn from `--mix` (weights over the sample scenes in
+bench_renderer.py) and spread over `--users` user keys. A `--duplicates`
+fraction of jobs repeats an earlier job's scene, to exercise coalescing and
+the render cache.
+
+--worker mock starts mock_worker.py on a scratch directory, with each job's
+render time drawn from `--render-time`: `fixed:S`, `uniform:A,B`,
+`lognormal:MEDIAN,SIGMA` or `exp:MEAN`. --worker real starts
+render_worker.py there instead (requires manim; `--worker-args` is passed
+through, e.g. "--renderer warm"). --worker none writes into `--job-dir`
+for a fleet you run yourself.
+
+Reports p50/p95/p99 of queue wait (createdAt to claim), render time and
+end-to-end latency (submit until the harness saw the job finish), and jobs
+per minute from the first submit to the last completion.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+
+import job_queue
+from bench_renderer import SAMPLE_SCENES
+
+WORKER_DIR = Path(__file__).resolve().parent
+STATES = ("queued", "processing", "following", "completed", "failed", "dead")
+
+
+def iso(ts):
+    # Same shape as JavaScript's toISOString(), which the route uses for createdAt.
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SAMPLE_SCENES:
+            raise SystemExit(f"unknown scene type in --mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def render_time_sampler(text, rng):
+    kind, _, args = text.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: rng.lognormvariate(0, sigma) * median
+    if kind == "exp":
+        return lambda: rng.expovariate(1 / values[0])
+    raise SystemExit(f"unknown --render-time distribution: {text}")
+
+
+def percentile(values, p):
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class LoadGenerator:
+    def __init__(self, job_dir: Path, args):
+        self.job_dir = job_dir
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.mix = parse_mix(args.mix)
+        self.render_time = render_time_sampler(args.render_time, self.rng)
+        self.specs = []
+        self.submitted = {}  # jobId -> submit time
+
+    def make_job(self, i):
+        if self.specs and self.rng.random() < self.args.duplicates:
+            spec = self.rng.choice(self.specs)
+        else:
+            name = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+            spec = json.loads(json.dumps(SAMPLE_SCENES[name]))
+            spec["title"] = f"{spec['title']} #{i}"  # unique, so it is not a cache hit
+            self.specs.append(spec)
+        now = time.time()
+        job = {
+            "jobId": f"manim-{int(now * 1000)}-{i}",
+            "prompt": spec["title"],
+            "quality": self.args.quality,
+            "status": "queued",
+            "createdAt": iso(now),
+            "sceneParams": spec,
+            "userKey": f"load-user-{self.rng.randrange(self.args.users)}",
+            "priority": "normal",
+        }
+        if self.args.worker == "mock":
+            job["mockRenderSeconds"] = round(self.render_time(), 3)
+        return job
+
+    def submit(self, job):
+        queued = self.job_dir / "queue" / "queued"
+        (queued / f".{job['jobId']}").write_text(job_queue.schedule_info(job))
+        (self.job_dir / f"{job['jobId']}.json").write_text(json.dumps(job, indent=2))
+        os.rename(queued / f".{job['jobId']}", queued / job["jobId"])
+        self.submitted[job["jobId"]] = time.time()
+
+
+def read_job(path: Path):
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None  # caught mid-write
+
+
+def start_worker(job_dir: Path, args):
+    env = {
+        **os.environ,
+        "MANIM_JOB_DIR": str(job_dir),
+        "MANIM_OUTPUT_DIR": str(job_dir.parent / "videos"),
+    }
+    script = "mock_worker.py" if args.worker == "mock" else "render_worker.py"
+    cmd = [sys.executable, str(WORKER_DIR / script), "--slots", str(args.slots), *args.worker_args.split()]
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL)
+
+
+def run(job_dir: Path, args):
+    gen = LoadGenerator(job_dir, args)
+    finished = {}  # jobId -> (seen at, job)
+    pending = set()
+    start = time.time()
+    deadline = None
+    i = 0
+    while True:
+        now = time.time()
+        # Submit on schedule: job i goes out at start + i / rate.
+        while i < args.jobs and now >= start + i / args.rate:
+            job = gen.make_job(i)
+            gen.submit(job)
+            pending.add(job["jobId"])
+            i += 1
+        for job_id in list(pending):
+            job = read_job(job_dir / f"{job_id}.json")
+            if job and job.get("status") in ("completed", "failed"):
+                finished[job_id] = (now, job)
+                pending.discard(job_id)
+        if i == args.jobs and not pending:
+            break
+        if i == args.jobs and deadline is None:
+            deadline = now + args.timeout
+        if deadline and now > deadline:
+            print(f"Timed out with {len(pending)} jobs unfinished")
+            break
+        time.sleep(0.05)
+    return gen.submitted, finished, start
+
+
+def report(submitted, finished, start, args):
+    waits, renders, latencies = [], [], []
+    failed = 0
+    for job_id, (seen, job) in finished.items():
+        if job.get("status") == "failed":
+            failed += 1
+        timings = job.get("timings", {})
+        if "wait" in timings:
+            waits.append(timings["wait"]["seconds"])
+        render = sum(timings.get(s, {}).get("seconds", 0) for s in ("preview_render", "render"))
+        if render:
+            renders.append(render)
+        latencies.append(seen - submitted[job_id])
+    last = max((seen for seen, _ in finished.values()), default=start)
+    throughput = 60 * len(finished) / (last - start) if last > start else 0.0
+
+    result = {
+        "worker": args.worker,
+        "slots": args.slots,
+        "rate": args.rate,
+        "submitted": len(submitted),
+        "finished": len(finished),
+        "failed": failed,
+        "jobsPerMinute": round(throughput, 1),
+    }
+    print(f"{len(finished)}/{len(submitted)} jobs finished ({failed} failed), {throughput:.1f} jobs/min")
+    print(f"{'':>12}  {'p50':>8}  {'p95':>8}  {'p99':>8}")
+    for name, values in (("queue wait", waits), ("render", renders), ("end-to-end", latencies)):
+        ps = [percentile(values, p) for p in (50, 95, 99)]
+        key = {"queue wait": "queueWait", "render": "render", "end-to-end": "endToEnd"}[name]
+        result[key] = {f"p{p}": None if v is None else round(v, 3) for p, v in zip((50, 95, 99), ps)}
+        print(f"{name:>12}  " + "  ".join(f"{v:8.2f}" if v is not None else f"{'-':>8}" for v in ps))
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manim worker load test")
+    parser.add_argument("--worker", choices=["mock", "real", "none"], default="mock")
+    parser.add_argument("--worker-args", default="", help="extra arguments for the worker")
+    parser.add_argument("--job-dir", help="job directory for --worker none")
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=2.0, help="jobs submitted per second")
+    parser.add_argument("--mix", default=",".join(SAMPLE_SCENES))
+    parser.add_argument("--render-time", default="lognormal:2,0.5", help="mock render time distribution")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duplicates", type=float, default=0.0)
+    parser.add_argument("--quality", default="low")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait after the last submit")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    if args.worker == "none":
+        if not args.job_dir:
+            raise SystemExit("--worker none needs --job-dir")
+        job_dir = Path(args.job_dir)
+        for state in STATES:
+            (job_dir / "queue" / state).mkdir(parents=True, exist_ok=True)
+        report(*run(job_dir, args), args)
+        return
+
+    tmp = Path(tempfile.mkdtemp(prefix="manim-load-"))
+    job_dir = tmp / "jobs"
+    for state in STATES:
+        (job_dir / "queue" / state).mkdir(parents=True)
+    worker = start_worker(job_dir, args)
+    try:
+        report(*run(job_dir, args), args)
+    finally:
+        worker.terminate()
+        worker.wait(10)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Measure what the shared LaTeX/text media cache saves on DFA and quadratic jobs.
+
+Usage:
+  python bench_media_cache.py [--jobs 5] [--quality low] [--renderer subprocess|warm]
+
+Renders each scene `--jobs` times with per-job media directories (the old
+behaviour) and then with the shared cache, starting from an empty cache, and
+prints seconds per job. The first cached job pays for the LaTeX compile; the
+rest reuse it. Uses a scratch cache directory. Requires manim and LaTeX.
+"""
+
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import media_cache
+import render_worker
+from bench_renderer import SAMPLE_SCENES
+from warm_renderer import WarmRenderer
+
+SCENES = ("dfa", "quadratic")
+
+
+def run(name, jobs, quality, tmp: Path, cached: bool):
+    media_cache.ENABLED = cached
+    spec = SAMPLE_SCENES[name]
+    scene = render_worker.scene_spec("Benchmark", spec)
+    durations = []
+    for i in range(jobs):
+        workdir = tmp / f"{name}-{'cached' if cached else 'fresh'}-{i}"
+        workdir.mkdir()
+        start = time.perf_counter()
+        render_worker.run_manim(workdir, scene, quality, workdir / "out.mp4")
+        durations.append(time.perf_counter() - start)
+        shutil.rmtree(workdir / "media", ignore_errors=True)
+    rest = durations[1:] or durations
+    return durations[0], sum(rest) / len(rest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared media cache benchmark")
+    parser.add_argument("--jobs", type=int, default=5)
+    parser.add_argument("--quality", default="low")
+    parser.add_argument("--renderer", choices=["subprocess", "warm"], default="subprocess")
+    args = parser.parse_args()
+
+    quality = render_worker.resolve_quality(args.quality)
+    tmp = Path(tempfile.mkdtemp(prefix="manim-media-bench-"))
+    media_cache.SHARED_DIR = tmp / "media"
+    media_cache.SLOTS_DIR = tmp / "media-slots"
+    if args.renderer == "warm":
+        render_worker._renderer = WarmRenderer()
+        render_worker._renderer.start()
+    try:
+        print(f"{'scene':>10}  {'fresh s/job':>11}  {'cached first':>12}  {'cached s/job':>12}")
+        for name in SCENES:
+            _, fresh = run(name, args.jobs, quality, tmp, cached=False)
+            first, cached = run(name, args.jobs, quality, tmp, cached=True)
+            print(f"{name:>10}  {fresh:>11.2f}  {first:>12.2f}  {cached:>12.2f}")
+    finally:
+        if render_worker._renderer is not None:
+            render_worker._renderer.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark queue poll latency against the size of the job history.
+
+Usage:
+  python bench_queue.py [--history 10000 100000] [--polls 50]
+
+For each history size this builds a scratch `manim_jobs` directory holding
+that many completed jobs plus one queued job, then times:
+
+- legacy: the old pick_job(), which parses every manim-*.json on each poll
+- indexed: job_queue.pick_job(), which only lists queue/queued/
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import importlib
+import contextlib
+from pathlib import Path
+
+
+def legacy_pick(job_dir: Path):
+    for p in job_dir.glob("manim-*.json"):
+        try:
+            job = json.loads(p.read_text())
+            if job.get("status") == "queued":
+                return p, job
+        except Exception:
+            continue
+    return None, None
+
+
+def make_job(job_id, status):
+    return {
+        "jobId": job_id,
+        "prompt": "Explain client server architecture",
+        "quality": "low",
+        "status": status,
+        "createdAt": "2024-01-01T00:00:00.000Z",
+        "sceneParams": {"sceneType": "text", "title": "Bench", "params": {"content": "bench"}},
+    }
+
+
+def populate(job_queue, history: int):
+    job_queue.ensure_dirs()
+    for i in range(history):
+        job_id = f"manim-{i:013d}"
+        job_queue.write_job(job_queue.job_path(job_id), make_job(job_id, "completed"))
+        job_queue.marker_path("completed", job_id).touch()
+    queued_id = "manim-9999999999999"
+    job_queue.write_job(job_queue.job_path(queued_id), make_job(queued_id, "queued"))
+    job_queue.enqueue(queued_id)
+    return queued_id
+
+
+def time_polls(fn, reset, polls: int):
+    samples = []
+    for _ in range(polls):
+        start = time.perf_counter()
+        found = fn()
+        samples.append(time.perf_counter() - start)
+        assert found[0] is not None, "poll did not find the queued job"
+        reset()
+    return statistics.median(samples) * 1000, max(samples) * 1000
+
+
+def bench(history: int, polls: int):
+    tmp = Path(tempfile.mkdtemp(prefix="manim-bench-"))
+    os.environ["MANIM_JOB_DIR"] = str(tmp / "manim_jobs")
+    import job_queue
+    job_queue = importlib.reload(job_queue)
+    try:
+        queued_id = populate(job_queue, history)
+        job_queue.adopt_unindexed(force=True)
+
+        def reset():
+            # Hand the job back the way a requeue does, lease included, or the
+            # heartbeat reports it as lost.
+            job_queue.release_lease(queued_id)
+            job = job_queue.read_job(job_queue.job_path(queued_id))
+            job["status"] = "queued"
+            job_queue.write_job(job_queue.job_path(queued_id), job)
+            job_queue.move(queued_id, "processing", "queued")
+
+        legacy = time_polls(lambda: legacy_pick(job_queue.JOB_DIR), lambda: None, max(1, polls // 10))
+        indexed = time_polls(job_queue.pick_job, reset, polls)
+        return legacy, indexed
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue poll latency benchmark")
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 10000, 100000])
+    parser.add_argument("--polls", type=int, default=50)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    print(f"{'history':>8}  {'legacy p50 ms':>14}  {'legacy max ms':>14}  {'indexed p50 ms':>15}  {'indexed max ms':>15}")
+    for history in args.history:
+        # Only the measurements go to stdout, not the queue's own log lines.
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            (l50, lmax), (i50, imax) = bench(history, args.polls)
+        print(f"{history:>8}  {l50:>14.3f}  {lmax:>14.3f}  {i50:>15.3f}  {imax:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compare jobs per minute of the subprocess-per-job and warm renderer paths.
+
+Usage:
+  python bench_renderer.py [--jobs 10] [--scene text|list|dfa|diagram|quadratic|graph] [--quality low]
+
+Renders the same scene `--jobs` times through each path in a scratch
+directory (the render cache and job queue are not involved) and prints wall
+time per job and jobs per minute. Requires manim to be installed.
+"""
+
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import render_worker
+from warm_renderer import WarmRenderer
+
+SAMPLE_SCENES = {
+    "text": {"sceneType": "text", "title": "Photosynthesis", "params": {"content": "Light energy\nbecomes chemical energy"}},
+    "list": {"sceneType": "list", "title": "Merge Sort", "params": {"items": ["Split", "Sort left", "Sort right", "Merge"]}},
+    "dfa": {
+        "sceneType": "dfa",
+        "title": "DFA for strings ending with 01",
+        "params": {
+            "nodes": [{"id": "q0", "label": "q0", "start": True}, {"id": "q1", "label": "q1"}, {"id": "q2", "label": "q2", "accept": True}],
+            "edges": [{"from": "q0", "to": "q1", "label": "0"}, {"from": "q1", "to": "q2", "label": "1"}],
+        },
+    },
+    "diagram": {
+        "sceneType": "diagram",
+        "title": "Client-Server Architecture",
+        "params": {
+            "nodes": [{"id": "client", "label": "Client"}, {"id": "server", "label": "Server"}, {"id": "db", "label": "Database"}],
+            "edges": [{"from": "client", "to": "server", "label": "HTTP Request"}, {"from": "server", "to": "db", "label": "Query"}],
+        },
+    },
+    "quadratic": {"sceneType": "quadratic", "title": "Quadratic Equation", "params": {"a": 1, "b": -3, "c": -4}},
+    "graph": {"sceneType": "graph", "title": "Sine", "params": {"functions": [{"expr": "sin(x)"}], "xRange": [-6, 6], "yRange": [-2, 2]}},
+}
+
+
+def run(label, jobs, spec, quality, tmp: Path):
+    scene = render_worker.scene_spec("Benchmark", spec)
+    durations = []
+    for i in range(jobs):
+        workdir = tmp / f"{label}-{i}"
+        workdir.mkdir()
+        start = time.perf_counter()
+        render_worker.run_manim(workdir, scene, quality, workdir / "out.mp4")
+        durations.append(time.perf_counter() - start)
+    total = sum(durations)
+    print(f"{label:>10}: {total / jobs:6.2f} s/job  {60 * jobs / total:6.1f} jobs/min  (first job {durations[0]:.2f} s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Renderer startup benchmark")
+    parser.add_argument("--jobs", type=int, default=10)
+    parser.add_argument("--scene", choices=sorted(SAMPLE_SCENES), default="text")
+    parser.add_argument("--quality", default="low")
+    args = parser.parse_args()
+
+    spec = SAMPLE_SCENES[args.scene]
+    quality = render_worker.resolve_quality(args.quality)
+    tmp = Path(tempfile.mkdtemp(prefix="manim-renderer-bench-"))
+    try:
+        render_worker._renderer = None
+        run("subprocess", args.jobs, spec, quality, tmp)
+
+        render_worker._renderer = WarmRenderer()
+        # Warm-up happens at worker start, so keep it out of the measurement.
+        render_worker._renderer.start()
+        run("warm", args.jobs, spec, quality, tmp)
+        render_worker._renderer.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Coalescing of duplicate in-flight jobs.
+
+When a class clicks the same suggested prompt, many jobs with one scene spec
+arrive within seconds. The first job to reach rendering becomes the primary
+for the spec's key and owns `manim_jobs/queue/inflight/<key>/`; every later
+job with that key adds itself to the directory as a follower, parks its
+marker in `queue/following/` and frees its slot without rendering. When the
+primary finishes, `release()` copies its outcome (status, resultUrl,
+previewUrl, error) onto every follower and completes them together.
+
+A primary that is requeued after a lost lease keeps its group. One that ends
+up failed or dead-lettered outside the normal path is found by `sweep()`,
+which releases its followers with the same outcome.
+
+Counters `coalesced` (followers attached) and `coalescedGroups` (groups with
+at least one follower) are kept with the render cache stats.
+Set MANIM_COALESCE=0 to render every job separately.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+
+import job_queue
+import render_cache
+from job_queue import QUEUE_DIR, job_path, move, read_job, write_job
+
+INFLIGHT_DIR = QUEUE_DIR / "inflight"
+ENABLED = os.environ.get("MANIM_COALESCE", "1") != "0"
+
+# Outcome fields a follower takes over from its primary.
+SHARED_FIELDS = ("status", "progress", "resultUrl", "previewUrl", "playlistUrl", "error", "failureReason", "renderQuality", "cacheHit")
+
+_last_sweep = 0.0
+
+
+def spec_key(job: dict):
+    """Key for workers that do not build a scene script (the mock worker)."""
+    spec = [job.get("prompt"), job.get("sceneParams"), job.get("quality")]
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+def _primary_of(group):
+    try:
+        return (group / "primary").read_text()
+    except FileNotFoundError:
+        return None
+
+
+def join(key: str, job: dict):
+    """
+    Return True if this job should render `key` itself, or False if it was
+    attached to the job already rendering it (its slot is then free).
+    """
+    if not ENABLED:
+        return True
+    INFLIGHT_DIR.mkdir(parents=True, exist_ok=True)
+    job_id = job["jobId"]
+    group = INFLIGHT_DIR / key
+    while True:
+        # Build the group off to the side and rename it into place, so a
+        # visible group always names its primary.
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=INFLIGHT_DIR)
+        with open(os.path.join(tmp, "primary"), "w") as f:
+            f.write(job_id)
+        try:
+            os.rename(tmp, group)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            job["coalesceKey"] = key
+            return True
+
+        primary = _primary_of(group)
+        if primary is None:
+            continue  # released in the meantime
+        if primary == job_id:
+            job["coalesceKey"] = key  # our own group, from before a requeue
+            return True
+
+        job["coalescedWith"] = primary
+        write_job(job_path(job_id), job)
+        try:
+            (group / job_id).touch()
+        except FileNotFoundError:
+            job.pop("coalescedWith")
+            continue  # the primary released its group just now; start a new one
+        job_queue.park(job_id)
+        render_cache.count("coalesced")
+        print(f"Job {job_id} coalesced with {primary}")
+        return False
+
+
+def followers(key: str):
+    try:
+        return [e.name for e in os.scandir(INFLIGHT_DIR / key) if e.name != "primary"]
+    except FileNotFoundError:
+        return []
+
+
+def share(job: dict, **fields):
+    """Copy interim fields (e.g. previewUrl) onto the primary's current followers."""
+    for follower_id in followers(job.get("coalesceKey") or ""):
+        p = job_path(follower_id)
+        follower = read_job(p)
+        if follower:
+            follower.update(fields)
+            write_job(p, follower)
+
+
+def _complete(group, job: dict):
+    done = 0
+    for entry in os.scandir(group):
+        if entry.name == "primary":
+            continue
+        p = job_path(entry.name)
+        follower = read_job(p)
+        if not follower:
+            continue
+        for field in SHARED_FIELDS:
+            if field in job:
+                follower[field] = job[field]
+            else:
+                follower.pop(field, None)
+        follower["processedAt"] = job.get("processedAt") or time.strftime("%Y-%m-%dT%H:%M:%SZ")
+        write_job(p, follower)
+        state = "completed" if follower.get("status") == "completed" else "failed"
+        # A follower that has not parked yet is still in processing/.
+        if not move(entry.name, "following", state):
+            move(entry.name, "processing", state)
+        done += 1
+    return done
+
+
+def release(job: dict, key: str = None):
+    """Complete a finished primary's followers with its outcome."""
+    key = key or job.get("coalesceKey")
+    if not key or not ENABLED:
+        return 0
+    group = INFLIGHT_DIR / key
+    if _primary_of(group) != job["jobId"]:
+        return 0
+    # Take the group out of sight first; late joiners start a new one.
+    releasing = INFLIGHT_DIR / f".done-{key}-{job['jobId']}"
+    try:
+        os.rename(group, releasing)
+    except FileNotFoundError:
+        return 0
+    done = _complete(releasing, job)
+    shutil.rmtree(releasing, ignore_errors=True)
+    if done:
+        render_cache.count("coalescedGroups")
+        print(f"Completed {done} coalesced job(s) with {job['jobId']}")
+    return done
+
+
+def sweep(force=False):
+    """Release groups whose primary finished without releasing them."""
+    global _last_sweep
+    now = time.time()
+    if not ENABLED or (not force and now - _last_sweep < job_queue.LEASE_TTL / 2):
+        return
+    _last_sweep = now
+    try:
+        entries = list(os.scandir(INFLIGHT_DIR))
+    except FileNotFoundError:
+        return
+    stale = now - job_queue.LEASE_TTL
+    for entry in entries:
+        group = Path(entry.path)
+        primary = _primary_of(group)
+        if entry.name.startswith("."):
+            # A build or release that a dead worker left behind.
+            try:
+                old = entry.stat().st_mtime < stale
+            except FileNotFoundError:
+                continue
+            if old and entry.name.startswith(".done-") and primary:
+                _complete(group, read_job(job_path(primary)) or {"status": "failed"})
+            if old:
+                shutil.rmtree(group, ignore_errors=True)
+            continue
+        if not primary:
+            continue
+        job = read_job(job_path(primary))
+        if job is None:
+            job = {"jobId": primary, "status": "failed", "error": "Primary job disappeared"}
+        if job.get("status") in ("completed", "failed"):
+            release(job, key=entry.name)
@@ -0,0 +1,161 @@
+"""
+Adaptive, vectorized sampling of graph and quadratic curves.
+
+`axes.plot(lambda x: f(x), use_smoothing=True)` calls the function once per
+point, in Python, at a fixed step of a tenth of a tick across the whole
+xRange. So a wide xRange costs tens of thousands of calls, a steep curve is
+still jagged between samples, and everything far outside yRange is drawn
+too. sample() instead evaluates the function with NumPy over whole arrays. It
+starts from a coarse uniform grid and bisects only the segments whose
+midpoint is more than TOLERANCE scene units off the chord, measured on
+screen (the axes are 10 x 5 units). Flat stretches stay coarse and bends get
+dense. The result is clipped to yRange, ending exactly on the window's edges,
+and returned as the visible pieces, each a list of (x, y).
+
+The scene builders in scenes.py draw each piece as a smooth VMobject.
+
+Usage:
+  python bench_curves.py    # fixed-step vs adaptive sampling per expression and range
+"""
+
+import numpy as np
+
+# The expressions graph scenes support (no eval of model output).
+EXPRESSIONS = {
+    "x": lambda x: x,
+    "y=x": lambda x: x,
+    "x^2": lambda x: x * x,
+    "x**2": lambda x: x * x,
+    "sin(x)": np.sin,
+    "sin": np.sin,
+    "cos(x)": np.cos,
+    "cos": np.cos,
+    "-x": lambda x: -x,
+}
+
+# Size of the scenes' axes in scene units; the frame is 8 units (1080 px at high quality) tall.
+X_LENGTH = 10
+Y_LENGTH = 5
+TOLERANCE = 0.005
+# Starting samples: one per 0.02 scene units (under 3 px at 1080p), and one
+# per X_STEP of x, about a dozen per period of sin and cos, so a wide xRange
+# does not alias them. Flat stretches are thinned out again. Both are capped
+# at MAX_POINTS, so past an xRange about 2000 wide the grid is coarser than
+# X_STEP and sin and cos can still alias (worst when the step nears a
+# multiple of 2*pi): the error may then exceed TOLERANCE, though at that
+# width the curve is a solid band on screen anyway.
+INITIAL_POINTS = 501
+X_STEP = 0.5
+MAX_DEPTH = 16
+MAX_POINTS = 4000
+
+
+def expr_to_func(expr):
+    return EXPRESSIONS.get(str(expr).strip().lower(), EXPRESSIONS["x"])
+
+
+def _evaluate(func, xs):
+    with np.errstate(all="ignore"):
+        ys = np.asarray(func(xs), dtype=float)
+    return np.broadcast_to(ys, xs.shape).copy()
+
+
+def _off_chord(xa, ya, xm, ym, xb, yb, sx, sy):
+    """Distance of (xm, ym) from the chord (xa, ya)-(xb, yb), in scene units."""
+    # Poles and NaNs give NaN here, which callers treat as "not straight".
+    with np.errstate(all="ignore"):
+        dx = (xb - xa) * sx
+        dy = (yb - ya) * sy
+        return np.abs((ym - ya) * sy * dx - (xm - xa) * sx * dy) / np.hypot(dx, dy)
+
+
+def _coarsen(xs, ys, y_range, sx, sy, tolerance):
+    """Drop every other point wherever the curve is straight enough without it."""
+    y0, y1 = y_range
+    while len(xs) > 2:
+        odd = np.arange(1, len(xs) - 1, 2)
+        off = _off_chord(xs[odd - 1], ys[odd - 1], xs[odd], ys[odd], xs[odd + 1], ys[odd + 1], sx, sy)
+        inside = (ys >= y0) & (ys <= y1)
+        # Keep points next to a window edge, so the crossing stays exact.
+        same = (inside[odd - 1] == inside[odd]) & (inside[odd] == inside[odd + 1])
+        drop = (off <= tolerance / 2) & same
+        if not drop.any():
+            break
+        keep = np.ones(len(xs), dtype=bool)
+        keep[odd[drop]] = False
+        xs, ys = xs[keep], ys[keep]
+    return xs, ys
+
+
+def _refine(func, x_range, y_range, tolerance):
+    x0, x1 = x_range
+    y0, y1 = y_range
+    sx = X_LENGTH / (x1 - x0)
+    sy = Y_LENGTH / (y1 - y0)
+    xs = np.linspace(x0, x1, int(min(MAX_POINTS, max(INITIAL_POINTS, (x1 - x0) / X_STEP + 1))))
+    xs, ys = _coarsen(xs, _evaluate(func, xs), y_range, sx, sy, tolerance)
+    for _ in range(MAX_DEPTH):
+        mx = (xs[:-1] + xs[1:]) / 2
+        my = _evaluate(func, mx)
+        off = _off_chord(xs[:-1], ys[:-1], mx, my, xs[1:], ys[1:], sx, sy)
+        dx = (xs[1:] - xs[:-1]) * sx
+        # Segments entirely above or below the window are never drawn, and
+        # ones that cross its edge are split until the crossing is exact.
+        above = (ys[:-1] > y1) & (ys[1:] > y1) & (my > y1)
+        below = (ys[:-1] < y0) & (ys[1:] < y0) & (my < y0)
+        inside = (ys >= y0) & (ys <= y1)
+        crossing = (inside[:-1] != inside[1:]) & (dx > tolerance)
+        refine = (~(off <= tolerance) | crossing) & ~above & ~below
+        budget = MAX_POINTS - len(xs)
+        if not refine.any() or budget <= 0:
+            break
+        if refine.sum() > budget:
+            # Out of points: split the worst offenders only.
+            worst = np.argsort(np.where(refine, np.nan_to_num(off, nan=np.inf), -1))[-budget:]
+            refine = np.zeros_like(refine)
+            refine[worst] = True
+        at = np.flatnonzero(refine) + 1
+        xs = np.insert(xs, at, mx[refine])
+        ys = np.insert(ys, at, my[refine])
+    return xs, ys
+
+
+def _crossing(xi, yi, xo, yo, y0, y1):
+    """Where the segment from inside point i to outside point o leaves the window."""
+    if not np.isfinite(yo):
+        return None
+    edge = y1 if yo > y1 else y0
+    if yi == edge:
+        return None  # the inside point already is the crossing
+    return (xi + (edge - yi) / (yo - yi) * (xo - xi), edge)
+
+
+def _clip(xs, ys, y_range):
+    y0, y1 = y_range
+    inside = np.isfinite(ys) & (ys >= y0) & (ys <= y1)
+    before = np.r_[False, inside[:-1]]
+    after = np.r_[inside[1:], False]
+    pieces = []
+    for start, end in zip(np.flatnonzero(inside & ~before), np.flatnonzero(inside & ~after)):
+        piece = list(zip(xs[start:end + 1].tolist(), ys[start:end + 1].tolist()))
+        if start > 0:
+            enter = _crossing(xs[start], ys[start], xs[start - 1], ys[start - 1], y0, y1)
+            if enter:
+                piece.insert(0, enter)
+        if end < len(xs) - 1:
+            leave = _crossing(xs[end], ys[end], xs[end + 1], ys[end + 1], y0, y1)
+            if leave:
+                piece.append(leave)
+        if len(piece) > 1:
+            pieces.append([(float(x), float(y)) for x, y in piece])
+    return pieces
+
+
+def sample(func, x_range, y_range, tolerance=TOLERANCE):
+    """Visible pieces of y = func(x) on the axes, each a list of (x, y)."""
+    x0, x1 = float(x_range[0]), float(x_range[1])
+    y0, y1 = float(y_range[0]), float(y_range[1])
+    if not (x1 > x0 and y1 > y0):
+        return []
+    xs, ys = _refine(func, (x0, x1), (y0, y1), tolerance)
+    return _clip(xs, ys, (y0, y1))
@@ -0,0 +1,209 @@
+"""
+Stream a render as HLS while Manim is still running.
+
+Manim writes one partial movie file per animation under
+`media/videos/**/partial_movie_files/` and only concatenates them at the
+end. With caching disabled they are numbered in play order
+(`uncached_00000.mp4`, ...), and a file is complete once the next one exists
+or the render has ended. HlsStream watches that directory from a background
+thread, remuxes each complete file into MPEG-TS segments (stream copy, no
+re-encode, timestamps offset to follow the previous segment), and appends
+them to an EVENT playlist. The playlist URL is reported through
+`on_playlist(url)` as soon as the first segment is published, so playback
+can start while later animations are still rendering.
+
+An EVENT playlist may not change its EXT-X-TARGETDURATION, and no segment
+may be longer. A part longer than TARGET_DURATION (say a grouped
+LaggedStart of 20 s) is cut at its keyframes into pieces of at most that
+length; if its keyframes are too far apart, that part alone is re-encoded
+with a keyframe every TARGET_DURATION seconds.
+
+Segments go to `public/manim_videos/<jobId>-hls/`, or to S3 under
+`manim_videos/<jobId>-hls/` when uploads are configured. S3 uploads run on
+the slot's Uploader (see s3_upload.py), and the playlist lists a segment
+once it and every segment before it are uploaded, so a slow upload never
+holds up the remuxing. Requires ffmpeg and ffprobe, which Manim already
+depends on.
+
+Enabled with MANIM_HLS=1.
+"""
+
+import os
+import threading
+import subprocess
+from pathlib import Path
+from functools import partial
+
+import s3_upload
+
+ENABLED = os.environ.get("MANIM_HLS", "0") == "1"
+POLL_INTERVAL = 0.25
+TARGET_DURATION = int(os.environ.get("MANIM_HLS_TARGET_DURATION", "10"))
+
+
+def _duration(path: Path):
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+        capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip())
+
+
+class HlsStream:
+    def __init__(self, job_id: str, media_dir: Path, output_dir: Path, on_playlist, uploader=None):
+        self.media_dir = media_dir
+        self.name = f"{job_id}-hls"
+        self.out_dir = output_dir / self.name
+        self.on_playlist = on_playlist
+        # With S3 configured, uploads go through `uploader` (an s3_upload.Uploader).
+        self.uploader = uploader if s3_upload.enabled() else None
+        self.segments = []  # (file name, duration)
+        self.offset = 0.0
+        self.error = None
+        self._done = set()
+        self._published = 0  # leading segments that are uploaded, and so listed
+        self._uploaded = set()
+        self._pending = 0
+        self._playlist_url = None
+        self._lock = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"hls-{job_id}", daemon=True)
+
+    def start(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._thread.start()
+
+    def finish(self, complete=True):
+        """Stop watching; publish the remaining parts and close the playlist."""
+        self._stop.set()
+        self._thread.join()
+        if complete and self.error is None:
+            self._publish_ready(final=True)
+        with self._lock:
+            while self._pending:
+                self._lock.wait()
+            if self._published:
+                self._write_playlist(ended=True)
+
+    def _run(self):
+        while not self._stop.wait(POLL_INTERVAL):
+            try:
+                self._publish_ready(final=False)
+            except Exception as e:
+                # Streaming is best effort; the mp4 is still published normally.
+                self.error = e
+                print(f"HLS streaming of {self.name} stopped: {e}")
+                return
+
+    def _parts(self):
+        return sorted(
+            p for p in self.media_dir.glob("videos/**/partial_movie_files/**/*.mp4")
+            if p.name not in self._done
+        )
+
+    def _publish_ready(self, final):
+        parts = self._parts()
+        if not final:
+            parts = parts[:-1]  # the newest file may still be being written
+        for part in parts:
+            self._add_segment(part)
+
+    def _cut(self, part: Path, reencode: bool):
+        """Remux (or re-encode) `part` into pieces of at most TARGET_DURATION; returns their paths."""
+        for old in self.out_dir.glob(".cut-*.ts"):
+            old.unlink()
+        codec = ["-c", "copy"]
+        if reencode:
+            codec = ["-c:v", "libx264", "-preset", "veryfast", "-c:a", "copy",
+                     "-force_key_frames", f"expr:gte(t,n_forced*{TARGET_DURATION})"]
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-i", str(part), *codec, "-f", "segment",
+             "-segment_time", str(TARGET_DURATION), "-segment_format", "mpegts",
+             "-output_ts_offset", f"{self.offset:.6f}", str(self.out_dir / ".cut-%03d.ts")],
+            check=True,
+        )
+        return sorted(self.out_dir.glob(".cut-*.ts"))
+
+    def _add_segment(self, part: Path):
+        pieces = self._cut(part, reencode=False)
+        durations = [_duration(p) for p in pieces]
+        # EXTINF is compared with the target after rounding.
+        if max(durations) >= TARGET_DURATION + 0.5:
+            print(f"HLS: keyframes in {part.name} are too sparse to cut; re-encoding it")
+            pieces = self._cut(part, reencode=True)
+            durations = [_duration(p) for p in pieces]
+        self._done.add(part.name)
+        for piece, duration in zip(pieces, durations):
+            index = len(self.segments)
+            seg_name = f"seg{index:05d}.ts"
+            seg_path = self.out_dir / seg_name
+            os.replace(piece, seg_path)
+            self.offset += duration
+            self.segments.append((seg_name, duration))
+            if self.uploader is None:
+                self._segment_ready(index)
+                continue
+            with self._lock:
+                self._pending += 1
+            self.uploader.submit(
+                seg_path, partial(self._uploaded_segment, index),
+                upload=partial(s3_upload.upload_file, key=f"manim_videos/{self.name}/{seg_name}",
+                               content_type="video/mp2t"),
+            )
+
+    def _uploaded_segment(self, index, url, error):
+        # On an upload thread.
+        try:
+            if error is not None:
+                if self.error is None:
+                    self.error = error
+                    print(f"HLS streaming of {self.name} stopped: {error}")
+                return
+            self._segment_ready(index)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._lock.notify_all()
+
+    def _segment_ready(self, index):
+        """List every segment up to the first one still uploading, and publish the playlist."""
+        with self._lock:
+            self._uploaded.add(index)
+            published = self._published
+            while self._published in self._uploaded and self.error is None:
+                self._published += 1
+            if self._published == published:
+                return
+            url = self._write_playlist(ended=False)
+            first = self._playlist_url is None
+            self._playlist_url = url
+        if first:
+            self.on_playlist(url)
+
+    def _write_playlist(self, ended):
+        listed = self.segments[:self._published]
+        # Pieces are cut to TARGET_DURATION, so this stays constant; should one
+        # still run over, the tag grows rather than understate it. EXTINF is
+        # compared with it rounded to the nearest second.
+        target = max([TARGET_DURATION] + [int(d + 0.5) for _, d in listed])
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{target}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for seg_name, duration in listed:
+            lines += [f"#EXTINF:{duration:.3f},", seg_name]
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+        path = self.out_dir / "index.m3u8"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text("\n".join(lines) + "\n")
+        os.replace(tmp, path)
+        if s3_upload.enabled():
+            return s3_upload.upload_file(
+                path, f"manim_videos/{self.name}/index.m3u8", "application/vnd.apple.mpegurl",
+                cache_control="no-cache",
+            )
+        return f"/manim_videos/{self.name}/index.m3u8"
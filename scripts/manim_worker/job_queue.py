@@ -0,0 +1,525 @@
+"""
+File-based job queue shared by the render and mock workers.
+
+Jobs are the `manim-*.json` files written by `app/api/manim/generate/route.ts`
+into `manim_jobs/`; the JSON stays there as the record the status route reads.
+Alongside it, `manim_jobs/queue/<state>/<jobId>` marker files index every job
+by state (queued, processing, completed, failed, ...). Polling only lists
+`queue/queued/`, so its cost does not grow with the number of finished jobs.
+
+A job is claimed by renaming its marker from `queued/` to `processing/`.
+rename() is atomic, so exactly one of any number of worker processes (or
+containers sharing the directory) wins a given job.
+
+Job files written without a marker (older API builds, hand-made jobs) are
+indexed by `adopt_job()` when the watcher sees them written. `adopt_unindexed()`
+scans the job directory for the ones it missed: once at startup (and after
+the kernel drops events) under inotify, every ADOPT_INTERVAL seconds when
+the watcher polls. Jobs that have a marker in any state, finished ones
+included, are skipped, and archived jobs are no longer in the directory, so
+nothing is remembered between scans.
+
+Leases: a `processing/` marker is the claiming worker's lease, and its mtime
+is the heartbeat. A thread in each slot touches the markers it holds every
+LEASE_TTL / 3 seconds until the job finishes (including any upload). When a
+worker dies its markers stop being touched; `reclaim_expired()`, run by every
+worker's poll, returns jobs whose lease is older than LEASE_TTL to `queued/`
+with exponential backoff, or moves them to `dead/` (status `failed`) after
+MAX_ATTEMPTS claims. A backed-off job's `queued/` marker has its mtime set to
+the time it may run again, and pick_job() skips it until then.
+
+Scheduling: a `queued/` marker holds the job's user key, priority and
+createdAt (see schedule_info()), so pick_job() can order the queue without
+reading every job's JSON. Jobs are taken by priority class (high, normal,
+low), then round-robin across users: the user with the fewest jobs in
+`processing/`, then the one served longest ago (the mtime of
+`queue/users/<hash>`, touched on every claim), then FIFO by createdAt within
+a user. A waiting job moves up one class every PRIORITY_AGING seconds, so
+low-priority jobs are delayed but never starved.
+"""
+
+import os
+import json
+import time
+import socket
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime
+
+from job_watch import JobWatcher
+
+ROOT = Path(__file__).resolve().parents[2]
+JOB_DIR = Path(os.environ.get("MANIM_JOB_DIR") or ROOT / "manim_jobs")
+QUEUE_DIR = JOB_DIR / "queue"
+STATES = ("queued", "processing", "following", "completed", "failed", "dead")
+# What a job's status record holds (see write_job); everything a client polls for.
+STATUS_FIELDS = (
+    "jobId", "status", "progress", "resultUrl", "previewUrl", "playlistUrl", "error", "failureReason",
+    "renderQuality", "cacheHit", "coalescedWith", "attempts", "retryAt", "deadLetter", "createdAt", "processedAt",
+)
+
+# Seconds between scans for job files that have no queue marker, when there is no inotify.
+ADOPT_INTERVAL = float(os.environ.get("MANIM_ADOPT_INTERVAL", "30"))
+# A processing job whose lease is not renewed for this long is taken back.
+LEASE_TTL = float(os.environ.get("MANIM_LEASE_TTL", "60"))
+MAX_ATTEMPTS = int(os.environ.get("MANIM_MAX_ATTEMPTS", "3"))
+# Retry delay after the first lost attempt; doubles per attempt up to MAX_BACKOFF.
+RETRY_BACKOFF = float(os.environ.get("MANIM_RETRY_BACKOFF", "10"))
+MAX_BACKOFF = 300
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+# A queued job moves up one priority class per this many seconds waited (0: never).
+PRIORITY_AGING = float(os.environ.get("MANIM_PRIORITY_AGING", "300"))
+
+_last_adopt = 0.0
+# Whether this process's watcher reports job files as they are written.
+_watched = False
+_last_reclaim = 0.0
+
+# Jobs this process holds a lease on, renewed by the heartbeat thread.
+_leases = set()
+_lease_lock = threading.Lock()
+_heartbeat = None
+
+# job_id -> (priority class, user, created) from its marker; markers never change.
+_schedule = {}
+
+
+def watcher():
+    global _watched
+    w = JobWatcher(JOB_DIR, QUEUE_DIR / "queued")
+    _watched = w.mode == "inotify"
+    return w
+
+
+def wait_for_work(w):
+    """Block on the watcher, indexing any unmarked job files it reports."""
+    names = w.wait()
+    if names is None:
+        adopt_unindexed(force=True)  # events were lost
+        return
+    for name in names:
+        adopt_job(name[: -len(".json")])
+
+
+def ensure_dirs():
+    JOB_DIR.mkdir(exist_ok=True)
+    (JOB_DIR / "status").mkdir(exist_ok=True)
+    for state in STATES:
+        (QUEUE_DIR / state).mkdir(parents=True, exist_ok=True)
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def job_path(job_id: str):
+    return JOB_DIR / f"{job_id}.json"
+
+
+def marker_path(state: str, job_id: str):
+    return QUEUE_DIR / state / job_id
+
+
+def read_job(p: Path):
+    try:
+        return json.loads(p.read_text())
+    except Exception:
+        return None
+
+
+def _write_atomic(p: Path, data: str):
+    # Readers see the old file or the new one, never a partial write.
+    tmp = p.with_name(f".{p.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(data)
+    os.replace(tmp, p)
+
+
+def status_path(p: Path):
+    return p.parent / "status" / p.name
+
+
+def write_job(p, job):
+    """
+    Atomically replace a job's JSON, then its compact status record
+    (`manim_jobs/status/<jobId>.json`, STATUS_FIELDS only), which is what the
+    status routes read.
+    """
+    p = Path(p)
+    _write_atomic(p, json.dumps(job))
+    status = {k: job[k] for k in STATUS_FIELDS if k in job}
+    try:
+        _write_atomic(status_path(p), json.dumps(status))
+    except FileNotFoundError:
+        status_path(p).parent.mkdir(exist_ok=True)
+        _write_atomic(status_path(p), json.dumps(status))
+
+
+def schedule_info(job: dict):
+    """What a queued marker holds: the fields pick_job() orders by."""
+    return json.dumps({
+        "user": job.get("userKey") or "",
+        "priority": job.get("priority") or "normal",
+        "createdAt": job.get("createdAt"),
+    })
+
+
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def _schedule_entry(state: str, job_id: str, now: float):
+    entry = _schedule.get(job_id)
+    if entry is None:
+        try:
+            info = json.loads(marker_path(state, job_id).read_text() or "null")
+        except (FileNotFoundError, ValueError):
+            info = None
+        if not isinstance(info, dict):
+            # Empty marker (older API build, adopted job) or one still being written.
+            job = read_job(job_path(job_id)) or {}
+            info = {"user": job.get("userKey"), "priority": job.get("priority"), "createdAt": job.get("createdAt")}
+        priority = PRIORITIES.get(str(info.get("priority") or "normal").lower(), PRIORITIES["normal"])
+        created = _parse_time(info.get("createdAt"))
+        entry = (priority, info.get("user") or "", now if created is None else created)
+        _schedule[job_id] = entry
+    return entry
+
+
+def _served_path(user: str):
+    return QUEUE_DIR / "users" / hashlib.sha1(user.encode()).hexdigest()[:16]
+
+
+def _last_served(user: str):
+    try:
+        return os.stat(_served_path(user)).st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def _mark_served(user: str):
+    p = _served_path(user)
+    try:
+        p.touch()
+    except FileNotFoundError:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.touch()
+
+
+def _queue_order(now: float):
+    """Claimable queued markers, best first (see the module docstring)."""
+    inflight = {}
+    seen = set()
+    for entry in os.scandir(QUEUE_DIR / "processing"):
+        _, user, _ = _schedule_entry("processing", entry.name, now)
+        inflight[user] = inflight.get(user, 0) + 1
+        seen.add(entry.name)
+
+    served = {}
+    candidates = []
+    for entry in os.scandir(QUEUE_DIR / "queued"):
+        job_id = entry.name
+        if job_id.startswith("."):
+            continue  # mid-requeue
+        try:
+            if entry.stat().st_mtime > now:
+                continue  # backing off after a lost attempt
+        except FileNotFoundError:
+            continue
+        priority, user, created = _schedule_entry("queued", job_id, now)
+        seen.add(job_id)
+        if PRIORITY_AGING > 0:
+            priority = max(0, priority - int(max(0.0, now - created) // PRIORITY_AGING))
+        if user not in served:
+            served[user] = _last_served(user)
+        candidates.append(((priority, inflight.get(user, 0), served[user], created, job_id), entry, user))
+
+    for job_id in set(_schedule) - seen:
+        del _schedule[job_id]
+    candidates.sort(key=lambda c: c[0])
+    return [(entry, user) for _, entry, user in candidates]
+
+
+def enqueue(job_id: str):
+    marker_path("queued", job_id).touch()
+
+
+def move(job_id: str, src: str, dst: str):
+    """Move a job's marker between states. Returns False if it was not in `src`."""
+    try:
+        os.rename(marker_path(src, job_id), marker_path(dst, job_id))
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _renew_leases():
+    while True:
+        time.sleep(LEASE_TTL / 3)
+        with _lease_lock:
+            held = list(_leases)
+        for job_id in held:
+            try:
+                os.utime(marker_path("processing", job_id))
+            except FileNotFoundError:
+                with _lease_lock:
+                    _leases.discard(job_id)
+                print(f"Lost lease on {job_id}; another worker took it back")
+
+
+def _hold(job_id: str):
+    global _heartbeat
+    with _lease_lock:
+        _leases.add(job_id)
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_renew_leases, name="lease-heartbeat", daemon=True)
+            _heartbeat.start()
+
+
+def release_lease(job_id: str):
+    """Stop renewing this process's lease on a job (its marker is left where it is)."""
+    with _lease_lock:
+        _leases.discard(job_id)
+
+
+def park(job_id: str):
+    """Give up the lease on a job that waits on another one (see coalesce.py)."""
+    release_lease(job_id)
+    move(job_id, "processing", "following")
+
+
+def finish(job: dict):
+    state = job.get("status")
+    if state not in ("completed", "failed"):
+        state = "failed"
+    release_lease(job["jobId"])
+    if not move(job["jobId"], "processing", state):
+        print(f"Finished {job['jobId']} after its lease expired")
+
+
+def _now_iso(ts=None):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+
+def requeue(job_id: str, reason: str, error: str = None):
+    """
+    Take back a processing job whose worker is gone. It is queued again after
+    a backoff, or dead-lettered once it has been claimed MAX_ATTEMPTS times.
+    Returns False if another worker got to it first.
+    """
+    # Claim the lease under a name pick_job() ignores, so the job is never
+    # claimable before its JSON says `queued`.
+    hidden = QUEUE_DIR / "queued" / f".{job_id}"
+    try:
+        os.rename(marker_path("processing", job_id), hidden)
+    except FileNotFoundError:
+        return False
+    os.utime(hidden)
+
+    p = job_path(job_id)
+    job = read_job(p)
+    if not job:
+        os.rename(hidden, marker_path("failed", job_id))
+        return True
+
+    now = time.time()
+    attempts = job.get("attempts", 1)
+    job["lastError"] = error or reason
+    job.pop("workerId", None)
+    if attempts >= MAX_ATTEMPTS:
+        job["status"] = "failed"
+        job["error"] = f"Gave up after {attempts} attempts: {error or reason}"
+        job["failureReason"] = reason
+        job["deadLetter"] = True
+        job["processedAt"] = _now_iso(now)
+        write_job(p, job)
+        os.rename(hidden, marker_path("dead", job_id))
+        print(f"Job {job_id} dead-lettered after {attempts} attempts ({reason})")
+    else:
+        retry_at = now + min(RETRY_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+        job["status"] = "queued"
+        job["retryAt"] = _now_iso(retry_at)
+        write_job(p, job)
+        os.utime(hidden, (retry_at, retry_at))
+        os.rename(hidden, marker_path("queued", job_id))
+        print(f"Job {job_id} requeued after attempt {attempts} ({reason}); retry at {job['retryAt']}")
+    return True
+
+
+def reclaim_expired(force=False):
+    """Requeue or dead-letter jobs whose lease has not been renewed in LEASE_TTL."""
+    global _last_reclaim
+    now = time.time()
+    if not force and now - _last_reclaim < LEASE_TTL / 2:
+        return 0
+    _last_reclaim = now
+    cutoff = now - LEASE_TTL
+
+    reclaimed = 0
+    for entry in os.scandir(QUEUE_DIR / "processing"):
+        try:
+            expired = entry.stat().st_mtime < cutoff
+        except FileNotFoundError:
+            continue
+        if expired and requeue(entry.name, "lease_expired", "Worker stopped renewing its lease"):
+            reclaimed += 1
+
+    # A worker that died inside requeue(), or a submitter that died before
+    # its job was fully written, leaves a hidden marker; hand it back to
+    # processing/ as expired so the next scan requeues (or fails) it properly.
+    for entry in os.scandir(QUEUE_DIR / "queued"):
+        if not entry.name.startswith("."):
+            continue
+        target = marker_path("processing", entry.name[1:])
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.rename(entry.path, target)
+                os.utime(target, (0, 0))
+        except FileNotFoundError:
+            pass
+    return reclaimed
+
+
+STUCK_ERRORS = {
+    "watchdog": "Render slot stopped responding and was killed by the watchdog",
+    "slot_crashed": "Render slot exited while processing this job",
+}
+
+
+def release_stuck(job_id: str, reason: str):
+    """
+    Handle a job whose slot was killed or died (called by the supervisor).
+    A crashed slot's job is retried; one the watchdog had to kill is failed
+    and returned.
+    """
+    if reason == "slot_crashed":
+        requeue(job_id, reason, STUCK_ERRORS[reason])
+        return None
+    p = job_path(job_id)
+    job = read_job(p)
+    if not job or job.get("status") != "processing":
+        return None
+    job["status"] = "failed"
+    job["error"] = STUCK_ERRORS.get(reason, reason)
+    job["failureReason"] = reason
+    job["processedAt"] = _now_iso()
+    write_job(p, job)
+    finish(job)
+    print(f"Job {job_id} failed: {job['error']}")
+    return job
+
+
+def queue_depth():
+    return {state: sum(1 for _ in os.scandir(QUEUE_DIR / state)) for state in STATES}
+
+
+def has_claimable(waited: float = 0.0):
+    """
+    True if a queued job could be claimed now and has been for `waited`
+    seconds (cheaper than pick_job; it claims nothing).
+    """
+    now = time.time()
+    for entry in os.scandir(QUEUE_DIR / "queued"):
+        if entry.name.startswith("."):
+            continue
+        try:
+            if entry.stat().st_mtime <= now - waited:
+                return True
+        except FileNotFoundError:
+            continue
+    return False
+
+
+def _index(job_id: str, job: dict):
+    status = job.get("status")
+    state = status if status in STATES else "failed"
+    if state == "processing":
+        # Owned by a worker that predates the index; leave it alone.
+        state = "failed"
+    if not _has_marker(job_id):
+        marker_path(state, job_id).write_text(schedule_info(job) if state == "queued" else "")
+    return state == "queued"
+
+
+def _has_marker(job_id: str):
+    # Including the one requeue() hides while it rewrites the job, and the
+    # one a submitter (the generate route, job_service.py) hides until the
+    # job JSON is written.
+    return marker_path("queued", f".{job_id}").exists() or any(marker_path(s, job_id).exists() for s in STATES)
+
+
+def adopt_job(job_id: str):
+    """Index one job file if it has no queue marker yet."""
+    if _has_marker(job_id):
+        return False
+    job = read_job(job_path(job_id))
+    if not job:
+        return False  # still being written; its close event will retry
+    return _index(job_id, job)
+
+
+def adopt_unindexed(force=False):
+    """Index job files that were written without a queue marker."""
+    global _last_adopt
+    now = time.time()
+    if not force and (_watched and _last_adopt or now - _last_adopt < ADOPT_INTERVAL):
+        return 0  # under inotify, wait_for_work() adopts new files as they appear
+    _last_adopt = now
+
+    marked = set()
+    for state in STATES:
+        for e in os.scandir(QUEUE_DIR / state):
+            # Markers hidden by requeue() or a submitter (".<id>") or an archiver (".archiving-<id>") count too.
+            marked.add(e.name[e.name.find("manim-"):] if e.name.startswith(".") else e.name)
+
+    adopted = 0
+    for entry in os.scandir(JOB_DIR):
+        name = entry.name
+        if not (name.startswith("manim-") and name.endswith(".json")):
+            continue
+        job_id = name[: -len(".json")]
+        if job_id in marked:
+            continue
+        job = read_job(Path(entry.path))
+        if job and _index(job_id, job):
+            adopted += 1
+    return adopted
+
+
+def pick_job():
+    """Return (path, job) for the best queued job this process now owns, or (None, None)."""
+    adopt_unindexed()
+    reclaim_expired()
+    for entry, user in _queue_order(time.time()):
+        job_id = entry.name
+        try:
+            # Start the lease fresh: rename keeps the queued marker's mtime.
+            os.utime(entry.path)
+        except FileNotFoundError:
+            continue
+        if not move(job_id, "queued", "processing"):
+            continue  # claimed by another worker
+        p = job_path(job_id)
+        job = read_job(p)
+        if not job:
+            move(job_id, "processing", "failed")
+            continue
+        if job.get("status") != "queued":
+            # Stale or duplicate marker; file it under the job's real state.
+            status = job.get("status")
+            if status != "processing":
+                move(job_id, "processing", status if status in STATES else "failed")
+            continue
+        job.setdefault("jobId", job_id)
+        job["status"] = "processing"
+        job["workerId"] = worker_id()
+        job["attempts"] = job.get("attempts", 0) + 1
+        job.pop("retryAt", None)
+        write_job(p, job)
+        _hold(job_id)
+        _mark_served(user)
+        return p, job
+    return None, None
@@ -0,0 +1,461 @@
+"""
+Job intake and status service, co-located with the worker.
+
+Submitting a job used to mean writing a JSON file into `manim_jobs/`. Every
+open modal polled the status route every 3 s, and each poll opened and parsed
+a status record. This service (asyncio, standard library only) keeps every
+job's status record in memory and pushes changes to clients that wait on
+them:
+
+- POST /jobs                  submit one job: {"sceneParams": {...}, "prompt",
+                              "quality", "priority", "userKey"} -> 202 {"jobId", "status"}
+- POST /jobs/batch            {"jobs": [...]}, up to MAX_BATCH -> 202 {"jobs": [...]}
+- GET  /jobs/<jobId>          the status record, from memory
+- GET  /jobs?ids=<id>,<id>    up to MAX_IDS records, {"jobs": {<id>: record or null}}
+- GET  /jobs/<jobId>/wait     long poll: {"rev", "job"} once the record is newer
+                              than ?rev= (or changes, without it), the job is
+                              finished, or ?timeout= seconds (default 25) pass
+- GET  /jobs/<jobId>/events   server-sent events: a `status` event with the
+                              record now and after every change, until it is
+                              finished; `id` is the rev, so Last-Event-ID resumes
+
+The files stay the backend. A submission is written exactly as the generate
+route writes it: a hidden queued marker, the job JSON and status record,
+then the marker renamed into place. So workers, the
+Next.js routes and jobs written by other tools work as before. The service
+follows `manim_jobs/status/` with inotify (or rescans it every
+POLL_INTERVAL seconds where inotify is unavailable or MANIM_DISABLE_INOTIFY
+is set, e.g. on a network filesystem). Every status write a worker makes,
+including the last one render_job makes when it finishes, is read once and
+pushed to every waiter at once. Each change gets a new rev.
+
+The service trusts its callers (it listens on 127.0.0.1 by default): like
+the generate route, it takes `priority: "high"` only with the
+X-Manim-Priority-Key header matching MANIM_PRIORITY_KEY.
+
+Usage:
+  python job_service.py [--host 127.0.0.1] [--port 8765]
+or set MANIM_SERVICE_PORT for render_worker.py / mock_worker.py to run it
+in the supervisor.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import secrets
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+import job_queue
+from job_watch import _Inotify, IN_CLOSE_WRITE, IN_MOVED_TO
+
+HOST = os.environ.get("MANIM_SERVICE_HOST", "127.0.0.1")
+PORT = int(os.environ.get("MANIM_SERVICE_PORT", "0"))
+PRIORITY_KEY = os.environ.get("MANIM_PRIORITY_KEY")
+POLL_INTERVAL = 1.0
+HEARTBEAT_INTERVAL = 15.0
+DEFAULT_WAIT = 25.0
+MAX_WAIT = 60.0
+MAX_IDS = 100
+MAX_BATCH = 100
+MAX_BODY = 1024 * 1024
+FINISHED = ("completed", "failed")
+IN_DELETE = 0x00000200
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _is_job_id(job_id: str):
+    # Same rule as isJobId() in lib/manim-status.ts.
+    return 0 < len(job_id) <= 100 and all(c.isalnum() or c in "_-" for c in job_id) and job_id.isascii()
+
+
+def _read_json(path):
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _iso_ms(ts):
+    # Same shape as JavaScript's toISOString(), which the generate route uses for createdAt.
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts)) + f".{int(ts * 1000) % 1000:03d}Z"
+
+
+def _new_job(spec, client: str, priority_key):
+    """A queued job from a submitted spec, with the fields the generate route writes."""
+    if not isinstance(spec, dict):
+        raise HTTPError(400, "Each job must be an object")
+    scene = spec.get("sceneParams")
+    if not isinstance(scene, dict) or not isinstance(scene.get("sceneType"), str):
+        raise HTTPError(400, "Each job needs sceneParams with a sceneType")
+    priority = spec.get("priority")
+    if not (priority == "high" and PRIORITY_KEY and priority_key == PRIORITY_KEY) and priority != "low":
+        priority = "normal"
+    user = spec.get("userKey")
+    if not isinstance(user, str) or not user:
+        # Keyed like the generate route's rate limit: hashed, not the raw address.
+        user = hashlib.sha256(client.encode()).hexdigest()[:16]
+    now = time.time()
+    return {
+        # Random suffix: a batch, and the generate route, may create ids in the same millisecond.
+        "jobId": f"manim-{int(now * 1000)}-{secrets.token_hex(3)}",
+        "prompt": str(spec.get("prompt") or scene.get("title") or ""),
+        "quality": str(spec.get("quality") or "low"),
+        "status": "queued",
+        "createdAt": _iso_ms(now),
+        "sceneParams": scene,
+        "userKey": user,
+        "priority": priority,
+    }
+
+
+class JobService:
+    """Status records in memory, kept current from the status directory."""
+
+    def __init__(self):
+        self.status_dir = job_queue.JOB_DIR / "status"
+        self.records = {}
+        self.revs = {}
+        self.rev = 0
+        self.port = None
+        # job_id -> Event set on the job's next change; waiters then take a new one.
+        self._changed = {}
+        # name -> (mtime_ns, size) of status files, for the polling fallback.
+        self._stats = {}
+        self._server = None
+        self._inotify = None
+
+    # --- status records ---------------------------------------------------
+
+    def _update(self, job_id: str, record):
+        if record == self.records.get(job_id):
+            return
+        if record is None:
+            self.records.pop(job_id, None)
+            self.revs.pop(job_id, None)
+        else:
+            self.rev += 1
+            self.records[job_id] = record
+            self.revs[job_id] = self.rev
+        event = self._changed.pop(job_id, None)
+        if event:
+            event.set()
+
+    def _load(self, name: str):
+        if name.startswith(".") or not name.endswith(".json"):
+            return
+        self._update(name[: -len(".json")], _read_json(self.status_dir / name))
+
+    def _rescan(self):
+        """Read the status files that changed since the last scan (all of them, at first)."""
+        stats = {}
+        try:
+            entries = list(os.scandir(self.status_dir))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.name.endswith(".json"):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            stats[entry.name] = (st.st_mtime_ns, st.st_size)
+            if self._stats.get(entry.name) != stats[entry.name]:
+                self._load(entry.name)
+        for name in set(self._stats) - set(stats):
+            self._load(name)
+        self._stats = stats
+
+    def _on_inotify(self):
+        events = self._inotify.read(0)
+        if any(wd != self._status_wd for wd, _ in events):
+            self._rescan()  # the kernel's event queue overflowed
+            return
+        for _, name in events:
+            self._load(name)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            self._rescan()
+
+    def lookup(self, job_id: str):
+        """The job's status record, or None. Read from disk if it is not in memory yet."""
+        if job_id not in self.records:
+            record = _read_json(self.status_dir / f"{job_id}.json")
+            if record is None:
+                # A job from before status records: take the fields from its JSON.
+                job = _read_json(job_queue.job_path(job_id))
+                record = {k: job[k] for k in job_queue.STATUS_FIELDS if k in job} if job else None
+            if record is None:
+                return None
+            self._update(job_id, record)
+        return self.records[job_id]
+
+    async def wait_change(self, job_id: str, rev: int, timeout: float):
+        """Wait until the job's record is newer than `rev`, or `timeout` seconds pass."""
+        deadline = time.monotonic() + timeout
+        while self.revs.get(job_id, 0) <= rev:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            event = self._changed.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    # --- submission ---------------------------------------------------------
+
+    def submit(self, specs, client: str, priority_key=None):
+        """Queue jobs in the generate route's format; every spec is checked before any is written."""
+        jobs = [_new_job(spec, client, priority_key) for spec in specs]
+        for job in jobs:
+            # The generate route's order: the marker is hidden until the job JSON and status record exist.
+            hidden = job_queue.marker_path("queued", f".{job['jobId']}")
+            hidden.write_text(job_queue.schedule_info(job))
+            job_queue.write_job(job_queue.job_path(job["jobId"]), job)
+            os.rename(hidden, job_queue.marker_path("queued", job["jobId"]))
+            self._update(job["jobId"], {k: job[k] for k in job_queue.STATUS_FIELDS if k in job})
+        return [{"jobId": job["jobId"], "status": "queued"} for job in jobs]
+
+    # --- HTTP ---------------------------------------------------------------
+
+    async def _handle(self, reader, writer):
+        peer = (writer.get_extra_info("peername") or ("unknown",))[0]
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # Without a length the body cannot be skipped, so the connection ends here.
+                    await self._respond(writer, 400, {"error": "Invalid Content-Length"}, close=True)
+                    return
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": "Body too large"}, close=True)
+                    return
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                streamed = await self._route(writer, method, target, headers, body, peer, keep_alive)
+                if streamed or not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, writer, method, target, headers, body, peer, keep_alive):
+        """Answer one request; returns True if the connection is done (an event stream)."""
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split("/") if p]
+        try:
+            if parts[:1] != ["jobs"] or len(parts) > 3:
+                raise HTTPError(404, "Not found")
+            if method == "POST" and len(parts) <= 2:
+                if len(parts) == 2 and parts[1] != "batch":
+                    raise HTTPError(404, "Not found")
+                try:
+                    data = json.loads(body or b"null")
+                except ValueError:
+                    raise HTTPError(400, "Invalid JSON")
+                key = headers.get("x-manim-priority-key")
+                if len(parts) == 1:
+                    result = self.submit([data], peer, key)[0]
+                else:
+                    specs = data.get("jobs") if isinstance(data, dict) else None
+                    if not isinstance(specs, list) or not specs:
+                        raise HTTPError(400, "Missing jobs")
+                    if len(specs) > MAX_BATCH:
+                        raise HTTPError(400, f"At most {MAX_BATCH} jobs per request")
+                    result = {"jobs": self.submit(specs, peer, key)}
+                await self._respond(writer, 202, result, close=not keep_alive)
+                return False
+            if method != "GET":
+                raise HTTPError(405, "Method not allowed")
+
+            if len(parts) == 1:
+                ids = [i.strip() for i in ",".join(query.get("ids", [])).split(",") if i.strip()]
+                if not ids:
+                    raise HTTPError(400, "Missing ids")
+                if len(ids) > MAX_IDS:
+                    raise HTTPError(400, f"At most {MAX_IDS} ids per request")
+                jobs = {i: self.lookup(i) if _is_job_id(i) else None for i in ids}
+                await self._respond(writer, 200, {"jobs": jobs}, close=not keep_alive)
+                return False
+
+            job_id = parts[1]
+            if not _is_job_id(job_id) or self.lookup(job_id) is None:
+                raise HTTPError(404, "Job not found")
+            if len(parts) == 2:
+                await self._respond(writer, 200, self.records[job_id], close=not keep_alive)
+                return False
+            if parts[2] == "wait":
+                await self._wait(writer, job_id, query, keep_alive)
+                return False
+            if parts[2] == "events":
+                await self._events(writer, job_id, headers)
+                return True
+            raise HTTPError(404, "Not found")
+        except HTTPError as e:
+            await self._respond(writer, e.status, {"error": str(e)}, close=not keep_alive)
+            return False
+        except ConnectionError:
+            raise
+        except Exception as e:
+            print(f"Job service: {method} {url.path} failed: {e!r}")
+            if parts[2:3] != ["events"]:  # an event stream has already sent its headers
+                await self._respond(writer, 500, {"error": "Internal error"}, close=True)
+            return True
+
+    async def _wait(self, writer, job_id, query, keep_alive):
+        try:
+            rev = int(query["rev"][0]) if "rev" in query else self.revs.get(job_id, 0)
+            timeout = min(float(query.get("timeout", [DEFAULT_WAIT])[0]), MAX_WAIT)
+        except ValueError:
+            raise HTTPError(400, "rev and timeout must be numbers")
+        record = self.records.get(job_id) or {}
+        if record.get("status") not in FINISHED:
+            await self.wait_change(job_id, rev, timeout)
+        if job_id not in self.records:
+            raise HTTPError(404, "Job not found")  # archived while we waited
+        body = {"rev": self.revs[job_id], "job": self.records[job_id]}
+        await self._respond(writer, 200, body, close=not keep_alive)
+
+    async def _events(self, writer, job_id, headers):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        try:
+            last = int(headers.get("last-event-id") or 0)
+        except ValueError:
+            last = 0
+        while job_id in self.records:
+            rev = self.revs[job_id]
+            record = self.records[job_id]
+            if rev > last:
+                writer.write(f"id: {rev}\nevent: status\ndata: {json.dumps(record)}\n\n".encode())
+                last = rev
+            if record.get("status") in FINISHED:
+                break
+            if not await self.wait_change(job_id, last, HEARTBEAT_INTERVAL):
+                writer.write(b": keepalive\n\n")  # so proxies keep the stream open
+            await writer.drain()
+        await writer.drain()
+
+    async def _respond(self, writer, status, body, close=False):
+        data = json.dumps(body).encode()
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+        )
+        if close:
+            head += "Connection: close\r\n"
+        writer.write(head.encode() + b"\r\n" + data)
+        await writer.drain()
+
+    # --- lifecycle ----------------------------------------------------------
+
+    async def start(self, host=HOST, port=PORT):
+        self.status_dir.mkdir(parents=True, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        if not os.environ.get("MANIM_DISABLE_INOTIFY"):
+            try:
+                self._inotify = _Inotify()
+                self._status_wd = self._inotify.add_watch(self.status_dir, IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE)
+                loop.add_reader(self._inotify.fd, self._on_inotify)
+            except (OSError, AttributeError) as e:
+                print("inotify unavailable, the job service polls instead:", e)
+                self._inotify = None
+        self._rescan()  # after the watch is set up, so no change falls in between
+        if self._inotify is None:
+            loop.create_task(self._poll())
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        mode = "inotify" if self._inotify else "polling"
+        print(f"Job service on http://{host}:{self.port} ({len(self.records)} jobs, {mode})")
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+
+def start_in_background(host=HOST, port=PORT):
+    """Run a JobService on its own event loop in a daemon thread; returns it once it listens."""
+    service = JobService()
+    ready = threading.Event()
+
+    async def run():
+        try:
+            await service.start(host, port)
+        finally:
+            ready.set()
+        await service.serve_forever()
+
+    def main():
+        try:
+            asyncio.run(run())
+        except Exception as e:
+            print(f"Job service stopped: {e}")
+
+    threading.Thread(target=main, name="job-service", daemon=True).start()
+    ready.wait()
+    return service
+
+
+def start_server():
+    """Start the service if MANIM_SERVICE_PORT is set (supervisor only)."""
+    if PORT:
+        start_in_background()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manim job intake and status service")
+    parser.add_argument("--host", default=HOST, help="address to listen on (env MANIM_SERVICE_HOST)")
+    parser.add_argument("--port", type=int, default=PORT or 8765, help="port (env MANIM_SERVICE_PORT, default 8765)")
+    args = parser.parse_args()
+    job_queue.ensure_dirs()
+
+    async def run():
+        service = JobService()
+        await service.start(args.host, args.port)
+        await service.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Job service stopped")
+
+
+if __name__ == "__main__":
+    main()
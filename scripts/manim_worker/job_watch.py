@@ -0,0 +1,120 @@
+"""
+Wake idle workers as soon as a job arrives.
+
+On Linux an inotify watch on `queue/queued/` (new markers) and on the job
+directory (job files written without a marker) wakes the worker the moment a
+job is enqueued. Elsewhere, or if inotify is unavailable, the watcher falls
+back to polling with exponential backoff: quick re-polls right after work,
+slowing down to MAX_POLL_INTERVAL while the queue stays empty.
+"""
+
+import os
+import sys
+import time
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+
+MIN_POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 2.0
+# Even with inotify, wake up this often so periodic queue upkeep still runs.
+IDLE_TIMEOUT = 5.0
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(path)), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        return wd
+
+    def read(self, timeout):
+        """Return [(wd, name)] for events within `timeout` seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(buf):
+            wd, _mask, _cookie, length = _EVENT.unpack_from(buf, offset)
+            offset += _EVENT.size
+            name = buf[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            events.append((wd, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class JobWatcher:
+    """
+    Block until new work may be available.
+
+    `wait()` returns the names of job files that were written in the job
+    directory (so the caller can index ones that lack a marker); an empty
+    list means "poll again", and None that the kernel's event queue
+    overflowed, so some names were lost and the caller should rescan.
+    """
+
+    def __init__(self, job_dir, queued_dir):
+        self.interval = MIN_POLL_INTERVAL
+        self._inotify = None
+        if sys.platform.startswith("linux") and not os.environ.get("MANIM_DISABLE_INOTIFY"):
+            try:
+                ino = _Inotify()
+                self._queued_wd = ino.add_watch(queued_dir, IN_CREATE | IN_MOVED_TO)
+                self._jobs_wd = ino.add_watch(job_dir, IN_CLOSE_WRITE | IN_MOVED_TO)
+                self._inotify = ino
+            except (OSError, AttributeError) as e:
+                print("inotify unavailable, falling back to polling:", e)
+
+    @property
+    def mode(self):
+        return "inotify" if self._inotify else "poll"
+
+    def reset(self):
+        """Call after finding work so the next idle poll happens quickly."""
+        self.interval = MIN_POLL_INTERVAL
+
+    def wait(self):
+        if self._inotify is None:
+            time.sleep(self.interval)
+            self.interval = min(self.interval * 2, MAX_POLL_INTERVAL)
+            return []
+
+        names = []
+        for wd, name in self._inotify.read(IDLE_TIMEOUT):
+            if wd not in (self._queued_wd, self._jobs_wd):
+                return None  # the kernel's event queue overflowed
+            if wd == self._jobs_wd and name.startswith("manim-") and name.endswith(".json"):
+                names.append(name)
+        return names
+
+    def close(self):
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
@@ -0,0 +1,257 @@
+"""
+Disk lifecycle of jobs and videos.
+
+Every job used to leave its workdir, its JSON and its mp4s behind forever,
+and the job directory and the output directory slowed every listing as they
+grew. Three steps now bound the footprint:
+
+- Workdirs: reclaim_workdir() deletes a job's workdir (`manim_jobs/<jobId>/`,
+  holding scenes.json and Manim's media tree of partial movies) as soon as its
+  final mp4 exists. Failed jobs keep theirs for debugging until they are
+  archived. Set MANIM_KEEP_WORKDIRS=1 to keep them all.
+- Archive: a finished job (completed, failed or dead) whose marker is older
+  than MANIM_ARCHIVE_AFTER seconds (default 7 days) is appended as one JSON
+  line to `manim_jobs/archive/jobs-<YYYY-MM>.jsonl`. Its job JSON, status
+  record, profile capture, marker and workdir are then deleted, and the
+  status routes answer 404 for it.
+- Video retention: files in the output directory (mp4s and HLS directories)
+  not used for MANIM_VIDEO_MAX_AGE seconds are deleted. After that the least
+  recently used go until the directory is under MANIM_VIDEO_MAX_BYTES. Both
+  are 0 (off) by default; the render cache's own size cap
+  (MANIM_CACHE_MAX_BYTES) still applies. Videos the render cache has pinned
+  and anything touched in the last hour are never deleted.
+
+Workers call sweep() from their poll loop, at most every
+MANIM_LIFECYCLE_INTERVAL seconds (default 300). Several workers may sweep the
+same directory: a job is claimed for archiving by renaming its marker, and
+deleting a video twice is harmless.
+
+Usage:
+  python lifecycle.py            # disk usage per stage
+  python lifecycle.py --sweep    # archive and apply retention now, then report
+"""
+
+import os
+import json
+import time
+import shutil
+import argparse
+from pathlib import Path
+
+import job_queue
+import render_cache
+from job_queue import ROOT, JOB_DIR, QUEUE_DIR, job_path, read_job, status_path
+
+OUTPUT_DIR = Path(os.environ.get("MANIM_OUTPUT_DIR") or ROOT / "public" / "manim_videos")
+ARCHIVE_DIR = JOB_DIR / "archive"
+
+KEEP_WORKDIRS = os.environ.get("MANIM_KEEP_WORKDIRS", "0") == "1"
+ARCHIVE_AFTER = float(os.environ.get("MANIM_ARCHIVE_AFTER", str(7 * 24 * 3600)))
+VIDEO_MAX_AGE = float(os.environ.get("MANIM_VIDEO_MAX_AGE", "0"))
+VIDEO_MAX_BYTES = int(os.environ.get("MANIM_VIDEO_MAX_BYTES", "0"))
+INTERVAL = float(os.environ.get("MANIM_LIFECYCLE_INTERVAL", "300"))
+# Videos touched more recently than this are in use (rendering, just published).
+VIDEO_GRACE = 3600
+FINISHED = ("completed", "failed", "dead")
+ARCHIVING = ".archiving-"
+
+_last_sweep = 0.0
+
+
+def reclaim_workdir(workdir: Path):
+    """Delete a job's intermediates once its final mp4 exists."""
+    if not KEEP_WORKDIRS:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _append_archive(job: dict):
+    ARCHIVE_DIR.mkdir(exist_ok=True)
+    path = ARCHIVE_DIR / f"jobs-{time.strftime('%Y-%m', time.gmtime())}.jsonl"
+    # One write() on an O_APPEND descriptor, so lines from several workers never interleave.
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, (json.dumps(job) + "\n").encode())
+    finally:
+        os.close(fd)
+
+
+def _archive(job_id: str, marker: Path):
+    p = job_path(job_id)
+    job = read_job(p)
+    if job:
+        _append_archive(job)
+    for path in (status_path(p), p, p.with_suffix(".profile"), marker):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+    shutil.rmtree(p.with_suffix(""), ignore_errors=True)
+    return job is not None
+
+
+def archive_finished(now=None):
+    """Archive finished jobs older than ARCHIVE_AFTER; returns how many."""
+    now = now or time.time()
+    archived = 0
+    for state in FINISHED:
+        try:
+            entries = list(os.scandir(QUEUE_DIR / state))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            try:
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if entry.name.startswith(ARCHIVING):
+                # An archive a dead worker left half done; the marker is touched on claim.
+                if mtime < now - job_queue.LEASE_TTL:
+                    archived += _archive(entry.name[len(ARCHIVING):], Path(entry.path))
+                continue
+            if entry.name.startswith(".") or mtime > now - ARCHIVE_AFTER:
+                continue
+            claimed = QUEUE_DIR / state / f"{ARCHIVING}{entry.name}"
+            try:
+                os.rename(entry.path, claimed)
+                os.utime(claimed)
+            except FileNotFoundError:
+                continue  # archived by another worker
+            archived += _archive(entry.name, claimed)
+    return archived
+
+
+def _tree_size(path: str):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def _videos():
+    """(last used, size, path) of every mp4 and HLS directory in OUTPUT_DIR."""
+    cached = render_cache.local_entries()
+    videos = []
+    try:
+        entries = list(os.scandir(OUTPUT_DIR))
+    except FileNotFoundError:
+        return videos, set()
+    for entry in entries:
+        try:
+            if entry.is_dir():
+                if not entry.name.endswith("-hls"):
+                    continue
+                size = _tree_size(entry.path)
+            elif entry.name.endswith(".mp4"):
+                size = entry.stat().st_size
+            else:
+                continue
+            mtime = entry.stat().st_mtime
+        except FileNotFoundError:
+            continue
+        used = max(mtime, cached.get(entry.path, {}).get("lastUsed", 0))
+        videos.append((used, size, entry.path))
+    pinned = {path for path, e in cached.items() if e.get("pinned")}
+    return videos, pinned
+
+
+def enforce_retention(now=None):
+    """Delete videos past VIDEO_MAX_AGE, then LRU down to VIDEO_MAX_BYTES; returns how many."""
+    if not VIDEO_MAX_AGE and not VIDEO_MAX_BYTES:
+        return 0
+    now = now or time.time()
+    videos, pinned = _videos()
+    total = sum(size for _, size, _ in videos)
+    removed = []
+    for used, size, path in sorted(videos):
+        expired = VIDEO_MAX_AGE and used < now - VIDEO_MAX_AGE
+        over = VIDEO_MAX_BYTES and total > VIDEO_MAX_BYTES
+        if not (expired or over):
+            continue
+        if path in pinned or used > now - VIDEO_GRACE:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+        removed.append(path)
+    render_cache.forget(removed)
+    return len(removed)
+
+
+def sweep(force=False):
+    """Archive old jobs and apply video retention, at most every INTERVAL seconds."""
+    global _last_sweep
+    now = time.time()
+    if not force and now - _last_sweep < INTERVAL:
+        return
+    _last_sweep = now
+    archived = archive_finished(now)
+    removed = enforce_retention(now)
+    if archived or removed:
+        print(f"Lifecycle: archived {archived} job(s), removed {removed} video(s)")
+
+
+def usage():
+    """Files and bytes per stage. Hard-linked files (the media cache) count once."""
+    seen = set()
+
+    def measure(paths):
+        files = size = 0
+        for path in paths:
+            walk = os.walk(path) if os.path.isdir(path) else [(os.path.dirname(path), [], [os.path.basename(path)])]
+            for root, _, names in walk:
+                for name in names:
+                    try:
+                        st = os.stat(os.path.join(root, name))
+                    except FileNotFoundError:
+                        continue
+                    if (st.st_dev, st.st_ino) in seen:
+                        continue
+                    seen.add((st.st_dev, st.st_ino))
+                    files += 1
+                    size += st.st_size
+        return {"files": files, "bytes": size}
+
+    def listing(directory, keep):
+        try:
+            return [e.path for e in os.scandir(directory) if keep(e)]
+        except FileNotFoundError:
+            return []
+
+    cache = JOB_DIR / "cache"
+    report = {
+        "workdirs": measure(listing(JOB_DIR, lambda e: e.name.startswith("manim-") and e.is_dir())),
+        "jobRecords": measure(listing(JOB_DIR, lambda e: e.name.startswith("manim-") and e.name.endswith(".json"))),
+        "profiles": measure(listing(JOB_DIR, lambda e: e.name.startswith("manim-") and e.name.endswith(".profile"))),
+        "statusRecords": measure([JOB_DIR / "status"]),
+        "queue": measure([QUEUE_DIR]),
+        "archive": measure([ARCHIVE_DIR]),
+        "mediaCache": measure([cache / "media", cache / "media-slots"]),
+        "renderCache": measure([cache]),
+        "videos": measure(listing(OUTPUT_DIR, lambda e: e.name.endswith(".mp4") and not e.name.endswith("-preview.mp4"))),
+        "previews": measure(listing(OUTPUT_DIR, lambda e: e.name.endswith("-preview.mp4"))),
+        "hls": measure(listing(OUTPUT_DIR, lambda e: e.name.endswith("-hls"))),
+    }
+    report["total"] = {k: sum(stage[k] for stage in report.values()) for k in ("files", "bytes")}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manim job and video disk lifecycle")
+    parser.add_argument("--sweep", action="store_true", help="archive old jobs and apply video retention first")
+    args = parser.parse_args()
+    if args.sweep:
+        sweep(force=True)
+    print(json.dumps(usage(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Shared cache of Manim's compiled LaTeX (MathTex/Tex) and text glyph SVGs.
+
+Manim keeps these under `media/Tex` and `media/texts`, named by a hash of
+their source, but every job renders in a fresh workdir, so labels like q0 or
+the quadratic formula were recompiled for every job. Now each slot renders
+with persistent private tex/text directories
+(`manim_jobs/cache/media-slots/<host>-slot<N>/`), synced with the shared
+`manim_jobs/cache/media/`:
+
+- prepare() before a render hard-links shared files the slot lacks, and
+  drops private files the shared cache no longer has (evicted, or left by a
+  render that failed and was never published);
+- publish() after a successful render hard-links the slot's new files into
+  the shared directory. A link appears complete or not at all, so no slot
+  ever reads another's half-written SVG, which sharing Manim's own
+  directories would allow.
+
+The shared directory is kept under MANIM_MEDIA_CACHE_MAX_BYTES (default
+512 MiB) by deleting the oldest files first. Set MANIM_MEDIA_CACHE=0 to use
+per-job directories as before.
+"""
+
+import os
+import time
+import socket
+import tempfile
+from pathlib import Path
+
+from job_queue import JOB_DIR
+
+SHARED_DIR = JOB_DIR / "cache" / "media"
+SLOTS_DIR = JOB_DIR / "cache" / "media-slots"
+ENABLED = os.environ.get("MANIM_MEDIA_CACHE", "1") != "0"
+MAX_BYTES = int(os.environ.get("MANIM_MEDIA_CACHE_MAX_BYTES", str(512 * 1024 ** 2)))
+EVICT_INTERVAL = 60
+
+# Manim config key -> directory name
+KINDS = {"tex_dir": "Tex", "text_dir": "texts"}
+
+_private = None
+_last_evict = 0.0
+
+
+def attach(slot: int):
+    """Use this slot's persistent private directories for its renders."""
+    global _private
+    _private = SLOTS_DIR / f"{socket.gethostname()}-slot{slot}"
+
+
+def _private_dir():
+    global _private
+    if _private is None:
+        # Not in a slot (benchmarks, one-off scripts): a private dir per process.
+        SLOTS_DIR.mkdir(parents=True, exist_ok=True)
+        _private = Path(tempfile.mkdtemp(prefix=f"{socket.gethostname()}-{os.getpid()}-", dir=SLOTS_DIR))
+    return _private
+
+
+def _names(path: Path):
+    try:
+        return {e.name for e in os.scandir(path) if not e.name.startswith(".")}
+    except FileNotFoundError:
+        return set()
+
+
+def prepare():
+    """Sync the slot's directories from the shared cache; returns Manim config overrides."""
+    if not ENABLED:
+        return {}
+    config = {}
+    for key, kind in KINDS.items():
+        shared, private = SHARED_DIR / kind, _private_dir() / kind
+        shared.mkdir(parents=True, exist_ok=True)
+        private.mkdir(parents=True, exist_ok=True)
+        shared_names, private_names = _names(shared), _names(private)
+        for name in private_names - shared_names:
+            (private / name).unlink(missing_ok=True)
+        for name in shared_names - private_names:
+            try:
+                os.link(shared / name, private / name)
+            except (FileNotFoundError, FileExistsError):
+                pass
+        config[key] = str(private)
+    return config
+
+
+def publish():
+    """Share the files the last render compiled, then evict if over size."""
+    if not ENABLED:
+        return
+    for kind in KINDS.values():
+        shared, private = SHARED_DIR / kind, _private_dir() / kind
+        for name in _names(private) - _names(shared):
+            try:
+                os.link(private / name, shared / name)
+            except (FileNotFoundError, FileExistsError):
+                pass
+    evict()
+
+
+def evict(force=False):
+    global _last_evict
+    now = time.time()
+    if not force and now - _last_evict < EVICT_INTERVAL:
+        return 0
+    _last_evict = now
+    files = []
+    for kind in KINDS.values():
+        for entry in os.scandir(SHARED_DIR / kind):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= MAX_BYTES:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def manim_cfg(config: dict):
+    """A manim.cfg that points the CLI at the given directories."""
+    return "[CLI]\n" + "".join(f"{key} = {value}\n" for key, value in config.items())
@@ -0,0 +1,252 @@
+"""
+Worker metrics in the Prometheus text format.
+
+Each slot process keeps its counters and histograms in memory and writes a
+snapshot to `manim_jobs/metrics/<host>-slot<N>.json` after every job, so a
+restarted slot carries on from its predecessor's counts. The supervisor
+merges its host's snapshots with the queue depth and the render cache stats
+and exports them:
+
+- MANIM_METRICS_PORT: serve them on http://0.0.0.0:<port>/metrics
+- MANIM_METRICS_TEXTFILE: rewrite this file every 15 s (node_exporter
+  textfile collector)
+
+The per-stage times also go on the job JSON as `timings`:
+{stage: {"start": <ISO time>, "seconds": <duration>}}, with stages wait,
+build, render, preview_render, upload, preview_upload and write (the total
+of all JSON writes so far).
+
+Usage:
+  python metrics.py        # print the current metrics
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import job_queue
+import render_cache
+from job_queue import JOB_DIR
+
+METRICS_DIR = JOB_DIR / "metrics"
+PORT = int(os.environ.get("MANIM_METRICS_PORT", "0"))
+TEXTFILE = os.environ.get("MANIM_METRICS_TEXTFILE")
+TEXTFILE_INTERVAL = 15
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# name -> (type, help) for the per-slot metrics
+METRICS = {
+    "manim_jobs_total": ("counter", "Jobs finished, by status"),
+    "manim_job_failures_total": ("counter", "Failed jobs, by failureReason"),
+    "manim_job_wait_seconds": ("histogram", "Time from createdAt until a slot claimed the job"),
+    "manim_job_seconds": ("histogram", "Time from claim until the job finished"),
+    "manim_stage_seconds": ("histogram", "Time spent per stage (build, render, upload, write)"),
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_source = None
+
+
+def _iso(ts):
+    # Same shape as JavaScript's toISOString(), which the API uses for createdAt.
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def _labels(labels):
+    return ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+
+
+def inc(name, n=1, **labels):
+    with _lock:
+        series = _counters.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0) + n
+
+
+def observe(name, seconds, **labels):
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        h = series.setdefault(_labels(labels), {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h["buckets"][i] += 1
+        h["sum"] += seconds
+        h["count"] += 1
+
+
+def _snapshot_path(source):
+    return METRICS_DIR / f"{socket.gethostname()}-{source}.json"
+
+
+def set_source(source: str):
+    """Name this process's snapshot (e.g. slot0) and resume its counts."""
+    global _source, _counters, _histograms
+    _source = source
+    try:
+        snapshot = json.loads(_snapshot_path(source).read_text())
+    except (FileNotFoundError, ValueError):
+        return
+    with _lock:
+        _counters = snapshot.get("counters", {})
+        _histograms = snapshot.get("histograms", {})
+
+
+def flush():
+    if _source is None:
+        return
+    METRICS_DIR.mkdir(parents=True, exist_ok=True)
+    path = _snapshot_path(_source)
+    with _lock:
+        data = json.dumps({"counters": _counters, "histograms": _histograms})
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(data)
+    os.replace(tmp, path)
+
+
+def record(job: dict, stage_name: str, start: float, seconds: float):
+    """Add one stage's time to the job's `timings` and the stage histogram."""
+    with _lock:
+        timings = job.setdefault("timings", {})
+        entry = timings.setdefault(stage_name, {"start": _iso(start), "seconds": 0.0})
+        entry["seconds"] = round(entry["seconds"] + seconds, 3)
+    observe("manim_stage_seconds", seconds, stage=stage_name)
+
+
+@contextmanager
+def stage(job: dict, stage_name: str):
+    start = time.time()
+    try:
+        yield
+    finally:
+        record(job, stage_name, start, time.time() - start)
+
+
+def claimed(job: dict):
+    """Record how long a job waited in the queue; call right after pick_job()."""
+    now = time.time()
+    job["claimedAt"] = _iso(now)
+    created = _parse_time(job.get("createdAt"))
+    if created is not None:
+        wait = max(0.0, now - created)
+        job.setdefault("timings", {})["wait"] = {"start": job["createdAt"], "seconds": round(wait, 3)}
+        observe("manim_job_wait_seconds", wait)
+
+
+def finished(job: dict):
+    """Count a job's outcome and flush this process's snapshot."""
+    status = job.get("status", "unknown")
+    inc("manim_jobs_total", status=status)
+    if status == "failed":
+        inc("manim_job_failures_total", reason=job.get("failureReason", "unknown"))
+    claimed_at = _parse_time(job.get("claimedAt"))
+    if claimed_at is not None:
+        observe("manim_job_seconds", time.time() - claimed_at)
+    flush()
+
+
+def _series(name, *labels):
+    return f"{name}{{{','.join(l for l in labels if l)}}}"
+
+
+def render_text():
+    """All metrics for this host, in the Prometheus text format."""
+    snapshots = {}
+    for path in sorted(METRICS_DIR.glob(f"{socket.gethostname()}-*.json")):
+        try:
+            snapshots[path.stem] = json.loads(path.read_text())
+        except ValueError:
+            continue
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for source, snapshot in snapshots.items():
+            worker = f'worker="{source}"'
+            if kind == "counter":
+                for labels, value in snapshot.get("counters", {}).get(name, {}).items():
+                    lines.append(f"{_series(name, labels, worker)} {value}")
+                continue
+            for labels, h in snapshot.get("histograms", {}).get(name, {}).items():
+                for bound, count in [*zip(BUCKETS, h["buckets"]), ("+Inf", h["count"])]:
+                    le = f'le="{bound}"'
+                    lines.append(f"{_series(name + '_bucket', labels, worker, le)} {count}")
+                lines.append(f"{_series(name + '_sum', labels, worker)} {h['sum']:.6f}")
+                lines.append(f"{_series(name + '_count', labels, worker)} {h['count']}")
+
+    lines.append("# HELP manim_queue_depth Jobs per queue state")
+    lines.append("# TYPE manim_queue_depth gauge")
+    for state, depth in job_queue.queue_depth().items():
+        lines.append(f'manim_queue_depth{{state="{state}"}} {depth}')
+
+    cache = render_cache.stats()
+    for key, name, kind in (
+        ("hits", "manim_cache_hits_total", "counter"),
+        ("misses", "manim_cache_misses_total", "counter"),
+        ("previewHits", "manim_cache_preview_hits_total", "counter"),
+        ("previewMisses", "manim_cache_preview_misses_total", "counter"),
+        ("evictions", "manim_cache_evictions_total", "counter"),
+        ("coalesced", "manim_coalesced_jobs_total", "counter"),
+        ("hitRate", "manim_cache_hit_ratio", "gauge"),
+        ("bytes", "manim_cache_bytes", "gauge"),
+    ):
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {cache.get(key, 0)}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _write_textfile():
+    while True:
+        try:
+            tmp = TEXTFILE + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(render_text())
+            os.replace(tmp, TEXTFILE)
+        except Exception as e:
+            print(f"Writing metrics to {TEXTFILE} failed: {e}")
+        time.sleep(TEXTFILE_INTERVAL)
+
+
+def start_exporter():
+    """Start the configured exporters in background threads (supervisor only)."""
+    if PORT:
+        server = ThreadingHTTPServer(("0.0.0.0", PORT), _Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"Serving metrics on http://0.0.0.0:{PORT}/metrics")
+    if TEXTFILE:
+        threading.Thread(target=_write_textfile, name="metrics-textfile", daemon=True).start()
+        print(f"Writing metrics to {TEXTFILE} every {TEXTFILE_INTERVAL}s")
+
+
+if __name__ == "__main__":
+    print(render_text(), end="")
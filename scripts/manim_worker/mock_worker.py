@@ -4,40 +4,54 @@ Mock Manim worker for local development and CI.
 This does NOT require Manim or Docker. It polls `manim_jobs/` for queued jobs,
 waits a short time, writes a dummy mp4 file under `public/manim_videos/`, and
 updates the job JSON with a `resultUrl` so the frontend and e2e tests can proceed.
+
+Fault injection: a job with `"mockFault": "hang"` never finishes (the
+watchdog has to kill its slot), `"crash"` exits the slot process, and
+`"error"` raises. MOCK_RENDER_SECONDS sets the simulated render time; a
+job's `mockRenderSeconds` overrides it (bench_load.py samples it per job).
 """
+import os
 import time
-import json
+import argparse
 from pathlib import Path
 
-ROOT = Path(__file__).resolve().parents[2]
-JOB_DIR = ROOT / 'manim_jobs'
-OUTPUT_DIR = ROOT / 'public' / 'manim_videos'
+import coalesce
+import job_queue
+import job_service
+import lifecycle
+import metrics
+import render_limits
+import worker_pool
+from job_queue import ROOT, JOB_DIR, pick_job, write_job
+from worker_pool import add_slots_argument, run_slots
+
+OUTPUT_DIR = Path(os.environ.get('MANIM_OUTPUT_DIR') or ROOT / 'public' / 'manim_videos')
+RENDER_SECONDS = float(os.environ.get('MOCK_RENDER_SECONDS', '2'))
 
 
 def ensure_dirs():
-    JOB_DIR.mkdir(exist_ok=True)
+    job_queue.ensure_dirs()
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def pick_job():
-    for p in JOB_DIR.glob('manim-*.json'):
-        try:
-            job = json.loads(p.read_text())
-            if job.get('status') == 'queued':
-                return p, job
-        except Exception:
-            continue
-    return None, None
-
-
-def write_job(p, job):
-    p.write_text(json.dumps(job, indent=2))
+def inject_fault(job: dict):
+    fault = job.get('mockFault')
+    if fault == 'hang':
+        while True:
+            time.sleep(60)
+    if fault == 'crash':
+        os._exit(1)
+    if fault == 'error':
+        raise RuntimeError('injected render error')
 
 
-def render_job(job_file: Path, job: dict):
-    job['status'] = 'processing'
-    write_job(job_file, job)
-    time.sleep(2)  # simulate work
+def render_job(job_file, job: dict):
+    if not coalesce.join(coalesce.spec_key(job), job):
+        return
+    worker_pool.watch(job['jobId'], render_limits.JOB_TIMEOUT)
+    with metrics.stage(job, 'render'):
+        inject_fault(job)
+        time.sleep(float(job.get('mockRenderSeconds', RENDER_SECONDS)))  # simulate work
     out_name = f"{job['jobId']}.mp4"
     out_path = OUTPUT_DIR / out_name
     # create an empty file to simulate an mp4
@@ -48,17 +62,45 @@ def render_job(job_file: Path, job: dict):
     write_job(job_file, job)
 
 
+def worker_loop(slot: int):
+    metrics.set_source(f'slot{slot}')
+    watcher = job_queue.watcher()
+    while True:
+        coalesce.sweep()
+        lifecycle.sweep()
+        job_file, job = pick_job()
+        if job_file:
+            print(f'[slot {slot}] Processing', job_file)
+            metrics.claimed(job)
+            try:
+                render_job(job_file, job)
+            except Exception as e:
+                job['status'] = 'failed'
+                job['error'] = str(e)
+                job['failureReason'] = 'worker_error'
+                write_job(job_file, job)
+            finally:
+                worker_pool.unwatch()
+                if not job.get('coalescedWith'):
+                    job_queue.finish(job)
+                    coalesce.release(job)
+                    metrics.finished(job)
+            watcher.reset()
+        else:
+            job_queue.wait_for_work(watcher)
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Mock Manim worker')
+    add_slots_argument(parser)
+    args = parser.parse_args()
+
     ensure_dirs()
-    print('Mock manim worker started; polling', JOB_DIR)
+    print(f'Mock manim worker started with {args.slots} slot(s); polling', JOB_DIR)
+    metrics.start_exporter()
+    job_service.start_server()
     try:
-        while True:
-            job_file, job = pick_job()
-            if job_file:
-                print('Processing', job_file)
-                render_job(job_file, job)
-            else:
-                time.sleep(1)
+        run_slots(worker_loop, args.slots, on_stuck=job_queue.release_stuck)
     except KeyboardInterrupt:
         print('Mock worker stopped')
 
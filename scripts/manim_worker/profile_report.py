@@ -0,0 +1,115 @@
+"""
+Top hot spots of slow renders, per sceneType.
+
+Reads the captures profiling.py saved next to slow jobs
+(`manim_jobs/<jobId>.profile`) and, for each sceneType, sums every
+function's own and inclusive time over the captured renders. A function
+that climbs this list after a change to a `build_*_scene` template (or to
+scenes.py) is where the template got slower. The tex, text and concat
+sub-timings are averaged per render, and the upload time per job.
+
+Usage:
+  python profile_report.py [--scene-type dfa] [--top 15] [--since 7] [--by self|total] [--json]
+"""
+
+import json
+import time
+import argparse
+from datetime import datetime
+
+from job_queue import JOB_DIR, read_job
+
+
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def load_captures(since_days=None):
+    cutoff = time.time() - since_days * 24 * 3600 if since_days else None
+    captures = []
+    for path in sorted(JOB_DIR.glob("manim-*.profile")):
+        capture = read_job(path)
+        if not capture:
+            continue
+        captured = _parse_time(capture.get("capturedAt"))
+        if cutoff and (captured is None or captured < cutoff):
+            continue
+        captures.append(capture)
+    return captures
+
+
+def aggregate(captures):
+    """
+    sceneType -> jobs, renders, render seconds, sub-timings per render,
+    upload seconds per job and per-function totals.
+    """
+    report = {}
+    for capture in captures:
+        scene = report.setdefault(capture.get("sceneType") or "unknown", {
+            "jobs": 0, "renders": 0, "seconds": 0.0, "uploadSeconds": 0.0, "subTimings": {}, "functions": {},
+        })
+        scene["jobs"] += 1
+        timings = capture.get("timings", {})
+        scene["uploadSeconds"] += sum(timings.get(s, {}).get("seconds", 0) for s in ("upload", "preview_upload"))
+        for render in capture.get("renders", []):
+            scene["renders"] += 1
+            scene["seconds"] += render.get("seconds", 0)
+            for name, sub in render.get("subTimings", {}).items():
+                scene["subTimings"][name] = scene["subTimings"].get(name, 0.0) + sub["seconds"]
+            for f in render.get("functions", []):
+                entry = scene["functions"].setdefault(f["func"], {"self": 0.0, "total": 0.0, "renders": 0})
+                entry["self"] += f["self"]
+                entry["total"] += f["total"]
+                entry["renders"] += 1
+    for scene in report.values():
+        renders = scene["renders"] or 1
+        scene["subTimings"] = {k: round(v / renders, 3) for k, v in scene["subTimings"].items()}
+        scene["uploadSeconds"] = round(scene["uploadSeconds"] / scene["jobs"], 3)
+    return report
+
+
+def hot_spots(scene, top, by="self"):
+    ranked = sorted(scene["functions"].items(), key=lambda item: item[1][by], reverse=True)
+    return [{"func": name, **{k: round(v, 3) for k, v in entry.items()}} for name, entry in ranked[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot spots of slow Manim renders per sceneType")
+    parser.add_argument("--scene-type", help="only this sceneType")
+    parser.add_argument("--top", type=int, default=15, help="functions per sceneType (default 15)")
+    parser.add_argument("--since", type=float, help="only captures from the last N days")
+    parser.add_argument("--by", choices=["self", "total"], default="self",
+                        help="rank by own time or by time including callees (default self)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = aggregate(load_captures(args.since))
+    if args.scene_type:
+        report = {k: v for k, v in report.items() if k == args.scene_type.lower()}
+    if args.json:
+        print(json.dumps({
+            name: {**{k: v for k, v in scene.items() if k != "functions"}, "hotSpots": hot_spots(scene, args.top, args.by)}
+            for name, scene in report.items()
+        }, indent=2))
+        return
+    if not report:
+        print(f"No profile captures in {JOB_DIR}")
+        return
+
+    for name, scene in sorted(report.items(), key=lambda item: item[1]["seconds"], reverse=True):
+        mean = scene["seconds"] / (scene["renders"] or 1)
+        subs = ", ".join(f"{k} {v:.2f}s" for k, v in sorted(scene["subTimings"].items()))
+        print(f"{name}: {scene['jobs']} job(s), {scene['renders']} slow render(s), {mean:.1f}s per render")
+        print(f"  per render: {subs or 'no sub-timings'}; upload {scene['uploadSeconds']:.2f}s per job")
+        print(f"  {'self s':>9}  {'total s':>9}  {'share':>6}  {'renders':>7}  function")
+        for f in hot_spots(scene, args.top, args.by):
+            share = f["total"] / scene["seconds"] if scene["seconds"] else 0.0
+            print(f"  {f['self']:9.2f}  {f['total']:9.2f}  {share:6.0%}  {f['renders']:>7}  {f['func']}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
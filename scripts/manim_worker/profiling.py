@@ -0,0 +1,354 @@
+"""
+Profile captures of slow renders.
+
+A render that takes far longer than its sceneType usually does could be
+spending the time in LaTeX, text layout, the ffmpeg concat or anything else,
+and the job record only says how long the render stage took. With
+MANIM_PROFILE set, every render runs with a profiler inside the process that
+draws it. The CLI renderer starts manim through this file (`python
+profiling.py --out <file> -- manim ...`), and the warm renderer starts a
+Capture in its child. MANIM_PROFILE is one of:
+
+- `off` (default): renders run as usual, with no profiler.
+- `sample`: a thread samples the rendering thread's stack every
+  SAMPLE_INTERVAL seconds. It also writes what it has every FLUSH_INTERVAL
+  seconds, so a render killed by its timeout still leaves a capture.
+- `cprofile`: cProfile, with exact call counts but a noticeably slower
+  render; for investigations.
+
+Either way, tex (compile_tex, convert_to_svg), text (Text._text2svg) and
+concat (SceneFileWriter.combine_to_movie, the ffmpeg/libav join) are timed
+separately.
+
+After the render, keep() compares its time with the sceneType's threshold:
+MANIM_PROFILE_THRESHOLDS seconds (e.g. `dfa=30,graph=20,*=120`), or else
+MANIM_PROFILE_FACTOR (default 3) times the usual time for its sceneType and
+tier (see progress.py). Renders over it have their capture appended to
+`manim_jobs/<jobId>.profile`, next to the job JSON, and the job records
+`profile`. When the job completes, its final `timings` (including the
+upload) are added. Batch renders are not profiled. Captures are archived
+with their job (see lifecycle.py).
+
+Usage:
+  python profile_report.py    # top hot spots per sceneType
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import runpy
+import shutil
+import argparse
+import cProfile
+import importlib
+import threading
+import importlib.util
+from pathlib import Path
+
+import progress
+from job_queue import JOB_DIR, read_job
+
+MODE = os.environ.get("MANIM_PROFILE", "off")
+ENABLED = MODE in ("sample", "cprofile")
+FACTOR = float(os.environ.get("MANIM_PROFILE_FACTOR", "3"))
+SAMPLE_INTERVAL = 0.01
+FLUSH_INTERVAL = 5.0
+# Functions kept per capture, by inclusive time.
+TOP_FUNCTIONS = 200
+
+# category -> (module, functions) timed on their own in the render process.
+SUBTIMINGS = {
+    "tex": ("manim.utils.tex_file_writing", ("compile_tex", "convert_to_svg")),
+    "text": ("manim.mobject.text.text_mobject", ("Text._text2svg", "MarkupText._text2svg")),
+    "concat": ("manim.scene.scene_file_writer", ("SceneFileWriter.combine_to_movie",)),
+}
+
+
+def _parse_thresholds(text):
+    thresholds = {}
+    for part in (text or "").split(","):
+        if "=" in part:
+            scene_type, seconds = part.split("=", 1)
+            thresholds[scene_type.strip().lower()] = float(seconds)
+    return thresholds
+
+
+THRESHOLDS = _parse_thresholds(os.environ.get("MANIM_PROFILE_THRESHOLDS"))
+
+_subtimings = {}
+_sub_lock = threading.Lock()
+_instrumented = False
+
+
+# Frames of the wrapper itself (this file, runpy) are left out of captures.
+_WRAPPER_FILES = {os.path.abspath(__file__), runpy.__file__, "<frozen runpy>"}
+
+
+def _where(filename, line, name):
+    """Short name of a function: path below site-packages (or the file name), line and name."""
+    if filename == "~":
+        return name  # a builtin, as cProfile names it
+    for marker in ("site-packages/", "dist-packages/"):
+        if marker in filename:
+            filename = filename.split(marker, 1)[1]
+            break
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{line}({name})"
+
+
+def _timed(category, fn):
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with _sub_lock:
+                entry = _subtimings.setdefault(category, {"seconds": 0.0, "calls": 0})
+                entry["seconds"] += time.perf_counter() - start
+                entry["calls"] += 1
+    timed.__wrapped__ = fn
+    return timed
+
+
+def _instrument():
+    """Wrap the SUBTIMINGS functions (once per process); ones that do not exist are skipped."""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+    for category, (module_name, functions) in SUBTIMINGS.items():
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        for qualname in functions:
+            *owner_path, attr = qualname.split(".")
+            owner = module
+            for part in owner_path:
+                owner = getattr(owner, part, None)
+            fn = getattr(owner, attr, None) if owner is not None else None
+            if callable(fn):
+                setattr(owner, attr, _timed(category, fn))
+
+
+class Capture:
+    """Profile the calling thread from start() until stop(), and write the result as JSON."""
+
+    def __init__(self, mode=MODE):
+        self.mode = mode
+        self._samples = 0
+        self._self = {}
+        self._total = {}
+        self._names = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._profile = None
+        self._out = None
+
+    def start(self, out=None):
+        """`out` is written every FLUSH_INTERVAL seconds while sampling, as well as by stop()."""
+        _instrument()
+        with _sub_lock:
+            _subtimings.clear()
+        self._out = out
+        self._started = time.perf_counter()
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self.mode == "sample":
+            self._target = threading.get_ident()
+            self._thread = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+            self._thread.start()
+
+    def _name(self, code):
+        name = self._names.get(code)
+        if name is None:
+            name = self._names[code] = _where(code.co_filename, code.co_firstlineno, code.co_name)
+        return name
+
+    def _sample(self):
+        last_flush = time.perf_counter()
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                if frame.f_code.co_filename not in _WRAPPER_FILES:
+                    stack.append(self._name(frame.f_code))
+                frame = frame.f_back
+            if not stack:
+                continue
+            with self._lock:
+                self._samples += 1
+                self._self[stack[0]] = self._self.get(stack[0], 0) + 1
+                for name in set(stack):
+                    self._total[name] = self._total.get(name, 0) + 1
+            if self._out and time.perf_counter() - last_flush > FLUSH_INTERVAL:
+                self._write(partial=True)
+                last_flush = time.perf_counter()
+
+    def result(self, partial=False):
+        seconds = time.perf_counter() - self._started
+        if self._profile is not None:
+            # (file, line, name) -> (primitive calls, calls, own time, inclusive time, callers)
+            self._profile.create_stats()
+            functions = [
+                {"func": _where(*key), "self": tt, "total": ct, "calls": nc}
+                for key, (_, nc, tt, ct, _) in self._profile.stats.items()
+                if key[0] not in _WRAPPER_FILES
+            ]
+        else:
+            with self._lock:
+                # Each sample stands for an equal share of the wall time, however late the sampler woke.
+                per = seconds / self._samples if self._samples else 0.0
+                functions = [
+                    {"func": name, "self": self._self.get(name, 0) * per, "total": count * per}
+                    for name, count in self._total.items()
+                ]
+        functions.sort(key=lambda f: f["total"], reverse=True)
+        for f in functions:
+            f["self"], f["total"] = round(f["self"], 4), round(f["total"], 4)
+        with _sub_lock:
+            subtimings = {k: {"seconds": round(v["seconds"], 4), "calls": v["calls"]} for k, v in _subtimings.items()}
+        capture = {
+            "profiler": self.mode,
+            "seconds": round(seconds, 3),
+            "functions": functions[:TOP_FUNCTIONS],
+            "subTimings": subtimings,
+        }
+        if self.mode == "sample":
+            capture["samples"] = self._samples
+        if partial:
+            capture["partial"] = True
+        return capture
+
+    def _write(self, partial=False):
+        out = Path(self._out)
+        tmp = out.with_name(f".{out.name}.tmp")
+        tmp.write_text(json.dumps(self.result(partial)))
+        os.replace(tmp, out)
+
+    def stop(self, out=None):
+        self._out = out or self._out
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self._out:
+            self._write()
+
+
+# --- worker side -------------------------------------------------------------
+
+
+def command(cmd, out: Path):
+    """The render command `cmd`, run through this file so the render is profiled into `out`."""
+    if not ENABLED:
+        return cmd
+    return [sys.executable, str(Path(__file__).resolve()), "--mode", MODE, "--out", str(out), "--", *cmd]
+
+
+def threshold(scene_type: str, tier: str, animations: int):
+    """Seconds past which a render of this sceneType and tier is kept, or None."""
+    scene_type = (scene_type or "").lower()
+    if scene_type in THRESHOLDS:
+        return THRESHOLDS[scene_type]
+    expected = progress.expected_seconds(scene_type, tier, animations)
+    if expected:
+        return FACTOR * expected
+    return THRESHOLDS.get("*")
+
+
+def profile_path(job_id: str):
+    return JOB_DIR / f"{job_id}.profile"
+
+
+def _write_profile(path: Path, data: dict):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+def keep(job: dict, stage: str, tier: str, capture: Path, seconds: float, limit):
+    """Save the render's capture next to the job if it took longer than `limit` seconds."""
+    if capture is None or limit is None or seconds <= limit:
+        return
+    data = read_job(capture)
+    if not data:
+        print(f"Render of {job['jobId']} took {seconds:.1f}s (threshold {limit:.1f}s) but left no profile")
+        return
+    path = profile_path(job["jobId"])
+    saved = read_job(path) or {
+        "jobId": job["jobId"],
+        "sceneType": ((job.get("sceneParams") or {}).get("sceneType") or "").lower(),
+        "renders": [],
+    }
+    saved["renders"].append({"stage": stage, "quality": tier, "threshold": round(limit, 3), **data,
+                             "seconds": round(seconds, 3)})
+    saved["capturedAt"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    saved["timings"] = job.get("timings", {})
+    try:
+        _write_profile(path, saved)
+    except OSError as e:
+        print(f"Saving the profile of {job['jobId']} failed: {e}")
+        return
+    job["profile"] = path.name
+    print(f"Render of {job['jobId']} took {seconds:.1f}s (threshold {limit:.1f}s); profile in {path.name}")
+
+
+def finish(job: dict):
+    """Add the job's final timings (upload included) to its saved profile, if it has one."""
+    if not job.get("profile"):
+        return
+    path = profile_path(job["jobId"])
+    saved = read_job(path)
+    if saved:
+        saved["timings"] = job.get("timings", {})
+        saved["status"] = job.get("status")
+        _write_profile(path, saved)
+
+
+# --- render side: `python profiling.py --out FILE -- manim ...` ---------------
+
+
+def _runs_here(script: str):
+    """True if `script` is a Python script whose imports this interpreter has (e.g. manim's entry point)."""
+    try:
+        source = Path(script).read_text()
+    except (OSError, UnicodeDecodeError):
+        return False
+    if not (source.startswith("#!") and "python" in source.splitlines()[0]):
+        return False
+    modules = re.findall(r"^\s*(?:from|import)\s+([A-Za-z_]\w*)", source, re.M)
+    return all(importlib.util.find_spec(m) is not None for m in modules)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a render command under the profiler")
+    parser.add_argument("--mode", choices=["sample", "cprofile"], default="sample")
+    parser.add_argument("--out", required=True, help="where to write the capture (JSON)")
+    parser.add_argument("cmd", nargs=argparse.REMAINDER, help="-- manim ...")
+    args = parser.parse_args()
+    cmd = args.cmd[1:] if args.cmd[:1] == ["--"] else args.cmd
+    script = shutil.which(cmd[0])
+    if not script or not _runs_here(script):
+        # Not something this interpreter can run in-process: render without a profile.
+        os.execvp(cmd[0], cmd)
+
+    # Run the entry point as if started directly, without this directory's modules on the path.
+    sys.argv = [script, *cmd[1:]]
+    sys.path[0] = os.path.dirname(script)
+    capture = Capture(args.mode)
+    capture.start(args.out)
+    try:
+        runpy.run_path(script, run_name="__main__")
+    finally:
+        capture.stop()
+
+
+if __name__ == "__main__":
+    main()
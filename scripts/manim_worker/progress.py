@@ -0,0 +1,141 @@
+"""
+Render progress on the job record.
+
+Manim writes one partial movie file per animation (each `self.play` or
+`self.wait`) under `media/videos/**/partial_movie_files/`, with the CLI and
+the warm renderer alike. A Tracker counts the new files from a background
+thread while a render runs and reports
+
+  progress: {"stage": "render", "animation": 7, "of": 22, "pct": 31, "etaSeconds": 12.5}
+
+through `on_update`, at most every MANIM_PROGRESS_INTERVAL seconds (default
+1) and only when something changed. `of` is the number of play/wait calls the
+scene makes (scenes.count_animations).
+
+The ETA comes from the seconds per animation of earlier renders with the
+same sceneType and quality tier, kept as a moving average in
+`manim_jobs/cache/timings.json`, plus the expected time of any render still
+to come (the full-quality render after a preview).
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+
+from job_queue import JOB_DIR
+
+HISTORY_PATH = JOB_DIR / "cache" / "timings.json"
+INTERVAL = float(os.environ.get("MANIM_PROGRESS_INTERVAL", "1"))
+POLL_INTERVAL = 0.25
+# Weight of the newest render in the moving average.
+ALPHA = 0.2
+HISTORY_TTL = 60
+
+_history = None
+_history_read = 0.0
+
+
+def _load_history():
+    global _history, _history_read
+    if _history is None or time.time() - _history_read > HISTORY_TTL:
+        try:
+            _history = json.loads(HISTORY_PATH.read_text())
+        except (FileNotFoundError, ValueError):
+            _history = {}
+        _history_read = time.time()
+    return _history
+
+
+def seconds_per_animation(scene_type: str, tier: str):
+    """Average render seconds per animation, or None without history."""
+    entry = _load_history().get(f"{scene_type}:{tier}")
+    return entry["secondsPerAnimation"] if entry else None
+
+
+def expected_seconds(scene_type: str, tier: str, animations: int):
+    per = seconds_per_animation(scene_type, tier)
+    return None if per is None else per * animations
+
+
+def record(scene_type: str, tier: str, seconds: float, animations: int):
+    """Fold one finished render into the history (last writer wins between slots)."""
+    global _history_read
+    if animations <= 0:
+        return
+    history = _load_history()
+    key = f"{scene_type}:{tier}"
+    per = seconds / animations
+    entry = history.get(key)
+    if entry:
+        per = (1 - ALPHA) * entry["secondsPerAnimation"] + ALPHA * per
+    history[key] = {"secondsPerAnimation": round(per, 4), "renders": (entry or {}).get("renders", 0) + 1}
+    HISTORY_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = HISTORY_PATH.with_name(f".{HISTORY_PATH.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(history, indent=2))
+    os.replace(tmp, HISTORY_PATH)
+    _history_read = time.time()
+
+
+class Tracker:
+    def __init__(self, media_dir: Path, stage: str, animations: int, on_update, per_animation=None,
+                 eta_after=None):
+        """
+        `per_animation` is the expected seconds per animation of this render
+        and `eta_after` the expected seconds of the renders after it; the ETA
+        is left out when either is unknown.
+        """
+        self.media_dir = media_dir
+        self.stage = stage
+        self.animations = animations
+        self.on_update = on_update
+        self.per_animation = per_animation
+        self.eta_after = eta_after
+        self._baseline = 0
+        self._last = None
+        self._last_sent = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+
+    def _count(self):
+        return sum(1 for _ in self.media_dir.glob("videos/**/partial_movie_files/**/*.mp4"))
+
+    def _progress(self, done):
+        done = max(0, min(done, self.animations))
+        progress = {
+            "stage": self.stage,
+            "animation": done,
+            "of": self.animations,
+            "pct": round(100 * done / self.animations) if self.animations else 100,
+        }
+        if self.per_animation is not None and self.eta_after is not None:
+            progress["etaSeconds"] = round((self.animations - done) * self.per_animation + self.eta_after, 1)
+        return progress
+
+    def _send(self, progress, force=False):
+        now = time.time()
+        if progress == self._last or (not force and now - self._last_sent < INTERVAL):
+            return
+        self._last, self._last_sent = progress, now
+        try:
+            self.on_update(progress)
+        except Exception as e:
+            print(f"Progress update failed: {e}")
+
+    def start(self):
+        # Files from an earlier render in the same workdir (the preview) do not count.
+        self._baseline = self._count()
+        self._send(self._progress(0), force=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(POLL_INTERVAL):
+            # The newest file is the animation being rendered.
+            self._send(self._progress(self._count() - self._baseline - 1))
+
+    def stop(self, finished=True):
+        self._stop.set()
+        self._thread.join()
+        if finished:
+            self._send(self._progress(self.animations), force=True)
@@ -0,0 +1,204 @@
+"""
+Content-addressed cache of rendered videos.
+
+The key is a hash of the scene spec (the output of
+`render_worker.scene_spec`), the render quality, the installed Manim version
+and the source of the modules that draw scenes (scenes.py and curves.py), so
+identical scene specs map to one video no matter which job asked for them,
+and a change to how scenes are drawn starts a fresh set of entries. On a
+hit the worker points the job's `resultUrl` at the existing mp4 (or S3
+object) and skips Manim entirely.
+
+The index lives in `manim_jobs/cache/index.json` and is shared by all slots
+and workers on the same directory; every read-modify-write holds an
+exclusive flock. Local files are evicted least-recently-used first once their
+total size exceeds MANIM_CACHE_MAX_BYTES.
+
+lookup() counts nothing itself: the worker counts one hit or miss per job
+for its requested tier, and preview lookups as previewHits/previewMisses, so
+coalesced followers and previews do not skew the hit rate.
+
+Usage:
+  python render_cache.py        # print hit/miss counters and cache size
+"""
+
+import os
+import json
+import time
+import fcntl
+import hashlib
+from pathlib import Path
+from contextlib import contextmanager
+
+from job_queue import JOB_DIR
+
+CACHE_DIR = JOB_DIR / "cache"
+INDEX_PATH = CACHE_DIR / "index.json"
+LOCK_PATH = CACHE_DIR / ".lock"
+
+ENABLED = not os.environ.get("MANIM_CACHE_DISABLE")
+MAX_BYTES = int(os.environ.get("MANIM_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# The modules whose code decides what a scene spec looks like once rendered.
+SCENE_SOURCES = ("scenes.py", "curves.py")
+
+_manim_version = None
+_scenes_version = None
+
+
+def manim_version():
+    global _manim_version
+    if _manim_version is None:
+        try:
+            from importlib.metadata import version
+            _manim_version = version("manim")
+        except Exception:
+            _manim_version = "unknown"
+    return _manim_version
+
+
+def scenes_version():
+    global _scenes_version
+    if _scenes_version is None:
+        h = hashlib.sha256()
+        for name in SCENE_SOURCES:
+            h.update(Path(__file__).with_name(name).read_bytes())
+        _scenes_version = h.hexdigest()[:16]
+    return _scenes_version
+
+
+def cache_key(spec: dict, quality: str):
+    h = hashlib.sha256()
+    for part in (json.dumps(spec, sort_keys=True), quality, manim_version(), scenes_version()):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+@contextmanager
+def _locked_index():
+    """Yield the index dict under an exclusive lock; it is saved on exit."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(LOCK_PATH, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            try:
+                index = json.loads(INDEX_PATH.read_text())
+            except (FileNotFoundError, ValueError):
+                index = {}
+            index.setdefault("entries", {})
+            index.setdefault("stats", {
+                "hits": 0, "misses": 0, "previewHits": 0, "previewMisses": 0, "stores": 0, "evictions": 0,
+            })
+            yield index
+            tmp = INDEX_PATH.with_suffix(".tmp")
+            tmp.write_text(json.dumps(index))
+            os.replace(tmp, INDEX_PATH)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _entry_valid(entry):
+    path = entry.get("path")
+    return not path or Path(path).exists()
+
+
+def lookup(key: str):
+    """Return the cache entry for `key`, or None; the caller counts the outcome with count()."""
+    if not ENABLED:
+        return None
+    with _locked_index() as index:
+        entry = index["entries"].get(key)
+        if entry and not _entry_valid(entry):
+            del index["entries"][key]
+            entry = None
+        if entry is None:
+            return None
+        entry["lastUsed"] = time.time()
+        entry["hits"] = entry.get("hits", 0) + 1
+        return dict(entry)
+
+
+def store(key: str, out_path: Path, result_url: str, pinned=False):
+    if not ENABLED:
+        return
+    now = time.time()
+    with _locked_index() as index:
+        index["entries"][key] = {
+            "path": str(out_path),
+            "resultUrl": result_url,
+            "size": out_path.stat().st_size if out_path.exists() else 0,
+            "createdAt": now,
+            "lastUsed": now,
+            "hits": 0,
+            "pinned": pinned,
+        }
+        index["stats"]["stores"] += 1
+        _evict(index, MAX_BYTES)
+
+
+def _evict(index, max_bytes):
+    entries = index["entries"]
+    total = sum(e.get("size", 0) for e in entries.values())
+    if total <= max_bytes:
+        return
+    for key, entry in sorted(entries.items(), key=lambda kv: kv[1].get("lastUsed", 0)):
+        if total <= max_bytes:
+            break
+        if entry.get("pinned"):
+            continue
+        try:
+            Path(entry["path"]).unlink()
+        except (FileNotFoundError, KeyError):
+            pass
+        total -= entry.get("size", 0)
+        del entries[key]
+        index["stats"]["evictions"] += 1
+
+
+def pin(key: str):
+    """Pin an existing entry so it is never evicted; False if `key` is not cached."""
+    if not ENABLED:
+        return False
+    with _locked_index() as index:
+        entry = index["entries"].get(key)
+        if not entry or not _entry_valid(entry):
+            return False
+        entry["pinned"] = True
+        return True
+
+
+def local_entries():
+    """Cache entries by local path, for retention (pinned entries must be kept)."""
+    with _locked_index() as index:
+        return {e["path"]: dict(e) for e in index["entries"].values() if e.get("path")}
+
+
+def forget(paths):
+    """Drop the entries for local files that were deleted outside the cache."""
+    paths = {str(p) for p in paths}
+    if not paths:
+        return
+    with _locked_index() as index:
+        for key in [k for k, e in index["entries"].items() if e.get("path") in paths]:
+            del index["entries"][key]
+
+
+def count(name: str, n=1):
+    """Add `n` to a named counter reported by stats()."""
+    with _locked_index() as index:
+        index["stats"][name] = index["stats"].get(name, 0) + n
+
+
+def stats():
+    with _locked_index() as index:
+        s = dict(index["stats"])
+        s["entries"] = len(index["entries"])
+        s["bytes"] = sum(e.get("size", 0) for e in index["entries"].values())
+    lookups = s["hits"] + s["misses"]
+    s["hitRate"] = round(s["hits"] / lookups, 4) if lookups else 0.0
+    return s
+
+
+if __name__ == "__main__":
+    print(json.dumps(stats(), indent=2))
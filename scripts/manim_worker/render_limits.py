@@ -0,0 +1,171 @@
+"""
+Resource limits for renders.
+
+Every render gets a wall-clock timeout and rlimits on CPU seconds, address
+space and output file size, so one pathological scene (a huge xRange, a slow
+LaTeX compile) fails on its own instead of stalling the slot. Failures carry
+a `reason` that is recorded on the job as `failureReason`.
+
+Environment (0 disables a limit):
+- MANIM_JOB_TIMEOUT: wall-clock seconds per render (default 300)
+- MANIM_CPU_LIMIT: CPU seconds per render (default 600)
+- MANIM_MEMORY_LIMIT_MB: address space per render process (default 4096)
+- MANIM_FILE_SIZE_LIMIT_MB: largest file a render may write (default 1024)
+
+The limits and the CPU priority are set by a small launcher, this module run
+as a script, which then execs the render command. Setting them in a
+preexec_fn instead would run Python between fork and exec in a slot process
+that has upload and lease threads, which can deadlock the child.
+
+Usage (as run_command runs it):
+  python render_limits.py --cpu 600 --memory 4294967296 --file-size 1073741824 --nice 0 -- manim ...
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+import resource
+import subprocess
+from pathlib import Path
+
+MB = 1024 * 1024
+JOB_TIMEOUT = float(os.environ.get("MANIM_JOB_TIMEOUT", "300"))
+CPU_LIMIT = int(os.environ.get("MANIM_CPU_LIMIT", "600"))
+MEMORY_LIMIT = int(os.environ.get("MANIM_MEMORY_LIMIT_MB", "4096")) * MB
+FILE_SIZE_LIMIT = int(os.environ.get("MANIM_FILE_SIZE_LIMIT_MB", "1024")) * MB
+# How often an interruptible render checks whether to stop.
+INTERRUPT_POLL = 0.5
+
+_SIGNAL_REASONS = {
+    signal.SIGXCPU: "cpu_limit",
+    signal.SIGXFSZ: "file_size_limit",
+    signal.SIGKILL: "killed",
+}
+
+
+class RenderError(Exception):
+    def __init__(self, message, reason="render_error"):
+        super().__init__(message)
+        self.reason = reason
+
+
+class RenderTimeout(RenderError):
+    def __init__(self, seconds):
+        super().__init__(f"Render exceeded {seconds:g}s timeout", reason="timeout")
+
+
+class RenderPreempted(RenderError):
+    def __init__(self):
+        super().__init__("Render stopped for queued work", reason="preempted")
+
+
+def _set_limit(kind, soft):
+    _, hard = resource.getrlimit(kind)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(kind, (soft, hard))
+
+
+def apply_rlimits(cpu_offset=0):
+    """Limit the calling process; `cpu_offset` is CPU time it has already used."""
+    if CPU_LIMIT:
+        _set_limit(resource.RLIMIT_CPU, int(cpu_offset) + CPU_LIMIT)
+    if MEMORY_LIMIT:
+        _set_limit(resource.RLIMIT_AS, MEMORY_LIMIT)
+    if FILE_SIZE_LIMIT:
+        _set_limit(resource.RLIMIT_FSIZE, FILE_SIZE_LIMIT)
+
+
+def cpu_used():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def launcher(cmd, nice=0):
+    """The argv that runs `cmd` under the current limits, `nice` lower in CPU priority."""
+    return [
+        sys.executable, str(Path(__file__).resolve()),
+        "--cpu", str(CPU_LIMIT), "--memory", str(MEMORY_LIMIT), "--file-size", str(FILE_SIZE_LIMIT),
+        "--nice", str(nice), "--", *cmd,
+    ]
+
+
+def run_command(cmd, cwd, timeout=JOB_TIMEOUT, on_start=None, nice=0, interrupt=None):
+    """
+    Run a render command under rlimits in its own process group.
+
+    On timeout the whole group (manim plus any ffmpeg/latex children) is
+    killed and reaped. `on_start(pgid)` lets the caller tell a watchdog which
+    group to kill if this process itself gets stuck. `nice` lowers the
+    render's CPU priority; `interrupt()` is polled every INTERRUPT_POLL
+    seconds, and once it returns true the group is killed the same way and
+    RenderPreempted is raised.
+    """
+    proc = subprocess.Popen(launcher(cmd, nice), cwd=cwd, start_new_session=True)
+    if on_start:
+        on_start(proc.pid)
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if interrupt:
+                wait = INTERRUPT_POLL if wait is None else min(wait, INTERRUPT_POLL)
+            try:
+                returncode = proc.wait(timeout=wait)
+                break
+            except subprocess.TimeoutExpired:
+                if deadline is not None and time.monotonic() >= deadline:
+                    kill_group(proc.pid)
+                    proc.wait()
+                    raise RenderTimeout(timeout)
+                if interrupt and interrupt():
+                    kill_group(proc.pid)
+                    proc.wait()
+                    raise RenderPreempted()
+    finally:
+        if on_start:
+            on_start(0)
+
+    if returncode < 0:
+        sig = -returncode
+        reason = _SIGNAL_REASONS.get(sig, "render_error")
+        raise RenderError(f"{cmd[0]} killed by {signal.Signals(sig).name}", reason=reason)
+    if returncode != 0:
+        raise RenderError(str(subprocess.CalledProcessError(returncode, cmd)))
+
+
+def kill_group(pgid):
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def main():
+    global CPU_LIMIT, MEMORY_LIMIT, FILE_SIZE_LIMIT
+    parser = argparse.ArgumentParser(description="Run a render command under resource limits")
+    parser.add_argument("--cpu", type=int, default=CPU_LIMIT, help="CPU seconds (0: no limit)")
+    parser.add_argument("--memory", type=int, default=MEMORY_LIMIT, help="address space in bytes (0: no limit)")
+    parser.add_argument("--file-size", type=int, default=FILE_SIZE_LIMIT, help="largest file in bytes (0: no limit)")
+    parser.add_argument("--nice", type=int, default=0, help="lower the CPU priority by this much")
+    parser.add_argument("cmd", nargs=argparse.REMAINDER, help="-- followed by the render command")
+    args = parser.parse_args()
+    cmd = args.cmd[1:] if args.cmd[:1] == ["--"] else args.cmd
+    if not cmd:
+        parser.error("no command given")
+
+    CPU_LIMIT, MEMORY_LIMIT, FILE_SIZE_LIMIT = args.cpu, args.memory, args.file_size
+    apply_rlimits()
+    if args.nice:
+        os.nice(args.nice)
+    try:
+        os.execvp(cmd[0], cmd)
+    except OSError as e:
+        print(f"Cannot run {cmd[0]}: {e}", file=sys.stderr)
+        sys.exit(127)
+
+
+if __name__ == "__main__":
+    main()
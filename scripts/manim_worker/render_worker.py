@@ -2,561 +2,715 @@
 Prototype Manim worker.
 
 Usage (local prototype):
-  python render_worker.py
+  python render_worker.py [--slots N] [--renderer subprocess|warm]
 
 This script polls the repository-local `manim_jobs` directory for jobs (JSON files),
-creates a Manim script derived from the prompt (template-based, not executing
-arbitrary code), runs `manim` to render an mp4, and writes the resulting `resultUrl`
-into the job JSON.
+renders each job's sceneParams with the scene builders in scenes.py (no code
+is generated from a job) to an mp4, and writes the resulting `resultUrl`
+into the job JSON. With `--slots N` (or MANIM_WORKER_SLOTS) it renders up to N
+jobs concurrently; jobs are claimed atomically so several workers can share
+one `manim_jobs` directory.
 
 NOTE:
 - This worker must NOT execute untrusted arbitrary code.
 - It only renders from structured JSON sceneParams.
 """
 
+import re
+import json
 import time
 import os
-import json
 import shutil
-import subprocess
+import argparse
+import threading
 from pathlib import Path
-import math
-
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
-
-ROOT = Path(__file__).resolve().parents[2]
-JOB_DIR = ROOT / "manim_jobs"
-OUTPUT_DIR = ROOT / "public" / "manim_videos"
+from functools import partial
+from contextlib import contextmanager
+
+import coalesce
+import hls
+import job_queue
+import job_service
+import lifecycle
+import media_cache
+import metrics
+import profiling
+import progress
+import render_cache
+import render_limits
+import s3_upload
+import scenes
+import worker_pool
+from job_queue import ROOT, JOB_DIR, pick_job, write_job
+from render_limits import RenderError, RenderPreempted
+from warm_renderer import WarmRenderer
+from worker_pool import add_slots_argument, run_slots
+
+OUTPUT_DIR = Path(os.environ.get("MANIM_OUTPUT_DIR") or ROOT / "public" / "manim_videos")
+
+# tier -> (manim flag, width, height, fps)
+QUALITY_TIERS = {
+    "low": ("-ql", 854, 480, 15),
+    "medium": ("-qm", 1280, 720, 30),
+    "high": ("-qh", 1920, 1080, 60),
+    "4k": ("-qk", 3840, 2160, 60),
+}
+QUALITY_ORDER = ["low", "medium", "high", "4k"]
+QUALITY_ALIASES = {
+    "low": "low", "l": "low", "480p": "low",
+    "medium": "medium", "m": "medium", "720p": "medium",
+    "high": "high", "h": "high", "1080p": "high",
+    "4k": "4k", "k": "4k", "2160p": "4k",
+}
+# Server-side caps: the best tier a job may request, and a frame-rate ceiling.
+MAX_QUALITY = os.environ.get("MANIM_MAX_QUALITY", "high")
+MAX_FPS = int(os.environ.get("MANIM_MAX_FPS", "60"))
+# "grouped" plays related animations in one call (fewer partial movie files).
+COMPOSE = os.environ.get("MANIM_COMPOSE", "sequential")
+# Render a low-quality preview before any higher tier.
+PREVIEW_ENABLED = os.environ.get("MANIM_PREVIEW", "1") != "0"
+
+# Preset scene specs shared with the generate route; idle slots pre-render them.
+PRESETS_PATH = Path(os.environ.get("MANIM_PRESETS_FILE") or ROOT / "lib" / "manim-presets.json")
+WARM_PRESETS = os.environ.get("MANIM_WARM_PRESETS", "1") != "0"
+# Preset renders run at this lower CPU priority, and stop once a job has
+# waited WARM_YIELD_AFTER seconds (an idle slot would have claimed it by then).
+WARM_NICE = int(os.environ.get("MANIM_WARM_NICE", "10"))
+WARM_YIELD_AFTER = 1.0
+WARM_DIR = JOB_DIR / "cache" / "warm"
+# The scene file the manim CLI renders; it loads each job's spec from its workdir.
+SCENE_RUNNER = Path(__file__).resolve().with_name("scene_runner.py")
+
+# Set per slot process when running with --renderer warm.
+_renderer = None
+# Per slot process background upload stage, when S3 is configured.
+_uploader = None
+# Held for every change to, and every write of, a job that upload, HLS or
+# progress threads may also be updating.
+_job_lock = threading.RLock()
 
 
 def ensure_dirs():
-    JOB_DIR.mkdir(exist_ok=True)
+    job_queue.ensure_dirs()
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def pick_job():
-    for p in JOB_DIR.glob("manim-*.json"):
-        try:
-            job = json.loads(p.read_text())
-            if job.get("status") == "queued":
-                return p, job
-        except Exception:
-            continue
-    return None, None
-
-
-def write_job(p, job):
-    p.write_text(json.dumps(job, indent=2))
-
-
 def safe_title(prompt: str):
     t = (prompt or "").strip().split("\n")[0][:50]
     return t.replace('"', "").replace("'", "")
 
 
-def escape_py_string(s: str):
-    if s is None:
-        return ""
-    return str(s).replace("\\", "\\\\").replace('"', '\\"')
+def scene_title(title: str, scene_params: dict):
+    # If title inside scene_params is better, use it
+    sp_title = scene_params.get("title")
+    if sp_title and isinstance(sp_title, str) and sp_title.strip():
+        return safe_title(sp_title)
+    return title
+
 
+def scene_spec(title: str, scene_params: dict, grouped=None):
+    """
+    What a job draws, as scenes.py takes it: the resolved title, the
+    sceneParams and whether animations are grouped.
 
-# -------------------------
-# Scene Builders
-# -------------------------
+    scene_params shape:
+    {
+      sceneType: "...",
+      title: "...",
+      params: {...}
+    }
+    """
+    if grouped is None:
+        grouped = COMPOSE == "grouped"
+    return {"title": scene_title(title, scene_params), "sceneParams": scene_params, "grouped": grouped}
 
-def build_text_scene(title: str, content: str):
-    title = escape_py_string(title)
-    content = content or ""
-    lines = [l.strip() for l in content.split("\n") if l.strip()]
-    if not lines:
-        lines = [content.strip()] if content.strip() else [title]
 
-    # Limit lines to keep video clean
-    lines = lines[:7]
-    lines = [escape_py_string(l) for l in lines]
+def animation_count(spec: dict):
+    """Play/wait calls in a spec's scene: one partial movie file each (see progress.py)."""
+    return scenes.count_animations(spec["title"], spec["sceneParams"], spec["grouped"])
 
-    script_lines = [
-        "from manim import *",
-        "",
-        "class GeneratedScene(Scene):",
-        "    def construct(self):",
-        f'        title = Text("{title}", font_size=52).to_edge(UP)',
-        "        self.play(Write(title))",
-        "",
-    ]
 
-    for i, line in enumerate(lines):
-        # Position lines nicely under title
-        y = 1.8 - i * 0.65
-        script_lines.append(f'        t{i} = Text("{line}", font_size=34).move_to([0, {y}, 0])')
-        script_lines.append(f"        self.play(Write(t{i}))")
-
-    script_lines.append("        self.wait(2)")
-    return "\n".join(script_lines)
-
-
-def build_list_scene(title: str, items):
-    title = escape_py_string(title)
-    items = items or []
-    items = [escape_py_string(str(x)) for x in items][:8]
-
-    script_lines = [
-        "from manim import *",
-        "",
-        "class GeneratedScene(Scene):",
-        "    def construct(self):",
-        f'        title = Text("{title}", font_size=52).to_edge(UP)',
-        "        self.play(Write(title))",
-        "",
-    ]
+def resolve_quality(requested):
+    """Map a job's `quality` onto a tier name, capped at MAX_QUALITY."""
+    tier = QUALITY_ALIASES.get(str(requested or "low").strip().lower(), "low")
+    cap = QUALITY_ALIASES.get(MAX_QUALITY.lower(), "high")
+    if QUALITY_ORDER.index(tier) > QUALITY_ORDER.index(cap):
+        tier = cap
+    return tier
 
-    for i, it in enumerate(items):
-        y = 1.8 - i * 0.6
-        script_lines.append(f'        it{i} = Text("• {it}", font_size=34).move_to([-4.5, {y}, 0]).align_to(title, LEFT)')
-        script_lines.append(f"        self.play(Write(it{i}))")
 
-    script_lines.append("        self.wait(2)")
-    return "\n".join(script_lines)
+def tier_settings(tier: str):
+    flag, width, height, fps = QUALITY_TIERS[tier]
+    return flag, width, height, min(fps, MAX_FPS)
 
 
-def build_dfa_scene(title: str, nodes, edges, explanation: str = ""):
-    title = escape_py_string(title)
-    nodes = nodes or []
-    edges = edges or []
+def quality_args(tier: str):
+    flag, width, height, fps = tier_settings(tier)
+    return [flag, "-r", f"{width},{height}", "--fps", str(fps)]
 
-    # spread nodes horizontally (max 6)
-    nodes = nodes[:6]
 
-    script_lines = [
-        "from manim import *",
-        "",
-        "class GeneratedScene(Scene):",
-        "    def construct(self):",
-        f'        title = Text("{title}", font_size=52).to_edge(UP)',
-        "        self.play(Write(title))",
-        "",
-    ]
+def save_job(job_file: Path, job: dict):
+    with _job_lock:
+        start = time.time()
+        write_job(job_file, job)
+        metrics.record(job, "write", start, time.time() - start)
 
-    # Position nodes evenly
-    node_count = len(nodes)
-    if node_count == 0:
-        return build_text_scene(title, "No DFA nodes provided.")
-
-    # x positions: centered
-    start_x = -2.5
-    spacing = 2.0
-    if node_count > 1:
-        start_x = -((node_count - 1) * spacing) / 2
-
-    for i, n in enumerate(nodes):
-        nid = escape_py_string(n.get("id", f"q{i}"))
-        label = escape_py_string(n.get("label", nid))
-        accept = bool(n.get("accept", False))
-        start = bool(n.get("start", False))
-
-        x = start_x + i * spacing
-        script_lines.append(f"        {nid} = Circle(radius=0.45, color=BLUE).move_to([{x}, 0, 0])")
-        script_lines.append(f'        {nid}_label = MathTex("{label}").scale(0.9).move_to({nid}.get_center())')
-
-        if accept:
-            script_lines.append(f"        {nid}_accept = Circle(radius=0.55, color=BLUE).move_to({nid}.get_center())")
-
-        script_lines.append(f"        self.play(Create({nid}), Write({nid}_label))")
-        if accept:
-            script_lines.append(f"        self.play(Create({nid}_accept))")
-
-        if start:
-            script_lines.append(f"        start_arrow_{nid} = Arrow([{x-1.2}, 0, 0], {nid}.get_left(), buff=0.1)")
-            script_lines.append(f"        self.play(Create(start_arrow_{nid}))")
-
-    script_lines.append("")
-    script_lines.append("        # Edges")
-    for e in edges[:12]:
-        frm = escape_py_string(e.get("from", ""))
-        to = escape_py_string(e.get("to", ""))
-        lab = escape_py_string(e.get("label", ""))
-
-        if not frm or not to:
-            continue
 
-        script_lines.append(f"        arr = Arrow({frm}.get_center(), {to}.get_center(), buff=0.6)")
-        script_lines.append("        self.play(Create(arr))")
-        if lab:
-            script_lines.append(f'        lbl = MathTex("{lab}").scale(0.8).next_to(arr, UP)')
-            script_lines.append("        self.play(Write(lbl))")
+def update_job(job_file: Path, job: dict, **fields):
+    with _job_lock:
+        job.update(fields)
+        save_job(job_file, job)
 
-    if explanation:
-        explanation = escape_py_string(explanation)
-        script_lines.append("")
-        script_lines.append(f'        expl = Text("{explanation}", font_size=30).to_edge(DOWN)')
-        script_lines.append("        self.play(Write(expl))")
 
-    script_lines.append("        self.wait(2)")
-    return "\n".join(script_lines)
+@contextmanager
+def job_stage(job: dict, stage: str):
+    """metrics.stage() for a job that other threads may be writing."""
+    start = time.time()
+    try:
+        yield
+    finally:
+        with _job_lock:
+            metrics.record(job, stage, start, time.time() - start)
 
 
-def build_diagram_scene(title: str, nodes, edges):
+def complete_job(job_file: Path, job: dict, **fields):
     """
-    Generic diagram: boxes + arrows.
-    nodes: [{id, label}]
-    edges: [{from, to, label?}]
+    Set a job's terminal `fields`, write it and move it out of processing.
+    A job whose result cannot be recorded is requeued instead (see abandon_job).
     """
-    title = escape_py_string(title)
-    nodes = nodes or []
-    edges = edges or []
-
-    nodes = nodes[:6]
-    edges = edges[:10]
-
-    if len(nodes) == 0:
-        # fallback: show title only
-        return build_text_scene(title, "No diagram nodes provided.")
-
-    script_lines = [
-        "from manim import *",
-        "",
-        "class GeneratedScene(Scene):",
-        "    def construct(self):",
-        f'        title = Text("{title}", font_size=52).to_edge(UP)',
-        "        self.play(Write(title))",
-        "",
-    ]
-
-    # positions in a simple layout
-    # If 3 nodes -> client/server/db style triangle layout
-    # Else -> horizontal layout
-    if len(nodes) == 3:
-        positions = [[-4, 0, 0], [0, 0, 0], [4, 0, 0]]
-    else:
-        spacing = 3.0
-        start_x = -((len(nodes) - 1) * spacing) / 2
-        positions = [[start_x + i * spacing, 0, 0] for i in range(len(nodes))]
-
-    # create boxes
-    for i, n in enumerate(nodes):
-        nid = escape_py_string(n.get("id", f"n{i}"))
-        label = escape_py_string(n.get("label", nid))
-
-        x, y, z = positions[i]
-        script_lines.append(f'        {nid}_txt = Text("{label}", font_size=30)')
-        script_lines.append(f"        {nid} = SurroundingRectangle({nid}_txt, buff=0.35, corner_radius=0.2)")
-        script_lines.append(f"        {nid}_grp = VGroup({nid}, {nid}_txt).move_to([{x}, {y}, {z}])")
-        script_lines.append(f"        self.play(FadeIn({nid}_grp))")
-
-    script_lines.append("")
-    script_lines.append("        # Draw arrows")
-    for e in edges:
-        frm = escape_py_string(e.get("from", ""))
-        to = escape_py_string(e.get("to", ""))
-        lab = escape_py_string(e.get("label", ""))
-
-        if not frm or not to:
-            continue
-
-        script_lines.append(f"        arr = Arrow({frm}_grp.get_right(), {to}_grp.get_left(), buff=0.15)")
-        script_lines.append("        self.play(Create(arr))")
-        if lab:
-            script_lines.append(f'        lbl = Text("{lab}", font_size=24).next_to(arr, UP)')
-            script_lines.append("        self.play(Write(lbl))")
-
-    script_lines.append("        self.wait(2)")
-    return "\n".join(script_lines)
-
+    try:
+        update_job(job_file, job, **fields, processedAt=time.strftime("%Y-%m-%dT%H:%M:%SZ"))
+        job_queue.finish(job)
+    except Exception as e:
+        abandon_job(job, e)
+        return
+    coalesce.release(job)
+    metrics.finished(job)
+    with _job_lock:
+        profiling.finish(job)
+
+
+def abandon_job(job: dict, error: Exception):
+    """
+    Drop the lease on a job whose result could not be written (a full disk,
+    say) and requeue it, so it is not left processing under a lease this
+    process keeps renewing. After MAX_ATTEMPTS it is dead-lettered.
+    """
+    print(f"Could not record the result of {job['jobId']}: {error}")
+    job_queue.release_lease(job["jobId"])
+    try:
+        job_queue.requeue(job["jobId"], "worker_error", f"Could not record the result: {error}")
+    except Exception as e:
+        # Its lease is no longer renewed, so reclaim_expired() takes it back.
+        print(f"Requeueing {job['jobId']} failed: {e}")
 
-def build_quadratic_scene(title: str, a: float, b: float, c: float, show_formula=True):
-    title = escape_py_string(title)
 
-    # Make sure numeric
-    try:
-        a = float(a)
-        b = float(b)
-        c = float(c)
-    except Exception:
-        a, b, c = 1.0, -3.0, -4.0
-
-    # formula string
-    formula_str = f"y = {a}x^2 + {b}x + {c}"
-    formula_str = formula_str.replace("+ -", "- ")
-
-    script_lines = [
-        "from manim import *",
-        "import numpy as np",
-        "",
-        "class GeneratedScene(Scene):",
-        "    def construct(self):",
-        f'        title = Text("{title}", font_size=52).to_edge(UP)',
-        "        self.play(Write(title))",
-        "",
-        "        axes = Axes(x_range=[-6,6,1], y_range=[-6,6,1], x_length=10, y_length=5, tips=False)",
-        "        axes = axes.shift(DOWN*0.5)",
-        "        self.play(Create(axes))",
-        "",
-        f"        a = {a}",
-        f"        b = {b}",
-        f"        c = {c}",
-        "        f = lambda x: a*x*x + b*x + c",
-        "        graph = axes.plot(lambda x: f(x), x_range=[-6, 6], use_smoothing=True)",
-        "        self.play(Create(graph))",
-        "",
-    ]
+def release_stuck(job_id: str, reason: str):
+    job = job_queue.release_stuck(job_id, reason)
+    if job:
+        metrics.finished(job)
 
-    if show_formula:
-        script_lines += [
-            f'        formula = MathTex("{escape_py_string(formula_str)}").scale(0.9).to_edge(DOWN)',
-            "        self.play(Write(formula))",
-            "",
-        ]
-
-    # Vertex
-    script_lines += [
-        "        # Vertex",
-        "        if a != 0:",
-        "            xv = -b/(2*a)",
-        "            yv = f(xv)",
-        "            v_dot = Dot(axes.coords_to_point(xv, yv))",
-        '            v_lbl = Text("Vertex", font_size=24).next_to(v_dot, UP)',
-        "            self.play(FadeIn(v_dot), Write(v_lbl))",
-        "",
-        "        self.wait(2)",
-    ]
 
-    return "\n".join(script_lines)
+def publish_video(out_path: Path, key: str, on_published, job: dict, stage: str, pinned=False):
+    """
+    Make a rendered mp4 available and cache it, then call
+    on_published(url, error). S3 uploads run on the slot's upload stage, so
+    the callback may fire after the slot has moved on to its next job. The
+    upload's time (including any wait for a free uploader) is recorded
+    under `stage`.
+    """
+    if not s3_upload.enabled():
+        url = f"/manim_videos/{out_path.name}"
+        render_cache.store(key, out_path, url, pinned=pinned)
+        on_published(url, None)
+        return
+
+    start = time.time()
+
+    def uploaded(url, error):
+        with _job_lock:
+            metrics.record(job, stage, start, time.time() - start)
+        if error is None:
+            try:
+                render_cache.store(key, out_path, url, pinned=pinned)
+            except Exception as e:
+                print(f"Caching {out_path.name} failed: {e}")
+        on_published(url, error)
 
+    _uploader.submit(out_path, uploaded)
 
-def build_graph_scene(title: str, functions, x_range, y_range, show_axes=True, notes=None):
-    title = escape_py_string(title)
-    functions = functions or [{"expr": "x", "label": "y=x"}]
-    notes = notes or []
 
-    # Safe defaults
-    x0, x1 = -6, 6
-    y0, y1 = -6, 6
-    try:
-        if x_range and len(x_range) == 2:
-            x0, x1 = float(x_range[0]), float(x_range[1])
-        if y_range and len(y_range) == 2:
-            y0, y1 = float(y_range[0]), float(y_range[1])
-    except Exception:
-        pass
-
-    # Only 2 functions max
-    functions = functions[:2]
-
-    script_lines = [
-        "from manim import *",
-        "import numpy as np",
-        "",
-        "class GeneratedScene(Scene):",
-        "    def construct(self):",
-        f'        title = Text("{title}", font_size=52).to_edge(UP)',
-        "        self.play(Write(title))",
-        "",
+def run_manim(workdir: Path, spec: dict, tier: str, out_path: Path, streaming=False, profile=None,
+              background=False):
+    """
+    Render a scene spec (see scene_spec) into out_path, in the warm renderer
+    or via the manim CLI. With `profile`, the render writes a profile capture there
+    (see profiling.py). A `background` render always goes through the CLI,
+    niced by WARM_NICE, and raises RenderPreempted once a job is left waiting.
+    """
+    # Compiled LaTeX and text glyphs come from (and go to) the shared media cache.
+    media_dirs = media_cache.prepare()
+    if streaming:
+        # Uncached partial movie files are numbered in play order (see hls.py).
+        media_dirs = {**media_dirs, "disable_caching": True}
+    if _renderer is not None and not background:
+        _, width, height, fps = tier_settings(tier)
+        print(f"Rendering {out_path.name} ({tier}) in warm renderer")
+        _renderer.render(
+            spec["title"], spec["sceneParams"], width, height, fps, out_path, workdir / "media",
+            grouped=spec["grouped"], config=media_dirs, profile=profile,
+        )
+        media_cache.publish()
+        return
+
+    (workdir / scenes.SPEC_FILE).write_text(json.dumps([{**spec, "name": "GeneratedScene"}]))
+    cli_dirs = {k: v for k, v in media_dirs.items() if k in media_cache.KINDS}
+    if cli_dirs:
+        (workdir / "manim.cfg").write_text(media_cache.manim_cfg(cli_dirs))
+    cmd = [
+        "manim",
+        str(SCENE_RUNNER),
+        "GeneratedScene",
+        *quality_args(tier),
+        "--format",
+        "mp4",
+        "-o",
+        str(out_path),
+        *(["--disable_caching"] if streaming else []),
     ]
-
-    if show_axes:
-        script_lines += [
-            f"        axes = Axes(x_range=[{x0},{x1},1], y_range=[{y0},{y1},1], x_length=10, y_length=5, tips=False).shift(DOWN*0.5)",
-            "        self.play(Create(axes))",
-            "",
-        ]
+    if profile:
+        cmd = profiling.command(cmd, profile)
+    print("Running:", " ".join(cmd))
+    if background:
+        render_limits.run_command(
+            cmd, workdir, on_start=worker_pool.set_render_group, nice=WARM_NICE,
+            interrupt=partial(job_queue.has_claimable, WARM_YIELD_AFTER),
+        )
     else:
-        script_lines += [
-            "        axes = Axes(x_range=[-6,6,1], y_range=[-6,6,1], x_length=10, y_length=5, tips=False).shift(DOWN*0.5)",
-        ]
-
-    # We will support only simple expressions: "x", "x^2", "sin(x)", "cos(x)"
-    # Avoid eval for security. Map known patterns.
-    script_lines += [
-        "        def expr_to_func(expr: str):",
-        "            expr = expr.strip().lower()",
-        "            if expr in ['x', 'y=x']:",
-        "                return lambda x: x",
-        "            if expr in ['x^2', 'x**2']:",
-        "                return lambda x: x*x",
-        "            if expr in ['sin(x)', 'sin']:",
-        "                return lambda x: np.sin(x)",
-        "            if expr in ['cos(x)', 'cos']:",
-        "                return lambda x: np.cos(x)",
-        "            if expr in ['-x']:",
-        "                return lambda x: -x",
-        "            # fallback",
-        "            return lambda x: x",
-        "",
-    ]
+        render_limits.run_command(cmd, workdir, on_start=worker_pool.set_render_group)
+    media_cache.publish()
 
-    for i, fn in enumerate(functions):
-        expr = escape_py_string(fn.get("expr", "x"))
-        label = escape_py_string(fn.get("label", expr))
-        script_lines += [
-            f'        f{i} = expr_to_func("{expr}")',
-            f"        g{i} = axes.plot(lambda x: f{i}(x), x_range=[{x0},{x1}], use_smoothing=True)",
-            f"        self.play(Create(g{i}))",
-            f'        lbl{i} = Text("{label}", font_size=24).to_edge(DOWN).shift(UP*0.4)',
-            f"        self.play(Write(lbl{i}))",
-        ]
-
-    if notes:
-        note_text = " | ".join([escape_py_string(str(n)) for n in notes[:2]])
-        script_lines += [
-            "",
-            f'        note = Text("{note_text}", font_size=26).to_edge(DOWN)',
-            "        self.play(Write(note))",
-        ]
-
-    script_lines.append("        self.wait(2)")
-    return "\n".join(script_lines)
-
-
-# -------------------------
-# Main render logic
-# -------------------------
-
-def build_script_from_params(title: str, scene_params: dict):
+
+def render_video(job: dict, workdir: Path, spec: dict, tier: str, out_path: Path, key: str, on_published,
+                 preview=False, on_playlist=None, on_progress=None, eta_after=0.0):
     """
-    scene_params shape:
-    {
-      sceneType: "...",
-      title: "...",
-      params: {...}
-    }
+    Run Manim for one quality tier, then publish and cache the mp4. With
+    `on_playlist`, the render is also streamed as HLS (see hls.py) and the
+    playlist URL is passed to it once the first segment is out. With
+    `on_progress`, animation progress is reported as it renders (see
+    progress.py); `eta_after` is the expected time of the renders after this one.
     """
-    stype = (scene_params.get("sceneType") or "").lower()
-    params = scene_params.get("params") or {}
-
-    # If title inside scene_params is better, use it
-    sp_title = scene_params.get("title")
-    if sp_title and isinstance(sp_title, str) and sp_title.strip():
-        title = safe_title(sp_title)
-
-    if stype == "text":
-        content = params.get("content") or params.get("text") or title
-        return build_text_scene(title, content)
-
-    if stype == "list":
-        items = params.get("items") or []
-        return build_list_scene(title, items)
-
-    if stype == "dfa":
-        nodes = params.get("nodes", [])
-        edges = params.get("edges", [])
-        explanation = params.get("explanation", "")
-        return build_dfa_scene(title, nodes, edges, explanation)
-
-    if stype == "diagram":
-        nodes = params.get("nodes", [])
-        edges = params.get("edges", [])
-        return build_diagram_scene(title, nodes, edges)
-
-    if stype == "quadratic":
-        a = params.get("a", 1)
-        b = params.get("b", -3)
-        c = params.get("c", -4)
-        show_formula = params.get("showFormula", True)
-        return build_quadratic_scene(title, a, b, c, show_formula=show_formula)
-
-    if stype == "graph":
-        functions = params.get("functions", [{"expr": "x", "label": "y=x"}])
-        x_range = params.get("xRange", [-6, 6])
-        y_range = params.get("yRange", [-6, 6])
-        show_axes = params.get("showAxes", True)
-        notes = params.get("notes", [])
-        return build_graph_scene(title, functions, x_range, y_range, show_axes=show_axes, notes=notes)
-
-    # DEFAULT FALLBACK:
-    # Instead of triangle, fallback to a simple diagram
-    # so ANY unknown prompt still looks "diagrammatic"
-    fallback_nodes = [
-        {"id": "topic", "label": title},
-        {"id": "idea1", "label": "Key Idea 1"},
-        {"id": "idea2", "label": "Key Idea 2"},
-    ]
-    fallback_edges = [
-        {"from": "topic", "to": "idea1", "label": "relates to"},
-        {"from": "topic", "to": "idea2", "label": "includes"},
-    ]
-    return build_diagram_scene(title, fallback_nodes, fallback_edges)
+    prefix = "preview_" if preview else ""
+    scene_type = (spec["sceneParams"].get("sceneType") or "").lower()
+    animations = animation_count(spec)
+    stream = hls.HlsStream(job["jobId"], workdir / "media", OUTPUT_DIR, on_playlist, _uploader) if on_playlist else None
+    tracker = None
+    if on_progress and animations:
+        per_animation = progress.seconds_per_animation(scene_type, tier)
+        tracker = progress.Tracker(
+            workdir / "media", prefix + "render", animations, on_progress, per_animation,
+            eta_after if per_animation is not None else None,
+        )
+    # Decided before this render joins the history it is compared against.
+    slow_after = profiling.threshold(scene_type, tier, animations)
+    capture = workdir / f"{prefix}profile.json" if profiling.ENABLED else None
+    with job_stage(job, prefix + "render"):
+        if stream:
+            stream.start()
+        if tracker:
+            tracker.start()
+        start = time.time()
+        try:
+            run_manim(workdir, spec, tier, out_path, streaming=stream is not None, profile=capture)
+        except BaseException:
+            if tracker:
+                tracker.stop(finished=False)
+            if stream:
+                stream.finish(complete=False)
+            with _job_lock:
+                profiling.keep(job, prefix + "render", tier, capture, time.time() - start, slow_after)
+            raise
+        seconds = time.time() - start
+        with _job_lock:
+            profiling.keep(job, prefix + "render", tier, capture, seconds, slow_after)
+        progress.record(scene_type, tier, seconds, animations)
+        if tracker:
+            tracker.stop()
+        if stream:
+            stream.finish()
+    publish_video(out_path, key, on_published, job, prefix + "upload")
+
+
+def prepare_job(job_file: Path, job: dict):
+    """
+    Build a job's scene spec and settle it from the render cache or an
+    in-flight duplicate. Returns (spec, key) if the job still has to be rendered.
+    """
+    title = safe_title(job.get("prompt", "Manim"))
+    scene_params = job.get("sceneParams") or {}
+    tier = resolve_quality(job.get("quality"))
+    job["renderQuality"] = tier
+
+    with metrics.stage(job, "build"):
+        spec = scene_spec(title, scene_params)
+        key = render_cache.cache_key(spec, tier)
+    cached = render_cache.lookup(key)
+    if cached:
+        count_lookup(job, "hits")
+        print(f"Cache hit for {job['jobId']}: {cached['resultUrl']}")
+        complete_job(job_file, job, status="completed", resultUrl=cached["resultUrl"], cacheHit=True)
+        return None
+    if not coalesce.join(key, job):
+        return None  # another job is already rendering this scene (counted as coalesced)
+    count_lookup(job, "misses")
+    return spec, key
+
+
+def count_lookup(job: dict, outcome: str):
+    """Count a job's cache hit or miss once, however often the job is retried."""
+    if render_cache.ENABLED and not job.get("cacheCounted"):
+        job["cacheCounted"] = outcome
+        render_cache.count(outcome)
+
+
+def result_published(job_file: Path, job: dict, url, error):
+    if error is not None:
+        complete_job(job_file, job, status="failed", error=f"S3 upload failed: {error}")
+    else:
+        complete_job(job_file, job, status="completed", resultUrl=url)
 
 
 def render_job(job_file: Path, job: dict):
-    job["status"] = "processing"
-    write_job(job_file, job)
+    prepared = prepare_job(job_file, job)
+    if prepared:
+        render_prepared(job_file, job, *prepared)
+
+
+def render_prepared(job_file: Path, job: dict, spec: dict, key: str):
+    """Render a prepared job: the preview (if any), then the requested tier."""
+    tier = job["renderQuality"]
+
+    # Each render has its own timeout; the watchdog allows for all of them.
+    renders = 2 if PREVIEW_ENABLED and tier != "low" else 1
+    worker_pool.watch(job["jobId"], render_limits.JOB_TIMEOUT * renders)
 
     workdir = job_file.with_suffix("")
     if workdir.exists():
         shutil.rmtree(workdir)
     workdir.mkdir()
 
-    title = safe_title(job.get("prompt", "Manim"))
-    scene_params = job.get("sceneParams") or {}
+    def preview_published(url, error):
+        if error is not None:
+            print(f"Preview upload for {job['jobId']} failed: {error}")
+            return
+        update_job(job_file, job, previewUrl=url)
+        coalesce.share(job, previewUrl=url)
 
-    script = build_script_from_params(title, scene_params)
-    script_path = workdir / "scene.py"
-    script_path.write_text(script)
+    def playlist_published(url):
+        update_job(job_file, job, playlistUrl=url)
+        coalesce.share(job, playlistUrl=url)
 
-    out_name = f"{job['jobId']}.mp4"
-    out_path = OUTPUT_DIR / out_name
+    def progress_published(update):
+        update_job(job_file, job, progress=update)
+        coalesce.share(job, progress=update)
 
+    # Stream the first render that runs (the preview, if there is one) as HLS.
+    on_playlist = playlist_published if hls.ENABLED else None
     try:
-        cmd = [
-            "manim",
-            str(script_path),
-            "GeneratedScene",
-            "-ql",
-            "--format",
-            "mp4",
-            "-o",
-            str(out_path),
-        ]
-        print("Running:", " ".join(cmd))
-        subprocess.run(cmd, check=True, cwd=workdir)
-
-        job["status"] = "completed"
-
-        # Optional S3 upload
-        s3_bucket = os.environ.get("AWS_S3_BUCKET") or os.environ.get("AWS_BUCKET")
-        if s3_bucket:
-            s3_key = f"manim_videos/{out_name}"
-            try:
-                s3_client = boto3.client(
-                    "s3",
-                    aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"),
-                    aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY"),
-                    region_name=os.environ.get("AWS_REGION"),
-                )
-                print(f"Uploading {out_path} to s3://{s3_bucket}/{s3_key}")
-                s3_client.upload_file(
-                    str(out_path),
-                    s3_bucket,
-                    s3_key,
-                    ExtraArgs={"ACL": "public-read", "ContentType": "video/mp4"},
+        # Publish a fast low-quality cut first so students have something to
+        # watch while the requested tier renders.
+        if PREVIEW_ENABLED and tier != "low":
+            preview_key = render_cache.cache_key(spec, "low")
+            preview = render_cache.lookup(preview_key)
+            if render_cache.ENABLED:
+                render_cache.count("previewHits" if preview else "previewMisses")
+            if preview:
+                preview_published(preview["resultUrl"], None)
+            else:
+                preview_path = OUTPUT_DIR / f"{job['jobId']}-preview.mp4"
+                # The ETA of the preview includes the full-quality render after it.
+                scene_type = (spec["sceneParams"].get("sceneType") or "").lower()
+                eta_after = progress.expected_seconds(scene_type, tier, animation_count(spec))
+                render_video(
+                    job, workdir, spec, "low", preview_path, preview_key, preview_published,
+                    preview=True, on_playlist=on_playlist, on_progress=progress_published, eta_after=eta_after,
                 )
-                job["resultUrl"] = f"https://{s3_bucket}.s3.amazonaws.com/{s3_key}"
-            except (BotoCoreError, ClientError) as e:
-                job["status"] = "failed"
-                job["error"] = f"S3 upload failed: {e}"
+            on_playlist = None
+
+        out_path = OUTPUT_DIR / f"{job['jobId']}.mp4"
+        render_video(
+            job, workdir, spec, tier, out_path, key, partial(result_published, job_file, job),
+            on_playlist=on_playlist, on_progress=progress_published,
+        )
+        lifecycle.reclaim_workdir(workdir)
+
+    except RenderError as e:
+        print(f"Render of {job['jobId']} failed ({e.reason}): {e}")
+        complete_job(job_file, job, status="failed", error=str(e), failureReason=e.reason)
+
+
+def batch_scene_name(job_id: str):
+    return "Scene_" + re.sub(r"\W", "_", job_id)
+
+
+def run_manim_batch(workdir: Path, specs: dict, tier: str):
+    """
+    Render several scenes in one manim CLI invocation, so the jobs share one
+    interpreter start, config load and import of manim. `specs` maps scene
+    class names to scene specs. Returns ({class name: mp4}, error): the
+    scenes that rendered, and the RenderError that stopped the run, if any.
+    """
+    media_dirs = media_cache.prepare()
+    (workdir / scenes.SPEC_FILE).write_text(json.dumps([{**spec, "name": name} for name, spec in specs.items()]))
+    if media_dirs:
+        (workdir / "manim.cfg").write_text(media_cache.manim_cfg(media_dirs))
+    cmd = ["manim", str(SCENE_RUNNER), *specs, *quality_args(tier), "--format", "mp4"]
+    print(f"Running {len(specs)} scenes:", " ".join(cmd))
+    error = None
+    try:
+        render_limits.run_command(
+            cmd, workdir, timeout=render_limits.JOB_TIMEOUT * len(specs), on_start=worker_pool.set_render_group
+        )
+        media_cache.publish()
+    except RenderError as e:
+        error = e
+
+    # Manim names each output after its scene: media/videos/scene_runner/<quality>/<name>.mp4
+    outputs = {}
+    for path in (workdir / "media" / "videos").glob("**/*.mp4"):
+        if path.stem in specs and "partial_movie_files" not in path.parts:
+            outputs[path.stem] = path
+    if error is not None and error.reason != "render_error":
+        # Scenes render in order; a killed run may have cut the last output short.
+        rendered = [name for name in specs if name in outputs]
+        if rendered:
+            del outputs[rendered[-1]]
+    return outputs, error
+
+
+def render_batch(batch, published: set):
+    """
+    Render prepared jobs of one quality tier in a single manim invocation.
+    `batch` holds (job_file, job, spec, key) tuples. The ids of jobs handed
+    to publish_video are added to `published`: their upload callback settles
+    them. Batched jobs get no preview or HLS stream.
+    """
+    tier = batch[0][1]["renderQuality"]
+    job_ids = [job["jobId"] for _, job, _, _ in batch]
+    worker_pool.watch(job_ids, render_limits.JOB_TIMEOUT * len(batch))
+
+    workdir = batch[0][0].with_name(f"{job_ids[0]}-batch")
+    if workdir.exists():
+        shutil.rmtree(workdir)
+    workdir.mkdir()
+
+    specs = {batch_scene_name(job["jobId"]): spec for _, job, spec, _ in batch}
+    start = time.time()
+    outputs, error = run_manim_batch(workdir, specs, tier)
+    seconds = time.time() - start
+    if error is not None:
+        print(f"Batch of {len(batch)} stopped after {len(outputs)} scenes ({error.reason}): {error}")
+    # Each job's render time is its share of the run, the failed scene included.
+    share = seconds / max(1, len(outputs) + (error is not None))
+
+    leftovers = []
+    for job_file, job, spec, key in batch:
+        mp4 = outputs.get(batch_scene_name(job["jobId"]))
+        if mp4 is None:
+            leftovers.append((job_file, job, spec, key))
+            continue
+        job["batchSize"] = len(batch)
+        metrics.record(job, "render", start, share)
+        out_path = OUTPUT_DIR / f"{job['jobId']}.mp4"
+        shutil.move(mp4, out_path)
+        published.add(job["jobId"])
+        publish_video(out_path, key, partial(result_published, job_file, job), job, "upload")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    # The first scene that did not render stopped the run: retry it on its own
+    # and the scenes after it as a new batch.
+    if leftovers:
+        job_file, job, spec, key = leftovers[0]
+        run_job(job_file, job, render_prepared, spec, key)
+    if len(leftovers) > 2:
+        render_batch(leftovers[1:], published)
+    elif len(leftovers) == 2:
+        job_file, job, spec, key = leftovers[1]
+        run_job(job_file, job, render_prepared, spec, key)
+
+
+def run_job(job_file: Path, job: dict, step, *args):
+    """Call step(job_file, job, *args); an unexpected error fails the job."""
+    try:
+        return step(job_file, job, *args)
+    except Exception as e:
+        complete_job(job_file, job, status="failed", error=str(e), failureReason="worker_error")
+    finally:
+        worker_pool.unwatch()
+
+
+def process_batch(claimed):
+    """Settle claimed jobs from the cache, then render the rest in one batch per tier."""
+    tiers = {}
+    published = set()
+    for job_file, job in claimed:
+        prepared = run_job(job_file, job, prepare_job)
+        if prepared:
+            tiers.setdefault(job["renderQuality"], []).append((job_file, job, *prepared))
+    for batch in tiers.values():
+        if len(batch) == 1:
+            job_file, job, spec, key = batch[0]
+            run_job(job_file, job, render_prepared, spec, key)
+            continue
+        try:
+            render_batch(batch, published)
+        except Exception as e:
+            for job_file, job, _, _ in batch:
+                # Published jobs are settled by their upload callback.
+                if job.get("status") == "processing" and job["jobId"] not in published:
+                    complete_job(job_file, job, status="failed", error=str(e), failureReason="worker_error")
+        finally:
+            worker_pool.unwatch()
+
+
+def warm_targets():
+    """(name, tier, sceneParams) of every preset at every tier it should be warm in."""
+    try:
+        presets = json.loads(PRESETS_PATH.read_text())
+    except (FileNotFoundError, ValueError) as e:
+        print(f"No presets to pre-render ({e})")
+        return []
+    # Every tier up to MAX_QUALITY, unless MANIM_WARM_QUALITIES names them.
+    names = os.environ.get("MANIM_WARM_QUALITIES") or ",".join(QUALITY_ORDER)
+    tiers = []
+    for name in names.split(","):
+        tier = resolve_quality(name)
+        if tier not in tiers:
+            tiers.append(tier)
+    return [(name, tier, spec) for name, spec in presets.items() for tier in tiers]
+
+
+def warm_preset(name: str, tier: str, scene_params: dict):
+    """
+    Render one preset into the render cache, pinned so it is never evicted.
+    A preset that is already cached (say a student asked for it first) is
+    just pinned, and one another slot is rendering is skipped. The render
+    runs in the background (see run_manim) and is given up when a job is
+    left waiting; then this returns False so the preset can be tried again.
+    """
+    title = safe_title(scene_params.get("title") or name)
+    spec = scene_spec(title, scene_params)
+    key = render_cache.cache_key(spec, tier)
+    if render_cache.pin(key):
+        return True
+
+    WARM_DIR.mkdir(parents=True, exist_ok=True)
+    claim = WARM_DIR / key
+    try:
+        os.close(os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        try:
+            stale = claim.stat().st_mtime < time.time() - 2 * render_limits.JOB_TIMEOUT
+        except FileNotFoundError:
+            stale = True
+        if not stale:
+            return True
+        claim.touch()  # left by a worker that died mid-render
+
+    preset_id = f"preset-{name}-{tier}"
+    workdir = JOB_DIR / f"warm-{preset_id}"
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir()
+    out_path = OUTPUT_DIR / f"{preset_id}.mp4"
+
+    def published(url, error):
+        if error is not None:
+            print(f"Upload of {preset_id} failed: {error}")
         else:
-            job["resultUrl"] = f"/manim_videos/{out_name}"
+            print(f"Pre-rendered {preset_id}: {url}")
 
-    except subprocess.CalledProcessError as e:
-        job["status"] = "failed"
-        job["error"] = str(e)
+    worker_pool.watch(preset_id, render_limits.JOB_TIMEOUT)
+    try:
+        run_manim(workdir, spec, tier, out_path, background=True)
+        publish_video(out_path, key, published, {"jobId": preset_id}, "upload", pinned=True)
+    except RenderPreempted:
+        print(f"Pre-rendering {preset_id} stopped: a job is waiting")
+        return False
+    except RenderError as e:
+        print(f"Pre-rendering {preset_id} failed ({e.reason}): {e}")
     finally:
-        job["processedAt"] = time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        write_job(job_file, job)
+        worker_pool.unwatch()
+        shutil.rmtree(workdir, ignore_errors=True)
+        claim.unlink(missing_ok=True)
+    return True
+
+
+def worker_loop(slot: int, renderer: str = "subprocess", batch_size: int = 1):
+    global _renderer, _uploader
+    metrics.set_source(f"slot{slot}")
+    media_cache.attach(slot)
+    if renderer == "warm":
+        _renderer = WarmRenderer()
+        _renderer.start()
+        # The warm renderer already shares its process between jobs.
+        batch_size = 1
+    if s3_upload.enabled():
+        _uploader = s3_upload.Uploader()
+    watcher = job_queue.watcher()
+    # One slot warms presets, so the others stay free for jobs queued meanwhile.
+    warm = warm_targets() if slot == 0 and WARM_PRESETS and render_cache.ENABLED else []
+    while True:
+        coalesce.sweep()
+        lifecycle.sweep()
+        job_file, job = pick_job()
+        if job_file:
+            claimed = [(job_file, job)]
+            while len(claimed) < batch_size:
+                job_file, job = pick_job()
+                if not job_file:
+                    break
+                claimed.append((job_file, job))
+            for job_file, job in claimed:
+                print(f"[slot {slot}] Processing", job_file)
+                metrics.claimed(job)
+            if len(claimed) == 1:
+                run_job(*claimed[0], render_job)
+            else:
+                process_batch(claimed)
+            watcher.reset()
+        elif warm:
+            # Idle: pre-render one preset, then look at the queue again.
+            target = warm.pop(0)
+            if not warm_preset(*target):
+                warm.append(target)
+        else:
+            job_queue.wait_for_work(watcher)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Render queued Manim jobs")
+    add_slots_argument(parser)
+    parser.add_argument(
+        "--renderer",
+        choices=["subprocess", "warm"],
+        default=os.environ.get("MANIM_RENDERER", "subprocess"),
+        help="run the manim CLI per job, or keep a warm renderer process per slot (env MANIM_RENDERER)",
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=int(os.environ.get("MANIM_BATCH_SIZE", "1")),
+        help="render up to this many queued jobs in one manim invocation (env MANIM_BATCH_SIZE, default 1)",
+    )
+    args = parser.parse_args()
+
     ensure_dirs()
-    print("Manim worker started; polling", JOB_DIR)
+    print(f"Manim worker started with {args.slots} {args.renderer} slot(s); polling", JOB_DIR)
+    metrics.set_source("supervisor")
+    metrics.start_exporter()
+    job_service.start_server()
     try:
-        while True:
-            job_file, job = pick_job()
-            if job_file:
-                print("Processing", job_file)
-                render_job(job_file, job)
-            else:
-                time.sleep(2)
+        run_slots(partial(worker_loop, renderer=args.renderer, batch_size=args.batch), args.slots, on_stuck=release_stuck)
     except KeyboardInterrupt:
         print("Worker stopped")
 
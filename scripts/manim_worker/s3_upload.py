@@ -0,0 +1,127 @@
+"""
+S3 uploads for rendered videos.
+
+One boto3 client is created per worker process and reused for every upload,
+so credential resolution and connection setup happen once. Uploads use a
+TransferConfig with multipart and concurrent parts, and run on a small
+background stage (Uploader) so a slot can start its next render while the
+previous mp4 is still uploading.
+
+Environment:
+- AWS_S3_BUCKET / AWS_BUCKET, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION
+- AWS_S3_ENDPOINT_URL: S3-compatible endpoint (MinIO, moto server); URLs
+  are then path-style under this endpoint unless AWS_S3_PUBLIC_URL is set
+- AWS_S3_PUBLIC_URL: base URL for resultUrl, e.g. a CDN in front of the bucket
+- MANIM_UPLOAD_WORKERS: concurrent uploads per slot (default 2)
+- MANIM_UPLOAD_CONCURRENCY: parallel parts per multipart upload (default 8)
+
+boto3 is imported lazily so the worker runs without it when S3 is unused.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MB = 1024 * 1024
+UPLOAD_WORKERS = int(os.environ.get("MANIM_UPLOAD_WORKERS", "2"))
+PART_CONCURRENCY = int(os.environ.get("MANIM_UPLOAD_CONCURRENCY", "8"))
+
+_client = None
+_transfer_config = None
+_client_lock = threading.Lock()
+
+
+def bucket():
+    return os.environ.get("AWS_S3_BUCKET") or os.environ.get("AWS_BUCKET")
+
+
+def enabled():
+    return bool(bucket())
+
+
+def get_client():
+    """The process-wide S3 client (boto3 clients are thread-safe)."""
+    global _client, _transfer_config
+    with _client_lock:
+        if _client is None:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+
+            _client = boto3.client(
+                "s3",
+                aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"),
+                aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY"),
+                region_name=os.environ.get("AWS_REGION"),
+                endpoint_url=os.environ.get("AWS_S3_ENDPOINT_URL"),
+            )
+            _transfer_config = TransferConfig(
+                multipart_threshold=8 * MB,
+                multipart_chunksize=8 * MB,
+                max_concurrency=PART_CONCURRENCY,
+                use_threads=True,
+            )
+        return _client
+
+
+def public_url(key: str):
+    base = os.environ.get("AWS_S3_PUBLIC_URL")
+    if base:
+        return f"{base.rstrip('/')}/{key}"
+    endpoint = os.environ.get("AWS_S3_ENDPOINT_URL")
+    if endpoint:
+        return f"{endpoint.rstrip('/')}/{bucket()}/{key}"
+    return f"https://{bucket()}.s3.amazonaws.com/{key}"
+
+
+def upload_file(path, key: str, content_type: str, cache_control=None):
+    """Upload one public file under `key` and return its URL. Raises on failure."""
+    extra = {"ACL": "public-read", "ContentType": content_type}
+    if cache_control:
+        extra["CacheControl"] = cache_control
+    client = get_client()
+    client.upload_file(str(path), bucket(), key, ExtraArgs=extra, Config=_transfer_config)
+    return public_url(key)
+
+
+def upload_video(path):
+    """Upload one mp4 and return its public URL. Raises on failure."""
+    key = f"manim_videos/{os.path.basename(path)}"
+    print(f"Uploading {path} to s3://{bucket()}/{key}")
+    return upload_file(path, key, "video/mp4")
+
+
+class Uploader:
+    """
+    Background upload stage.
+
+    `submit(path, callback)` returns immediately; the callback later receives
+    (url, None) or (None, error) on an upload thread, and must handle its own
+    failures (an exception it raises is only logged). `upload` replaces
+    upload_video for other files, e.g. a partial of upload_file with the key
+    and content type. At most `workers * 2` uploads may be pending, after
+    which submit() blocks so a slow bucket applies backpressure to rendering
+    instead of piling up finished mp4s.
+    """
+
+    def __init__(self, workers=UPLOAD_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+        self._slots = threading.BoundedSemaphore(workers * 2)
+
+    def _run(self, path, callback, upload):
+        try:
+            url, error = upload(path), None
+        except Exception as e:
+            url, error = None, e
+        try:
+            callback(url, error)
+        except Exception as e:
+            print(f"Upload callback for {path} failed: {e}")
+        finally:
+            self._slots.release()
+
+    def submit(self, path, callback, upload=upload_video):
+        self._slots.acquire()
+        self._executor.submit(self._run, path, callback, upload)
+
+    def close(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,22 @@
+"""
+The scene file the manim CLI renders for every job.
+
+The worker writes the scenes to draw to `scenes.json` in the render's
+working directory, a list of {"name", "title", "sceneParams", "grouped"},
+and runs `manim <this file> <name>...` there. This module defines one Scene
+class per entry with scenes.scene_class(), so the CLI draws exactly what the
+warm renderer draws and nothing in the file comes from a job.
+"""
+
+import sys
+import json
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import scenes  # noqa: E402
+
+for _spec in json.loads(Path(scenes.SPEC_FILE).read_text()):
+    globals()[_spec["name"]] = scenes.scene_class(
+        _spec["title"], _spec["sceneParams"], _spec["grouped"], name=_spec["name"]
+    )
@@ -0,0 +1,337 @@
+"""
+The Manim scenes, drawn directly from validated sceneParams.
+
+Each `sceneType` has a builder function that reads its params dict and
+draws through a Canvas. Every render path uses them: the warm renderer child
+calls build_scene(), and the manim CLI renders scene_runner.py, which defines
+one Scene class per job with scene_class(). No Python source is generated
+from a job, so user-supplied strings only ever reach Manim as Text/MathTex
+arguments.
+
+Builders get manim as `c.m` instead of importing it, so this module imports
+without manim. count_animations() runs a builder against a stand-in to learn
+how many play/wait calls (and so partial movie files) a render makes; the
+slot processes use it for progress without loading manim.
+"""
+
+import curves
+
+# The specs the manim CLI renders, in the render's working directory (see scene_runner.py).
+SPEC_FILE = "scenes.json"
+
+
+def _s(value):
+    return "" if value is None else str(value)
+
+
+class Canvas:
+    """What a builder draws on: a live Scene, or a counter (see count_animations)."""
+
+    def __init__(self, scene, m, title: str, grouped=False):
+        self.scene = scene
+        self.m = m
+        self.title_text = title
+        self.grouped = grouped
+
+    def play(self, *animations):
+        self.scene.play(*animations)
+
+    def wait(self, seconds):
+        self.scene.wait(seconds)
+
+    def play_title(self):
+        m = self.m
+        title = m.Text(self.title_text, font_size=52).to_edge(m.UP)
+        self.play(m.Write(title))
+        return title
+
+    def play_steps(self, steps):
+        """
+        Play `steps`, each a list of animations that run together. Grouped,
+        the whole list becomes one LaggedStart(lag_ratio=1) call: the timing
+        is unchanged, but Manim writes one partial movie file for it instead
+        of one per step.
+        """
+        if not self.grouped or len(steps) < 2:
+            for step in steps:
+                self.play(*step)
+            return
+        m = self.m
+        parts = [step[0] if len(step) == 1 else m.AnimationGroup(*step) for step in steps]
+        self.play(m.LaggedStart(*parts, lag_ratio=1.0))
+
+
+def text_scene(c, params):
+    m = c.m
+    content = params.get("content") or params.get("text") or c.title_text
+    lines = [l.strip() for l in str(content).split("\n") if l.strip()]
+    if not lines:
+        lines = [c.title_text]
+
+    c.play_title()
+    c.play_steps([
+        [m.Write(m.Text(line, font_size=34).move_to([0, 1.8 - i * 0.65, 0]))]
+        for i, line in enumerate(lines[:7])
+    ])
+    c.wait(2)
+
+
+def list_scene(c, params):
+    m = c.m
+    items = [str(x) for x in (params.get("items") or [])][:8]
+
+    title = c.play_title()
+    c.play_steps([
+        [m.Write(m.Text(f"• {it}", font_size=34).move_to([-4.5, 1.8 - i * 0.6, 0]).align_to(title, m.LEFT))]
+        for i, it in enumerate(items)
+    ])
+    c.wait(2)
+
+
+def dfa_scene(c, params):
+    m = c.m
+    nodes = (params.get("nodes") or [])[:6]
+    edges = (params.get("edges") or [])[:12]
+    explanation = params.get("explanation") or ""
+
+    c.play_title()
+
+    spacing = 2.0
+    start_x = -((len(nodes) - 1) * spacing) / 2 if len(nodes) > 1 else -2.5
+    circles = {}
+    steps = []
+    for i, n in enumerate(nodes):
+        nid = _s(n.get("id", f"q{i}"))
+        label = _s(n.get("label", nid))
+        x = start_x + i * spacing
+
+        circle = m.Circle(radius=0.45, color=m.BLUE).move_to([x, 0, 0])
+        circles[nid] = circle
+        steps.append([m.Create(circle), m.Write(m.MathTex(label).scale(0.9).move_to(circle.get_center()))])
+        if n.get("accept"):
+            steps.append([m.Create(m.Circle(radius=0.55, color=m.BLUE).move_to(circle.get_center()))])
+        if n.get("start"):
+            steps.append([m.Create(m.Arrow([x - 1.2, 0, 0], circle.get_left(), buff=0.1))])
+    c.play_steps(steps)
+
+    steps = []
+    for e in edges:
+        frm, to = circles.get(_s(e.get("from"))), circles.get(_s(e.get("to")))
+        if frm is None or to is None:
+            continue
+        arr = m.Arrow(frm.get_center(), to.get_center(), buff=0.6)
+        steps.append([m.Create(arr)])
+        label = _s(e.get("label"))
+        if label:
+            steps.append([m.Write(m.MathTex(label).scale(0.8).next_to(arr, m.UP))])
+    c.play_steps(steps)
+
+    if explanation:
+        c.play(m.Write(m.Text(str(explanation), font_size=30).to_edge(m.DOWN)))
+    c.wait(2)
+
+
+def diagram_scene(c, params):
+    m = c.m
+    nodes = (params.get("nodes") or [])[:6]
+    edges = (params.get("edges") or [])[:10]
+
+    c.play_title()
+
+    if len(nodes) == 3:
+        positions = [[-4, 0, 0], [0, 0, 0], [4, 0, 0]]
+    else:
+        spacing = 3.0
+        start_x = -((len(nodes) - 1) * spacing) / 2
+        positions = [[start_x + i * spacing, 0, 0] for i in range(len(nodes))]
+
+    boxes = {}
+    for i, n in enumerate(nodes):
+        nid = _s(n.get("id", f"n{i}"))
+        txt = m.Text(_s(n.get("label", nid)), font_size=30)
+        box = m.SurroundingRectangle(txt, buff=0.35, corner_radius=0.2)
+        boxes[nid] = m.VGroup(box, txt).move_to(positions[i])
+    c.play_steps([[m.FadeIn(grp)] for grp in boxes.values()])
+
+    steps = []
+    for e in edges:
+        frm, to = boxes.get(_s(e.get("from"))), boxes.get(_s(e.get("to")))
+        if frm is None or to is None:
+            continue
+        arr = m.Arrow(frm.get_right(), to.get_left(), buff=0.15)
+        steps.append([m.Create(arr)])
+        label = _s(e.get("label"))
+        if label:
+            steps.append([m.Write(m.Text(label, font_size=24).next_to(arr, m.UP))])
+    c.play_steps(steps)
+    c.wait(2)
+
+
+def quadratic_scene(canvas, params):
+    m = canvas.m
+    try:
+        a = float(params.get("a", 1))
+        b = float(params.get("b", -3))
+        c = float(params.get("c", -4))
+    except (TypeError, ValueError):
+        a, b, c = 1.0, -3.0, -4.0
+
+    def f(x):
+        return a * x * x + b * x + c
+
+    canvas.play_title()
+    axes = m.Axes(x_range=[-6, 6, 1], y_range=[-6, 6, 1], x_length=10, y_length=5, tips=False).shift(m.DOWN * 0.5)
+    steps = [[m.Create(axes)]]
+    pieces = curves.sample(f, (-6, 6), (-6, 6))
+    if pieces:
+        steps.append([m.Create(curve(m, axes, pieces))])
+
+    if params.get("showFormula", True):
+        formula = f"y = {a}x^2 + {b}x + {c}".replace("+ -", "- ")
+        steps.append([m.Write(m.MathTex(formula).scale(0.9).to_edge(m.DOWN))])
+
+    if a != 0:
+        xv = -b / (2 * a)
+        v_dot = m.Dot(axes.coords_to_point(xv, f(xv)))
+        steps.append([m.FadeIn(v_dot), m.Write(m.Text("Vertex", font_size=24).next_to(v_dot, m.UP))])
+
+    canvas.play_steps(steps)
+    canvas.wait(2)
+
+
+def curve(m, axes, pieces):
+    """The visible pieces from curves.sample() as one smooth VMobject each."""
+    return m.VGroup(*[m.VMobject().set_points_smoothly([axes.c2p(x, y) for x, y in piece]) for piece in pieces])
+
+
+def graph_scene(c, params):
+    m = c.m
+    functions = (params.get("functions") or [{"expr": "x", "label": "y=x"}])[:2]
+    notes = params.get("notes") or []
+    x0, x1, y0, y1 = -6.0, 6.0, -6.0, 6.0
+    try:
+        x_range, y_range = params.get("xRange"), params.get("yRange")
+        if x_range and len(x_range) == 2:
+            x0, x1 = float(x_range[0]), float(x_range[1])
+        if y_range and len(y_range) == 2:
+            y0, y1 = float(y_range[0]), float(y_range[1])
+    except (TypeError, ValueError):
+        pass
+
+    c.play_title()
+    steps = []
+    if params.get("showAxes", True):
+        axes = m.Axes(x_range=[x0, x1, 1], y_range=[y0, y1, 1], x_length=10, y_length=5, tips=False).shift(m.DOWN * 0.5)
+        steps.append([m.Create(axes)])
+        window = (x0, x1), (y0, y1)
+    else:
+        axes = m.Axes(x_range=[-6, 6, 1], y_range=[-6, 6, 1], x_length=10, y_length=5, tips=False).shift(m.DOWN * 0.5)
+        window = (max(x0, -6), min(x1, 6)), (-6, 6)
+
+    # Only the expressions in curves.EXPRESSIONS are supported (no eval).
+    for fn in functions:
+        expr = _s(fn.get("expr", "x"))
+        pieces = curves.sample(curves.expr_to_func(expr), *window)
+        if pieces:
+            steps.append([m.Create(curve(m, axes, pieces))])
+        steps.append([m.Write(m.Text(_s(fn.get("label", expr)), font_size=24).to_edge(m.DOWN).shift(m.UP * 0.4))])
+
+    if notes:
+        note_text = " | ".join(str(n) for n in notes[:2])
+        steps.append([m.Write(m.Text(note_text, font_size=26).to_edge(m.DOWN))])
+
+    c.play_steps(steps)
+    c.wait(2)
+
+
+SCENES = {
+    "text": text_scene,
+    "list": list_scene,
+    "dfa": dfa_scene,
+    "diagram": diagram_scene,
+    "quadratic": quadratic_scene,
+    "graph": graph_scene,
+}
+
+FALLBACK_PARAMS = {
+    "nodes": [
+        {"id": "topic", "label": None},
+        {"id": "idea1", "label": "Key Idea 1"},
+        {"id": "idea2", "label": "Key Idea 2"},
+    ],
+    "edges": [
+        {"from": "topic", "to": "idea1", "label": "relates to"},
+        {"from": "topic", "to": "idea2", "label": "includes"},
+    ],
+}
+
+
+def resolve(title: str, scene_params: dict):
+    """The (builder, params) that draw a job's sceneParams."""
+    stype = (scene_params.get("sceneType") or "").lower()
+    params = scene_params.get("params") or {}
+
+    if stype == "dfa" and not params.get("nodes"):
+        return text_scene, {"content": "No DFA nodes provided."}
+    if stype == "diagram" and not params.get("nodes"):
+        return text_scene, {"content": "No diagram nodes provided."}
+    if stype in SCENES:
+        return SCENES[stype], params
+
+    # Unknown sceneType: a three-box diagram, so any prompt still looks diagrammatic.
+    return diagram_scene, {
+        "nodes": [dict(n, label=n["label"] or title) for n in FALLBACK_PARAMS["nodes"]],
+        "edges": FALLBACK_PARAMS["edges"],
+    }
+
+
+def scene_class(title: str, scene_params: dict, grouped=False, name="GeneratedScene"):
+    """A Scene subclass called `name` that draws one job; `title` is already resolved and sanitized."""
+    import manim
+
+    build, params = resolve(title, scene_params)
+
+    def construct(self):
+        build(Canvas(self, manim, title, grouped), params)
+
+    return type(name, (manim.Scene,), {"construct": construct})
+
+
+def build_scene(title: str, scene_params: dict, grouped=False):
+    """Instantiate the Scene for a job; `title` is already resolved and sanitized."""
+    return scene_class(title, scene_params, grouped)()
+
+
+class _Stub:
+    """Stands in for manim and for everything built from it."""
+
+    def __getattr__(self, name):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __mul__(self, other):
+        return self
+
+    __rmul__ = __add__ = __radd__ = __sub__ = __rsub__ = __mul__
+
+
+class _Counter(Canvas):
+    def __init__(self, title: str, grouped=False):
+        super().__init__(None, _Stub(), title, grouped)
+        self.calls = 0
+
+    def play(self, *animations):
+        self.calls += 1
+
+    def wait(self, seconds):
+        self.calls += 1
+
+
+def count_animations(title: str, scene_params: dict, grouped=False):
+    """How many play/wait calls a job's scene makes, without importing manim."""
+    build, params = resolve(title, scene_params)
+    counter = _Counter(title, grouped)
+    build(counter, params)
+    return counter.calls
@@ -0,0 +1,125 @@
+"""
+Long-lived Manim renderer processes.
+
+Starting the `manim` CLI for every job re-imports manim, numpy, cairo and
+pango and rebuilds the config before the first frame is drawn. A
+WarmRenderer keeps a child process that has already done that work and sends
+it scene specs (title + validated sceneParams) over the executor's pipe.
+
+The child draws them with the scene builders in scenes.py, the same ones the
+manim CLI path renders through scene_runner.py, so no Python source is
+generated from a job; the render still happens outside the slot process,
+which can kill it.
+Children are recycled every MAX_TASKS renders to bound memory growth.
+
+Each render runs under the limits in render_limits.py: the child's CPU limit
+is re-armed per render, and a render past MANIM_JOB_TIMEOUT gets its child
+killed and replaced.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import render_limits
+from render_limits import RenderError, RenderTimeout
+
+MAX_TASKS = int(os.environ.get("MANIM_WARM_MAX_TASKS", "50"))
+
+
+def _warm_up():
+    # Pay the import cost once, when the child starts.
+    import manim  # noqa: F401
+    import scenes  # noqa: F401  (imports numpy)
+
+
+def _render(title, scene_params, width, height, fps, out_path, media_dir, grouped, config, profile):
+    from manim import tempconfig
+    import scenes
+    import profiling
+
+    # RLIMIT_CPU counts the child's whole lifetime, so allow CPU_LIMIT more.
+    render_limits.apply_rlimits(cpu_offset=render_limits.cpu_used())
+
+    options = {
+        # Only used to name intermediate directories; nothing is read from it.
+        "input_file": os.path.join(media_dir, "GeneratedScene.py"),
+        "media_dir": media_dir,
+        "pixel_width": width,
+        "pixel_height": height,
+        "frame_rate": fps,
+        "format": "mp4",
+        "output_file": out_path,
+        "write_to_movie": True,
+        "progress_bar": "none",
+        **config,
+    }
+    capture = profiling.Capture() if profile else None
+    if capture:
+        capture.start(profile)
+    try:
+        with tempconfig(options):
+            scenes.build_scene(title, scene_params, grouped).render()
+    finally:
+        if capture:
+            capture.stop()
+    return out_path
+
+
+class WarmRenderer:
+    def __init__(self, processes=1):
+        self.processes = processes
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=_warm_up,
+                max_tasks_per_child=MAX_TASKS,
+            )
+        return self._executor
+
+    def start(self):
+        """Spawn and warm the child now instead of on the first job."""
+        self._pool().submit(int).result()
+
+    def render(self, title, scene_params, width, height, fps, out_path, media_dir, grouped=False,
+               timeout=render_limits.JOB_TIMEOUT, config=None, profile=None):
+        """
+        Render one job's scene (see scenes.build_scene) into out_path.
+        `config` holds extra Manim config, e.g. tex_dir from media_cache.
+        With `profile`, the child writes a profile capture there (see profiling.py).
+        """
+        future = self._pool().submit(
+            _render, title, scene_params, width, height, fps, str(out_path), str(media_dir), grouped, config or {},
+            str(profile) if profile else None,
+        )
+        try:
+            return future.result(timeout=timeout or None)
+        except TimeoutError:
+            self.kill()
+            raise RenderTimeout(timeout)
+        except BrokenProcessPool as e:
+            # Usually a CPU, memory or file size limit; the signal is not reported.
+            self.close()
+            raise RenderError(f"renderer process died: {e}", reason="renderer_crashed") from e
+        except Exception as e:
+            raise RenderError(f"{type(e).__name__}: {e}") from e
+
+    def kill(self):
+        """Kill and reap the children; the next render starts a fresh one."""
+        if self._executor is None:
+            return
+        # shutdown() waits for a running render, so kill the children first.
+        procs = list((self._executor._processes or {}).values())
+        for p in procs:
+            p.kill()
+        for p in procs:
+            p.join(5)
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,161 @@
+"""
+Run a worker loop in N concurrent render slots.
+
+Each slot is a separate process, so a slot blocked in a render never holds
+up the others. The supervisor restarts slots that exit unexpectedly.
+
+It is also the watchdog: while a slot works on a job it publishes a deadline
+(`watch()`), and a slot still busy past its deadline plus
+MANIM_WATCHDOG_GRACE seconds is killed together with its render process
+group, its jobs are handed to `on_stuck(job_id, reason)`, and the slot is
+restarted. Render timeouts inside the slot normally fire first; the watchdog
+covers slots that hang outside them.
+"""
+
+import os
+import time
+import ctypes
+import signal
+import multiprocessing as mp
+
+WATCHDOG_GRACE = float(os.environ.get("MANIM_WATCHDOG_GRACE", "30"))
+# Room for the comma-separated job ids of one batch (see render_worker.py).
+JOB_ID_BYTES = 1024
+
+# Shared with the supervisor; set in each slot process by _run_slot.
+_slot = None
+_deadlines = None
+_render_groups = None
+_jobs = None
+
+
+def default_slots():
+    env = os.environ.get("MANIM_WORKER_SLOTS")
+    if env:
+        return max(1, int(env))
+    return os.cpu_count() or 1
+
+
+def add_slots_argument(parser):
+    parser.add_argument(
+        "--slots",
+        type=int,
+        default=default_slots(),
+        help="concurrent render slots (env MANIM_WORKER_SLOTS, default: CPU count)",
+    )
+
+
+def _job_field(slot):
+    return slice(slot * JOB_ID_BYTES, (slot + 1) * JOB_ID_BYTES)
+
+
+def watch(job_ids, seconds: float):
+    """Tell the watchdog this slot should be done with `job_ids` (one id or a list) within `seconds`."""
+    if _slot is None:
+        return
+    if isinstance(job_ids, str):
+        job_ids = [job_ids]
+    field = b""
+    for job_id in job_ids:
+        # Ids that do not fit are recovered by lease expiry instead.
+        entry = (b"," if field else b"") + job_id.encode()
+        if len(field) + len(entry) > JOB_ID_BYTES:
+            break
+        field += entry
+    _jobs[_job_field(_slot)] = field.ljust(JOB_ID_BYTES, b"\0")
+    _deadlines[_slot] = time.time() + seconds + WATCHDOG_GRACE if seconds else 0
+
+
+def unwatch():
+    if _slot is None:
+        return
+    _deadlines[_slot] = 0
+    _jobs[_job_field(_slot)] = b"\0" * JOB_ID_BYTES
+
+
+def set_render_group(pgid: int):
+    """Record the process group of the render this slot is waiting on (0 when none)."""
+    if _slot is not None:
+        _render_groups[_slot] = pgid
+
+
+def _run_slot(loop, slot, deadlines, render_groups, jobs):
+    global _slot, _deadlines, _render_groups, _jobs
+    _slot, _deadlines, _render_groups, _jobs = slot, deadlines, render_groups, jobs
+    # Own process group, so the watchdog can kill the slot with any warm
+    # renderer children it started.
+    os.setpgrp()
+    try:
+        loop(slot)
+    except KeyboardInterrupt:
+        pass
+
+
+def _kill_group(pgid, sig=signal.SIGKILL):
+    try:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def run_slots(loop, slots: int, on_stuck=None):
+    """Call `loop(slot)` in `slots` supervised processes."""
+    slots = max(1, slots)
+    # Slots have their own process groups, so `docker stop` / kill only reach
+    # the supervisor; shut them down from here.
+    signal.signal(signal.SIGTERM, _stop)
+    deadlines = mp.Array(ctypes.c_double, slots, lock=False)
+    render_groups = mp.Array(ctypes.c_int, slots, lock=False)
+    jobs = mp.Array(ctypes.c_char, slots * JOB_ID_BYTES, lock=False)
+    procs = {}
+
+    def spawn(slot):
+        deadlines[slot] = 0
+        render_groups[slot] = 0
+        jobs[_job_field(slot)] = b"\0" * JOB_ID_BYTES
+        # Not daemonic: slots may start their own renderer processes.
+        p = mp.Process(
+            target=_run_slot, args=(loop, slot, deadlines, render_groups, jobs), name=f"slot-{slot}"
+        )
+        p.start()
+        procs[slot] = p
+
+    def release(slot, reason):
+        job_ids = bytes(jobs[_job_field(slot)]).rstrip(b"\0").decode()
+        if job_ids and on_stuck:
+            for job_id in job_ids.split(","):
+                on_stuck(job_id, reason)
+
+    for slot in range(slots):
+        spawn(slot)
+
+    try:
+        while True:
+            now = time.time()
+            for slot, p in list(procs.items()):
+                if not p.is_alive():
+                    print(f"Slot {slot} exited with code {p.exitcode}; restarting")
+                    if render_groups[slot]:
+                        _kill_group(render_groups[slot])
+                    release(slot, "slot_crashed")
+                    spawn(slot)
+                elif deadlines[slot] and now > deadlines[slot]:
+                    print(f"Slot {slot} is past its deadline; killing it")
+                    _kill_group(p.pid)
+                    if render_groups[slot]:
+                        _kill_group(render_groups[slot])
+                    p.join()
+                    release(slot, "watchdog")
+                    spawn(slot)
+            time.sleep(1)
+    finally:
+        for slot, p in procs.items():
+            _kill_group(p.pid, signal.SIGTERM)
+            if render_groups[slot]:
+                _kill_group(render_groups[slot], signal.SIGTERM)
+        for p in procs.values():
+            p.join(5)
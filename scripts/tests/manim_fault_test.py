@@ -0,0 +1,307 @@
+"""
+Fault-injection test for the Manim worker queue.
+
+Runs the mock worker against a scratch job directory with one job that hangs,
+one that crashes its slot and one that raises, and checks that the watchdog
+and retries deal with those while the queue keeps draining; and kills a
+worker mid-render to check that its expired lease is taken back, and sends a
+burst of duplicate jobs to check that they share one render and that the
+render cache counts one hit or miss per job. Also checks
+that render_limits kills renders over the wall-clock and CPU limits, that
+job status files are never read half-written, and that a job whose result
+cannot be written is requeued rather than left holding its lease.
+
+Usage:
+  python3 scripts/tests/manim_fault_test.py
+(or collect it with pytest)
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import tempfile
+import subprocess
+from pathlib import Path
+
+WORKER_DIR = Path(__file__).resolve().parents[1] / "manim_worker"
+sys.path.insert(0, str(WORKER_DIR))
+
+import coalesce  # noqa: E402
+import job_queue  # noqa: E402
+import render_cache  # noqa: E402
+import render_limits  # noqa: E402
+import render_worker  # noqa: E402
+
+
+def write_job(job_dir: Path, job_id: str, **fields):
+    job = {"jobId": job_id, "prompt": job_id, "quality": "low", "status": "queued", **fields}
+    (job_dir / f"{job_id}.json").write_text(json.dumps(job, indent=2))
+    (job_dir / "queue" / "queued" / job_id).touch()
+
+
+def read_status(job_dir: Path, job_id: str):
+    try:
+        return json.loads((job_dir / f"{job_id}.json").read_text())
+    except ValueError:
+        return {}  # caught mid-write
+
+
+def make_job_dir(tmp):
+    job_dir = Path(tmp) / "jobs"
+    for state in ("queued", "processing", "following", "completed", "failed", "dead"):
+        (job_dir / "queue" / state).mkdir(parents=True)
+    return job_dir
+
+
+def start_worker(job_dir: Path, slots=1, **env):
+    env = {
+        **os.environ,
+        "MANIM_JOB_DIR": str(job_dir),
+        "MANIM_OUTPUT_DIR": str(job_dir.parent / "videos"),
+        "MANIM_JOB_TIMEOUT": "1",
+        "MANIM_WATCHDOG_GRACE": "0.5",
+        "MANIM_RETRY_BACKOFF": "0.2",
+        "MOCK_RENDER_SECONDS": "0.1",
+        **env,
+    }
+    return subprocess.Popen(
+        [sys.executable, str(WORKER_DIR / "mock_worker.py"), "--slots", str(slots)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def wait_for(job_dir: Path, job_ids, statuses=("completed", "failed"), timeout=30):
+    deadline = time.time() + timeout
+    while True:
+        jobs = {job_id: read_status(job_dir, job_id) for job_id in job_ids}
+        if all(j.get("status") in statuses for j in jobs.values()) or time.time() > deadline:
+            return jobs
+        time.sleep(0.2)
+
+
+def test_queue_drains_past_faulty_jobs():
+    with tempfile.TemporaryDirectory(prefix="manim-fault-") as tmp:
+        job_dir = make_job_dir(tmp)
+        faults = {"manim-0-hang": "hang", "manim-1-crash": "crash", "manim-2-error": "error"}
+        for job_id, fault in faults.items():
+            write_job(job_dir, job_id, mockFault=fault)
+        healthy = [f"manim-{i}-ok" for i in range(3, 8)]
+        for job_id in healthy:
+            write_job(job_dir, job_id)
+
+        worker = start_worker(job_dir, MANIM_MAX_ATTEMPTS="2")
+        try:
+            jobs = wait_for(job_dir, [*faults, *healthy])
+        finally:
+            worker.terminate()
+            worker.wait(10)
+
+        assert jobs["manim-0-hang"].get("failureReason") == "watchdog", jobs["manim-0-hang"]
+        # A crashed slot's job is retried, then dead-lettered.
+        crashed = jobs["manim-1-crash"]
+        assert crashed.get("failureReason") == "slot_crashed", crashed
+        assert crashed.get("deadLetter") and crashed.get("attempts") == 2, crashed
+        assert (job_dir / "queue" / "dead" / "manim-1-crash").exists()
+        assert jobs["manim-2-error"].get("failureReason") == "worker_error", jobs["manim-2-error"]
+        for job_id in healthy:
+            assert jobs[job_id].get("status") == "completed", jobs[job_id]
+            status = json.loads((job_dir / "status" / f"{job_id}.json").read_text())
+            assert status == {k: jobs[job_id][k] for k in job_queue.STATUS_FIELDS if k in jobs[job_id]}, status
+        assert not os.listdir(job_dir / "queue" / "processing")
+
+
+def test_expired_lease_is_requeued():
+    with tempfile.TemporaryDirectory(prefix="manim-lease-") as tmp:
+        job_dir = make_job_dir(tmp)
+        write_job(job_dir, "manim-0-orphan")
+
+        # A worker that dies mid-render, supervisor and slot alike.
+        lease = dict(MANIM_LEASE_TTL="1.5", MANIM_JOB_TIMEOUT="0")
+        first = start_worker(job_dir, MOCK_RENDER_SECONDS="60", **lease)
+        try:
+            job = wait_for(job_dir, ["manim-0-orphan"], statuses=("processing",))["manim-0-orphan"]
+            slot_pid = int(job["workerId"].rsplit(":", 1)[1])
+        finally:
+            first.kill()
+            first.wait()
+        os.kill(slot_pid, signal.SIGKILL)
+
+        second = start_worker(job_dir, **lease)
+        try:
+            job = wait_for(job_dir, ["manim-0-orphan"])["manim-0-orphan"]
+        finally:
+            second.terminate()
+            second.wait(10)
+
+        assert job.get("status") == "completed", job
+        assert job.get("attempts") == 2 and job.get("lastError"), job
+
+
+def test_duplicate_burst_is_coalesced():
+    with tempfile.TemporaryDirectory(prefix="manim-coalesce-") as tmp:
+        job_dir = make_job_dir(tmp)
+        preset = {"sceneType": "list", "title": "Merge Sort", "params": {"items": ["Split", "Merge"]}}
+        duplicates = [f"manim-{i:02d}-dup" for i in range(30)]
+        for job_id in duplicates:
+            write_job(job_dir, job_id, prompt="Explain merge sort", sceneParams=preset)
+        write_job(job_dir, "manim-99-other", prompt="Explain quicksort")
+
+        worker = start_worker(job_dir, slots=4, MOCK_RENDER_SECONDS="2", MANIM_JOB_TIMEOUT="10")
+        try:
+            jobs = wait_for(job_dir, [*duplicates, "manim-99-other"])
+        finally:
+            worker.terminate()
+            worker.wait(10)
+
+        assert all(j.get("status") == "completed" for j in jobs.values()), jobs
+        urls = {jobs[job_id]["resultUrl"] for job_id in duplicates}
+        assert len(urls) == 1, urls
+        assert jobs["manim-99-other"]["resultUrl"] not in urls
+        assert sum(1 for job_id in duplicates if jobs[job_id].get("coalescedWith")) == 29
+        stats = json.loads((job_dir / "cache" / "index.json").read_text())["stats"]
+        assert stats["coalesced"] == 29 and stats["coalescedGroups"] == 1, stats
+        assert not os.listdir(job_dir / "queue" / "following")
+
+
+def test_cache_counts_each_job_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        job_queue.JOB_DIR = Path(tmp)
+        job_queue.QUEUE_DIR = job_queue.JOB_DIR / "queue"
+        job_queue.ensure_dirs()
+        job_queue._last_adopt = 0.0
+        job_queue._schedule.clear()
+        coalesce.INFLIGHT_DIR = job_queue.QUEUE_DIR / "inflight"
+        render_cache.CACHE_DIR = job_queue.JOB_DIR / "cache"
+        render_cache.INDEX_PATH = render_cache.CACHE_DIR / "index.json"
+        render_cache.LOCK_PATH = render_cache.CACHE_DIR / ".lock"
+        for job_id in ("manim-1-first", "manim-2-follower", "manim-3-later"):
+            write_job(Path(tmp), job_id, prompt="Explain merge sort")
+
+        first = job_queue.pick_job()
+        spec, key = render_worker.prepare_job(*first)
+        assert render_worker.prepare_job(*job_queue.pick_job()) is None  # coalesced with the first
+        # The first job is retried: its own group again, but not a second miss.
+        assert render_worker.prepare_job(*first) == (spec, key)
+        video = Path(tmp, "first.mp4")
+        video.write_bytes(b"mp4")
+        render_cache.store(key, video, str(video))
+        coalesce.release(first[1], key)
+        assert render_worker.prepare_job(*job_queue.pick_job()) is None  # a cache hit
+        stats = render_cache.stats()
+        assert (stats["hits"], stats["misses"], stats["coalesced"]) == (1, 1, 1), stats
+        assert (stats["previewHits"], stats["previewMisses"]) == (0, 0), stats
+
+
+def test_status_reads_are_never_torn():
+    with tempfile.TemporaryDirectory() as tmp:
+        p = Path(tmp) / "manim-1.json"
+        job = {"jobId": "manim-1", "status": "processing", "sceneParams": {"params": {"content": "x" * 100000}}}
+        job_queue.write_job(p, job)
+        stop = time.time() + 1
+        pid = os.fork()
+        if pid == 0:
+            while time.time() < stop:
+                job_queue.write_job(p, job)
+            os._exit(0)
+        try:
+            reads = 0
+            while time.time() < stop:
+                json.loads(p.read_text())
+                json.loads(job_queue.status_path(p).read_text())
+                reads += 1
+        finally:
+            os.waitpid(pid, 0)
+        assert reads > 0
+        assert "sceneParams" not in json.loads(job_queue.status_path(p).read_text())
+
+
+def test_unrecorded_result_is_requeued():
+    with tempfile.TemporaryDirectory() as tmp:
+        job_queue.JOB_DIR = Path(tmp)
+        job_queue.QUEUE_DIR = job_queue.JOB_DIR / "queue"
+        job_queue.ensure_dirs()
+        job_queue._last_adopt = 0.0
+        job_queue._schedule.clear()
+        write_job(Path(tmp), "manim-1-full")
+        job_file, job = job_queue.pick_job()
+        assert job["jobId"] in job_queue._leases
+
+        def full_disk(p, job):
+            raise OSError(28, "No space left on device")
+
+        # The upload callback cannot write the completed job.
+        saved = render_worker.write_job
+        render_worker.write_job = full_disk
+        try:
+            render_worker.result_published(job_file, job, "/manim_videos/manim-1-full.mp4", None)
+        finally:
+            render_worker.write_job = saved
+        assert job["jobId"] not in job_queue._leases
+        assert job_queue.marker_path("queued", job["jobId"]).exists()
+        requeued = job_queue.read_job(job_file)
+        assert requeued["status"] == "queued" and "No space left" in requeued["lastError"], requeued
+
+
+def test_render_timeout_kills_process_group():
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.time()
+        try:
+            # The background sleep stands in for an ffmpeg/latex child.
+            render_limits.run_command(["sh", "-c", "sleep 30 & sleep 30"], tmp, timeout=0.5)
+        except render_limits.RenderTimeout as e:
+            assert e.reason == "timeout"
+        else:
+            raise AssertionError("expected RenderTimeout")
+        assert time.time() - start < 5
+        leftover = subprocess.run(["pgrep", "-f", "sleep 30"], capture_output=True, text=True)
+        assert not leftover.stdout.strip(), leftover.stdout
+
+
+def test_background_render_is_niced_and_preempted():
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.time()
+        try:
+            # Stops once "a job is queued", half a second after the command started.
+            render_limits.run_command(
+                ["sh", "-c", "nice > niceness; ulimit -v > memory; sleep 30 & sleep 30"], tmp,
+                nice=10, interrupt=lambda: (Path(tmp) / "memory").exists() and time.time() - start > 0.5,
+            )
+        except render_limits.RenderPreempted as e:
+            assert e.reason == "preempted"
+        else:
+            raise AssertionError("expected RenderPreempted")
+        assert time.time() - start < 5
+        assert int((Path(tmp) / "niceness").read_text()) >= os.nice(0) + 10
+        # The limits are set in the launched process itself (see render_limits.launcher).
+        assert int((Path(tmp) / "memory").read_text()) * 1024 == render_limits.MEMORY_LIMIT
+        leftover = subprocess.run(["pgrep", "-f", "sleep 30"], capture_output=True, text=True)
+        assert not leftover.stdout.strip(), leftover.stdout
+
+
+def test_cpu_limit():
+    cpu_limit = render_limits.CPU_LIMIT
+    render_limits.CPU_LIMIT = 1
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            render_limits.run_command([sys.executable, "-c", "while True: pass"], tmp, timeout=30)
+    except render_limits.RenderError as e:
+        assert e.reason == "cpu_limit", e.reason
+    else:
+        raise AssertionError("expected RenderError")
+    finally:
+        render_limits.CPU_LIMIT = cpu_limit
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            print(f"{name} ...", flush=True)
+            fn()
+    print("All fault-injection tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Tests for the worker's disk lifecycle: job archiving and video retention.
+
+Runs lifecycle.py in-process against a scratch job and output directory and
+checks that only old finished jobs are archived (once, with their files
+removed), and that retention deletes expired and least recently used videos
+but keeps pinned and recent ones.
+
+Usage:
+  python3 scripts/tests/manim_lifecycle_test.py
+(or collect it with pytest)
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+from pathlib import Path
+
+WORKER_DIR = Path(__file__).resolve().parents[1] / "manim_worker"
+sys.path.insert(0, str(WORKER_DIR))
+
+import job_queue  # noqa: E402
+import lifecycle  # noqa: E402
+import render_cache  # noqa: E402
+
+DAY = 24 * 3600
+
+
+def use_dir(tmp):
+    job_queue.JOB_DIR = Path(tmp) / "jobs"
+    job_queue.QUEUE_DIR = job_queue.JOB_DIR / "queue"
+    job_queue.ensure_dirs()
+    lifecycle.JOB_DIR = job_queue.JOB_DIR
+    lifecycle.QUEUE_DIR = job_queue.QUEUE_DIR
+    lifecycle.ARCHIVE_DIR = job_queue.JOB_DIR / "archive"
+    lifecycle.OUTPUT_DIR = Path(tmp) / "videos"
+    lifecycle.OUTPUT_DIR.mkdir()
+    render_cache.CACHE_DIR = job_queue.JOB_DIR / "cache"
+    render_cache.INDEX_PATH = render_cache.CACHE_DIR / "index.json"
+    render_cache.LOCK_PATH = render_cache.CACHE_DIR / ".lock"
+
+
+def backdate(path, seconds):
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+def finished_job(job_id, state="completed", age=0.0):
+    job = {"jobId": job_id, "status": "completed" if state == "completed" else "failed"}
+    job_queue.write_job(job_queue.job_path(job_id), job)
+    job_queue.job_path(job_id).with_suffix("").mkdir()
+    marker = job_queue.marker_path(state, job_id)
+    marker.touch()
+    backdate(marker, age)
+
+
+def video(name, size, age=0.0):
+    path = lifecycle.OUTPUT_DIR / name
+    path.write_bytes(b"x" * size)
+    backdate(path, age)
+    return path
+
+
+def archived_ids():
+    return [json.loads(line)["jobId"] for f in lifecycle.ARCHIVE_DIR.glob("*.jsonl") for line in f.open()]
+
+
+def test_archives_only_old_finished_jobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        use_dir(tmp)
+        finished_job("manim-old", age=8 * DAY)
+        finished_job("manim-old-dead", state="dead", age=8 * DAY)
+        finished_job("manim-recent", age=DAY)
+        job_queue.write_job(job_queue.job_path("manim-queued"), {"jobId": "manim-queued", "status": "queued"})
+        job_queue.marker_path("queued", "manim-queued").touch()
+        backdate(job_queue.marker_path("queued", "manim-queued"), 30 * DAY)
+
+        assert lifecycle.archive_finished() == 2
+        assert sorted(archived_ids()) == ["manim-old", "manim-old-dead"]
+        for job_id in ("manim-old", "manim-old-dead"):
+            p = job_queue.job_path(job_id)
+            assert not p.exists() and not job_queue.status_path(p).exists() and not p.with_suffix("").exists()
+        assert not job_queue.marker_path("completed", "manim-old").exists()
+        assert job_queue.job_path("manim-recent").exists()
+        assert job_queue.job_path("manim-queued").exists()
+        # A second sweep finds nothing more to archive.
+        assert lifecycle.archive_finished() == 0
+        assert len(archived_ids()) == 2
+
+
+def test_resumes_an_abandoned_archive():
+    with tempfile.TemporaryDirectory() as tmp:
+        use_dir(tmp)
+        finished_job("manim-half", age=8 * DAY)
+        claimed = job_queue.QUEUE_DIR / "completed" / ".archiving-manim-half"
+        os.rename(job_queue.marker_path("completed", "manim-half"), claimed)
+        backdate(claimed, 2 * job_queue.LEASE_TTL)
+        assert lifecycle.archive_finished() == 1
+        assert archived_ids() == ["manim-half"]
+        assert not claimed.exists()
+
+
+def test_retention_by_age_and_size():
+    with tempfile.TemporaryDirectory() as tmp:
+        use_dir(tmp)
+        saved = lifecycle.VIDEO_MAX_AGE, lifecycle.VIDEO_MAX_BYTES
+        lifecycle.VIDEO_MAX_AGE, lifecycle.VIDEO_MAX_BYTES = 30 * DAY, 250
+        try:
+            expired = video("manim-expired.mp4", 10, age=40 * DAY)
+            pinned = video("manim-pinned.mp4", 100, age=40 * DAY)
+            render_cache.store("pinned", pinned, "/manim_videos/manim-pinned.mp4", pinned=True)
+            oldest = video("manim-oldest.mp4", 100, age=5 * DAY)
+            older = video("manim-older.mp4", 100, age=4 * DAY)
+            hls = lifecycle.OUTPUT_DIR / "manim-older-hls"
+            hls.mkdir()
+            (hls / "seg00000.ts").write_bytes(b"x" * 50)
+            backdate(hls, 3 * DAY)
+            fresh = video("manim-fresh.mp4", 100)
+            render_cache.store("oldest", oldest, "/manim_videos/manim-oldest.mp4")
+            with render_cache._locked_index() as index:
+                index["entries"]["oldest"]["lastUsed"] = time.time() - 5 * DAY
+
+            # 460 bytes: expired goes by age, then LRU until at most 250 remain.
+            assert lifecycle.enforce_retention() == 3
+            assert not expired.exists() and not oldest.exists() and not older.exists()
+            assert pinned.exists() and hls.exists() and fresh.exists()
+            assert render_cache.lookup("oldest") is None
+            assert render_cache.lookup("pinned") is not None
+        finally:
+            lifecycle.VIDEO_MAX_AGE, lifecycle.VIDEO_MAX_BYTES = saved
+
+
+def test_usage_counts_hard_links_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        use_dir(tmp)
+        shared = job_queue.JOB_DIR / "cache" / "media" / "Tex"
+        private = job_queue.JOB_DIR / "cache" / "media-slots" / "host-slot0" / "Tex"
+        shared.mkdir(parents=True)
+        private.mkdir(parents=True)
+        (shared / "a.svg").write_bytes(b"x" * 40)
+        os.link(shared / "a.svg", private / "a.svg")
+        video("manim-1.mp4", 30)
+        video("manim-1-preview.mp4", 20)
+        report = lifecycle.usage()
+        assert report["mediaCache"] == {"files": 1, "bytes": 40}
+        assert report["videos"]["bytes"] == 30 and report["previews"]["bytes"] == 20
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            print(f"{name} ...", flush=True)
+            fn()
+    print("All lifecycle tests passed")
+
+
+if __name__ == "__main__":
+    main()
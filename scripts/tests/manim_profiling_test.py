@@ -0,0 +1,158 @@
+"""
+Tests for the profiling hook of slow renders.
+
+Runs profiling.py in-process and as the render wrapper against scratch
+directories, and checks that the sampler and cProfile captures name the hot
+function and the timed sub-steps, that only renders over their sceneType's
+threshold are kept next to the job, and that profile_report.py aggregates
+them per sceneType.
+
+Usage:
+  python3 scripts/tests/manim_profiling_test.py
+(or collect it with pytest)
+"""
+
+import sys
+import json
+import time
+import types
+import tempfile
+import subprocess
+from pathlib import Path
+
+WORKER_DIR = Path(__file__).resolve().parents[1] / "manim_worker"
+sys.path.insert(0, str(WORKER_DIR))
+
+import job_queue  # noqa: E402
+import profiling  # noqa: E402
+import profile_report  # noqa: E402
+import progress  # noqa: E402
+
+
+def use_dir(tmp):
+    job_queue.JOB_DIR = Path(tmp) / "jobs"
+    job_queue.JOB_DIR.mkdir()
+    profiling.JOB_DIR = profile_report.JOB_DIR = job_queue.JOB_DIR
+    progress.HISTORY_PATH = job_queue.JOB_DIR / "cache" / "timings.json"
+    progress._history = None
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def fake_tex_module():
+    """A stand-in for manim's tex module, so the sub-timing wrappers have something to wrap."""
+    module = types.ModuleType("fake_tex")
+    module.compile_tex = lambda: spin(0.05)
+    sys.modules["fake_tex"] = module
+    profiling.SUBTIMINGS = {"tex": ("fake_tex", ("compile_tex", "missing"))}
+    profiling._instrumented = False
+    return module
+
+
+def capture_of(mode, tmp):
+    tex = fake_tex_module()
+    out = Path(tmp) / f"{mode}.json"
+    capture = profiling.Capture(mode)
+    capture.start(out)
+    spin(0.3)
+    tex.compile_tex()
+    tex.compile_tex()
+    capture.stop()
+    return json.loads(out.read_text())
+
+
+def test_sampler_capture():
+    with tempfile.TemporaryDirectory() as tmp:
+        data = capture_of("sample", tmp)
+        assert data["profiler"] == "sample" and data["samples"] > 10
+        hottest = max(data["functions"], key=lambda f: f["self"])
+        assert hottest["func"].endswith("(spin)")
+        assert data["subTimings"]["tex"]["calls"] == 2 and data["subTimings"]["tex"]["seconds"] >= 0.1
+
+
+def test_cprofile_capture():
+    with tempfile.TemporaryDirectory() as tmp:
+        data = capture_of("cprofile", tmp)
+        spin_entry = next(f for f in data["functions"] if f["func"].endswith("(spin)"))
+        assert spin_entry["calls"] == 3 and spin_entry["total"] >= 0.3
+        assert data["subTimings"]["tex"]["calls"] == 2
+
+
+def test_wrapper_runs_the_entry_point():
+    with tempfile.TemporaryDirectory() as tmp:
+        script = Path(tmp) / "fake-manim"
+        script.write_text(
+            "#!/usr/bin/env python3\nimport sys, time\n"
+            "def render():\n    end = time.perf_counter() + 0.3\n    while time.perf_counter() < end:\n        pass\n"
+            "render()\nsys.exit(3)\n"
+        )
+        script.chmod(0o755)
+        out = Path(tmp) / "profile.json"
+        cmd = [sys.executable, str(WORKER_DIR / "profiling.py"), "--out", str(out), "--", str(script)]
+        # The render's exit status comes through; its capture is written on the way out.
+        assert subprocess.run(cmd).returncode == 3
+        functions = {f["func"] for f in json.loads(out.read_text())["functions"]}
+        assert "fake-manim:3(render)" in functions
+        assert not any("runpy" in f or "profiling.py" in f for f in functions)
+
+        # Not a Python script: it still runs, without a capture.
+        shell = Path(tmp) / "fake-shell"
+        shell.write_text("#!/bin/sh\nexit 4\n")
+        shell.chmod(0o755)
+        out.unlink()
+        cmd[-1] = str(shell)
+        assert subprocess.run(cmd).returncode == 4 and not out.exists()
+
+
+def test_keeps_slow_renders_and_reports_them():
+    with tempfile.TemporaryDirectory() as tmp:
+        use_dir(tmp)
+        saved = profiling.THRESHOLDS
+        profiling.THRESHOLDS = {"dfa": 1.0}
+        try:
+            capture = Path(tmp) / "capture.json"
+            capture.write_text(json.dumps({
+                "profiler": "sample", "seconds": 2.0, "samples": 200,
+                "functions": [{"func": "tex_file_writing.py:181(compile_tex)", "self": 1.5, "total": 1.8}],
+                "subTimings": {"tex": {"seconds": 1.8, "calls": 4}},
+            }))
+            job = {"jobId": "manim-1", "sceneParams": {"sceneType": "dfa"}, "timings": {}}
+            # Thresholds per sceneType: fast renders leave nothing behind.
+            profiling.keep(job, "render", "low", capture, 0.5, profiling.threshold("dfa", "low", 10))
+            assert "profile" not in job and not profiling.profile_path("manim-1").exists()
+            profiling.keep(job, "render", "low", capture, 2.0, profiling.threshold("dfa", "low", 10))
+            assert job["profile"] == "manim-1.profile"
+            job["status"] = "completed"
+            job["timings"] = {"render": {"seconds": 2.0}, "upload": {"seconds": 0.4}}
+            profiling.finish(job)
+            saved_profile = json.loads(profiling.profile_path("manim-1").read_text())
+            assert saved_profile["status"] == "completed" and saved_profile["timings"]["upload"]["seconds"] == 0.4
+
+            # Without a configured threshold: a multiple of the usual time, once there is one.
+            assert profiling.threshold("list", "low", 10) is None
+            progress.record("list", "low", 5.0, 10)
+            assert abs(profiling.threshold("list", "low", 10) - profiling.FACTOR * 5.0) < 1e-6
+
+            report = profile_report.aggregate(profile_report.load_captures())
+            dfa = report["dfa"]
+            assert dfa["jobs"] == 1 and dfa["renders"] == 1 and dfa["uploadSeconds"] == 0.4
+            assert dfa["subTimings"] == {"tex": 1.8}
+            assert profile_report.hot_spots(dfa, 5)[0]["func"] == "tex_file_writing.py:181(compile_tex)"
+        finally:
+            profiling.THRESHOLDS = saved
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            print(f"{name} ...", flush=True)
+            fn()
+    print("All profiling tests passed")
+
+
+if __name__ == "__main__":
+    main()
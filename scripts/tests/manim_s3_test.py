@@ -0,0 +1,184 @@
+"""
+Tests for S3 uploads against a local S3 stand-in.
+
+Starts a moto server on a free port, points AWS_S3_ENDPOINT_URL at it and
+checks that Uploader.submit uploads in the background and reports the URL
+(or the error) to its callback, that large files go up as multipart uploads
+with the worker's TransferConfig, and which public URL a video gets for each
+endpoint setting.
+
+Needs boto3 and moto (`pip install boto3 "moto[server]"`); without them the
+tests are skipped.
+
+Usage:
+  python3 scripts/tests/manim_s3_test.py
+(or collect it with pytest)
+"""
+
+import os
+import sys
+import socket
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from functools import partial
+
+WORKER_DIR = Path(__file__).resolve().parents[1] / "manim_worker"
+sys.path.insert(0, str(WORKER_DIR))
+
+import s3_upload  # noqa: E402
+
+try:
+    import boto3
+    from moto.server import ThreadedMotoServer
+except ImportError:
+    boto3 = ThreadedMotoServer = None
+
+BUCKET = "manim-test"
+ENV = ("AWS_S3_BUCKET", "AWS_BUCKET", "AWS_S3_ENDPOINT_URL", "AWS_S3_PUBLIC_URL",
+       "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_REGION")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalS3:
+    """A moto server with the worker's environment pointed at it."""
+
+    def __enter__(self):
+        self.saved = {k: os.environ.get(k) for k in ENV}
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)  # moto's request log
+        port = free_port()
+        self.server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+        self.server.start()
+        self.endpoint = f"http://127.0.0.1:{port}"
+        os.environ.pop("AWS_S3_PUBLIC_URL", None)
+        os.environ.update({
+            "AWS_S3_BUCKET": BUCKET, "AWS_S3_ENDPOINT_URL": self.endpoint, "AWS_REGION": "us-east-1",
+            "AWS_ACCESS_KEY_ID": "test", "AWS_SECRET_ACCESS_KEY": "test",
+        })
+        s3_upload._client = None  # the next upload creates a client for this endpoint
+        self.client = boto3.client("s3", endpoint_url=self.endpoint, region_name="us-east-1",
+                                   aws_access_key_id="test", aws_secret_access_key="test")
+        self.client.create_bucket(Bucket=BUCKET)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.stop()
+        s3_upload._client = None
+        for k, v in self.saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def skipped():
+    if boto3 is None:
+        print("  skipped: boto3 and moto are not installed")
+        return True
+    return False
+
+
+def submit_and_wait(uploader, path, **kwargs):
+    done = threading.Event()
+    result = {}
+
+    def callback(url, error):
+        result.update(url=url, error=error, thread=threading.current_thread().name)
+        done.set()
+
+    uploader.submit(path, callback, **kwargs)
+    assert done.wait(30), "upload callback never fired"
+    return result
+
+
+def test_uploader_reports_to_callback():
+    if skipped():
+        return
+    with LocalS3() as s3, tempfile.TemporaryDirectory() as tmp:
+        video = Path(tmp) / "manim-1.mp4"
+        video.write_bytes(b"fake mp4")
+        uploader = s3_upload.Uploader(workers=1)
+        try:
+            result = submit_and_wait(uploader, video)
+            assert result["error"] is None and result["thread"].startswith("upload")
+            assert result["url"] == f"{s3.endpoint}/{BUCKET}/manim_videos/manim-1.mp4"
+            obj = s3.client.get_object(Bucket=BUCKET, Key="manim_videos/manim-1.mp4")
+            assert obj["Body"].read() == b"fake mp4" and obj["ContentType"] == "video/mp4"
+            grants = s3.client.get_object_acl(Bucket=BUCKET, Key="manim_videos/manim-1.mp4")["Grants"]
+            assert any(g["Permission"] == "READ" and g["Grantee"].get("URI", "").endswith("AllUsers") for g in grants)
+
+            # Other files (HLS segments, playlists) go through `upload`.
+            playlist = Path(tmp) / "index.m3u8"
+            playlist.write_text("#EXTM3U\n")
+            key = "manim_videos/manim-1-hls/index.m3u8"
+            result = submit_and_wait(uploader, playlist, upload=partial(
+                s3_upload.upload_file, key=key, content_type="application/vnd.apple.mpegurl", cache_control="no-cache",
+            ))
+            assert result["url"] == f"{s3.endpoint}/{BUCKET}/{key}"
+            head = s3.client.head_object(Bucket=BUCKET, Key=key)
+            assert head["CacheControl"] == "no-cache" and head["ContentType"] == "application/vnd.apple.mpegurl"
+
+            # A failed upload reaches the callback as an error.
+            result = submit_and_wait(uploader, Path(tmp) / "missing.mp4")
+            assert result["url"] is None and result["error"] is not None
+        finally:
+            uploader.close()
+
+
+def test_large_file_is_a_multipart_upload():
+    if skipped():
+        return
+    with LocalS3() as s3, tempfile.TemporaryDirectory() as tmp:
+        video = Path(tmp) / "manim-big.mp4"
+        size = 20 * s3_upload.MB
+        video.write_bytes(os.urandom(size))
+        uploader = s3_upload.Uploader(workers=1)
+        try:
+            assert submit_and_wait(uploader, video)["error"] is None
+        finally:
+            uploader.close()
+        head = s3.client.head_object(Bucket=BUCKET, Key="manim_videos/manim-big.mp4")
+        assert head["ContentLength"] == size
+        # A multipart ETag ends in the part count: 20 MiB in 8 MiB parts.
+        assert head["ETag"].strip('"').endswith("-3"), head["ETag"]
+        config = s3_upload._transfer_config
+        assert config.multipart_threshold == 8 * s3_upload.MB and config.max_concurrency == s3_upload.PART_CONCURRENCY
+
+
+def test_public_url():
+    saved = {k: os.environ.get(k) for k in ENV}
+    try:
+        for k in ENV:
+            os.environ.pop(k, None)
+        os.environ["AWS_S3_BUCKET"] = BUCKET
+        assert s3_upload.public_url("manim_videos/a.mp4") == f"https://{BUCKET}.s3.amazonaws.com/manim_videos/a.mp4"
+        # A custom endpoint (MinIO, moto) is addressed path-style.
+        os.environ["AWS_S3_ENDPOINT_URL"] = "http://minio:9000/"
+        assert s3_upload.public_url("manim_videos/a.mp4") == f"http://minio:9000/{BUCKET}/manim_videos/a.mp4"
+        # AWS_S3_PUBLIC_URL (a CDN) wins over both.
+        os.environ["AWS_S3_PUBLIC_URL"] = "https://cdn.example.com/"
+        assert s3_upload.public_url("manim_videos/a.mp4") == "https://cdn.example.com/manim_videos/a.mp4"
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            print(f"{name} ...", flush=True)
+            fn()
+    print("All S3 upload tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Tests for the scene builders and the CLI's scene file.
+
+Loads scene_runner.py against a stand-in manim module that records what the
+scenes draw, and checks that it defines the scene classes the worker names,
+that job strings (even ones that look like Python) only reach Manim as
+Text/MathTex arguments, that count_animations() matches the play/wait calls
+a render makes, that the render cache key follows the scene code, and that
+curves.sample() does not alias sin and cos on a wide xRange.
+
+Usage:
+  python3 scripts/tests/manim_scenes_test.py
+(or collect it with pytest)
+"""
+
+import os
+import sys
+import json
+import runpy
+import types
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+WORKER_DIR = Path(__file__).resolve().parents[1] / "manim_worker"
+sys.path.insert(0, str(WORKER_DIR))
+
+import bench_curves  # noqa: E402
+import curves  # noqa: E402
+import render_cache  # noqa: E402
+import render_worker  # noqa: E402
+import scenes  # noqa: E402
+
+EVIL = "x=__import__('os').system('exit 3');y"
+DFA = {"sceneType": "dfa", "params": {
+    "nodes": [{"id": EVIL, "label": EVIL, "start": True}, {"id": "q1", "accept": True}],
+    "edges": [{"from": EVIL, "to": "q1", "label": "a"}, {"from": "q1", "to": "missing"}],
+    "explanation": "Accepts a",
+}}
+
+
+class Drawn(scenes._Stub):
+    """A mobject or animation; remembers the strings it was made from."""
+
+    def __init__(self, log, name):
+        self.log, self.name = log, name
+
+    def __getattr__(self, name):
+        return Drawn(self.log, name)
+
+    def __call__(self, *args, **kwargs):
+        if self.name in ("Text", "MathTex"):
+            self.log.append((self.name, args[0]))
+        return self
+
+
+def fake_manim():
+    """A manim module whose Scene counts play/wait calls and whose mobjects record their text."""
+    log = []
+
+    class Scene:
+        def __init__(self):
+            self.calls = 0
+
+        def play(self, *animations):
+            self.calls += 1
+
+        def wait(self, seconds=1):
+            self.calls += 1
+
+    module = types.ModuleType("manim")
+    module.Scene = Scene
+    module.__getattr__ = lambda name: Drawn(log, name)
+    return module, log
+
+
+def load_runner(specs):
+    """Run scene_runner.py in a scratch workdir holding `specs`, as the manim CLI would."""
+    manim, log = fake_manim()
+    saved, cwd = sys.modules.get("manim"), os.getcwd()
+    sys.modules["manim"] = manim
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            Path(tmp, scenes.SPEC_FILE).write_text(json.dumps(specs))
+            os.chdir(tmp)
+            namespace = runpy.run_path(str(WORKER_DIR / "scene_runner.py"))
+    finally:
+        os.chdir(cwd)
+        if saved is None:
+            sys.modules.pop("manim", None)
+        else:
+            sys.modules["manim"] = saved
+    return namespace, log
+
+
+def render(scene_class):
+    scene = scene_class()
+    scene.construct()
+    return scene.calls
+
+
+def test_runner_defines_the_named_scenes():
+    single = [{**render_worker.scene_spec("DFA", DFA), "name": "GeneratedScene"}]
+    namespace, log = load_runner(single)
+    assert render(namespace["GeneratedScene"]) == scenes.count_animations("DFA", DFA)
+    # The id is only a dict key, and the label reaches Manim as a MathTex string.
+    assert ("MathTex", EVIL) in log and ("Text", "DFA") in log
+
+    name = render_worker.batch_scene_name("manim-1-2")
+    text = render_worker.scene_spec("Notes", {"sceneType": "text", "params": {"content": "one\ntwo"}})
+    namespace, _ = load_runner(single + [{**text, "name": name}])
+    assert name == "Scene_manim_1_2" and render(namespace[name]) == 4
+
+
+def test_count_animations():
+    # title, two nodes each with a start arrow or accept ring, one valid edge with its label, explanation, wait
+    assert scenes.count_animations("DFA", DFA) == 1 + 4 + 2 + 1 + 1
+    assert scenes.count_animations("DFA", DFA, grouped=True) == 1 + 1 + 1 + 1 + 1
+    assert scenes.count_animations("DFA", {"sceneType": "dfa", "params": {}}) == 3  # "No DFA nodes provided."
+    assert scenes.count_animations("Hi", {"sceneType": "unknown"}) == 1 + 3 + 4 + 1
+    assert scenes.count_animations("Graph", {"sceneType": "graph", "params": {"functions": [{"expr": "x**2"}]}}) == 5
+
+
+def test_cache_key_follows_the_scene_code():
+    spec = render_worker.scene_spec("DFA", DFA)
+    key = render_cache.cache_key(spec, "low")
+    assert key == render_cache.cache_key(json.loads(json.dumps(spec)), "low")
+    assert key != render_cache.cache_key(spec, "medium")
+    assert key != render_cache.cache_key(render_worker.scene_spec("DFA", DFA, grouped=True), "low")
+    saved = render_cache._scenes_version
+    render_cache._scenes_version = "edited"
+    try:
+        assert key != render_cache.cache_key(spec, "low")
+    finally:
+        render_cache._scenes_version = saved
+
+
+def test_wide_oscillations_are_not_aliased():
+    # A fixed 501-point grid samples sin/cos on [-1000, 1000] every 4 units and
+    # drew a curve 0.035 scene units off; the grid now scales with the xRange.
+    for func in (np.sin, np.cos):
+        for x_range in ((-1000, 1000), (-1500, 1500)):
+            pieces = curves.sample(func, x_range, (-2, 2))
+            points = [np.array(p).T for p in pieces]
+            assert sum(len(p) for p in pieces) <= curves.MAX_POINTS + 2 * len(pieces)
+            assert bench_curves.max_error(points, func, x_range, (-2, 2)) <= curves.TOLERANCE * 1.01
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            print(f"{name} ...", flush=True)
+            fn()
+    print("All scene tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Ordering and starvation tests for the worker queue's scheduler.
+
+Drives job_queue.pick_job() in-process against a scratch job directory and
+checks FIFO order within a priority class, priority classes, round-robin
+between users, that aging lets old low-priority jobs through a stream of
+newer work, that workers racing for one queue claim each job once, and
+that job files written without a marker are adopted from watcher events
+rather than periodic rescans.
+
+Usage:
+  python3 scripts/tests/manim_scheduler_test.py
+(or collect it with pytest)
+"""
+
+import sys
+import json
+import time
+import tempfile
+import multiprocessing as mp
+from pathlib import Path
+from datetime import datetime, timezone
+
+WORKER_DIR = Path(__file__).resolve().parents[1] / "manim_worker"
+sys.path.insert(0, str(WORKER_DIR))
+
+import job_queue  # noqa: E402
+
+
+def iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def use_dir(tmp):
+    job_queue.JOB_DIR = Path(tmp) / "jobs"
+    job_queue.QUEUE_DIR = job_queue.JOB_DIR / "queue"
+    job_queue.ensure_dirs()
+    job_queue._last_adopt = 0.0
+    job_queue._schedule.clear()
+
+
+def submit(job_id, user="u", priority="normal", age=0.0, marker=True):
+    """Queue a job the way the generate route does; `age` backdates createdAt."""
+    job = {
+        "jobId": job_id,
+        "prompt": job_id,
+        "status": "queued",
+        "createdAt": iso(time.time() - age),
+        "userKey": user,
+        "priority": priority,
+    }
+    job_queue.write_job(job_queue.job_path(job_id), job)
+    job_queue.marker_path("queued", job_id).write_text(job_queue.schedule_info(job) if marker else "")
+
+
+def take(finish=True):
+    """Claim the next job; finish it at once unless it should stay in flight."""
+    _, job = job_queue.pick_job()
+    if job is None:
+        return None
+    if finish:
+        job["status"] = "completed"
+        job_queue.finish(job)
+    return job["jobId"]
+
+
+def test_fifo_within_class():
+    with tempfile.TemporaryDirectory() as tmp:
+        use_dir(tmp)
+        for i, age in enumerate([5, 30, 1, 20]):
+            submit(f"manim-{i}", age=age)
+        assert [take() for _ in range(4)] == ["manim-1", "manim-3", "manim-0", "manim-2"]
+
+
+def test_priority_classes():
+    with tempfile.TemporaryDirectory() as tmp:
+        use_dir(tmp)
+        submit("manim-low", priority="low", age=30)
+        submit("manim-normal", priority="normal", age=20)
+        submit("manim-high", priority="high", age=1)
+        submit("manim-unset", priority=None, age=10)
+        assert [take() for _ in range(4)] == ["manim-high", "manim-normal", "manim-unset", "manim-low"]
+
+
+def test_round_robin_between_users():
+    with tempfile.TemporaryDirectory() as tmp:
+        use_dir(tmp)
+        # One user floods the queue before two others submit a job each.
+        for i in range(10):
+            submit(f"manim-a{i}", user="flood", age=100 - i)
+        submit("manim-b0", user="b", age=50)
+        submit("manim-c0", user="c", age=40)
+        order = [take() for _ in range(5)]
+        assert order[:3] == ["manim-a0", "manim-b0", "manim-c0"], order
+        assert order[3:] == ["manim-a1", "manim-a2"], order
+
+
+def test_in_flight_jobs_count_against_their_user():
+    with tempfile.TemporaryDirectory() as tmp:
+        use_dir(tmp)
+        for i in range(3):
+            submit(f"manim-a{i}", user="flood", age=100 - i)
+        submit("manim-b0", user="b", age=1)
+        # A worker is still rendering the flood's first job.
+        assert take(finish=False) == "manim-a0"
+        assert take(finish=False) == "manim-b0"
+
+
+def test_aging_prevents_starvation():
+    aging = job_queue.PRIORITY_AGING
+    job_queue.PRIORITY_AGING = 10
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            use_dir(tmp)
+            submit("manim-old-low", user="x", priority="low", age=25)
+            for i in range(5):
+                submit(f"manim-new-high{i}", user=f"t{i}", priority="high", age=i)
+            # 25 s at 10 s per class: low has aged into the high class and is oldest.
+            assert take() == "manim-old-low"
+    finally:
+        job_queue.PRIORITY_AGING = aging
+
+
+def test_empty_marker_falls_back_to_job_json():
+    with tempfile.TemporaryDirectory() as tmp:
+        use_dir(tmp)
+        submit("manim-normal", age=20)
+        submit("manim-high", priority="high", age=1, marker=False)
+        assert json.loads(job_queue.job_path("manim-high").read_text())["priority"] == "high"
+        assert take() == "manim-high"
+
+
+def write_unmarked(job_id):
+    """A job file with no queue marker at all, as an older API build writes it."""
+    job_queue.write_job(job_queue.job_path(job_id), {"jobId": job_id, "prompt": job_id, "status": "queued"})
+
+
+class Overflowed:
+    """A watcher whose kernel event queue overflowed."""
+
+    def wait(self):
+        return None
+
+
+def test_unmarked_jobs_are_adopted_from_events():
+    with tempfile.TemporaryDirectory() as tmp:
+        use_dir(tmp)
+        write_unmarked("manim-early")
+        w = job_queue.watcher()
+        interval, job_queue.ADOPT_INTERVAL = job_queue.ADOPT_INTERVAL, 0
+        try:
+            # The startup scan finds the job written before the watch began.
+            assert take() == "manim-early"
+            if w.mode != "inotify":
+                return  # polling rescans every ADOPT_INTERVAL instead
+            write_unmarked("manim-late")
+            assert take() is None  # no rescan of the job directory, however short the interval
+            job_queue.wait_for_work(w)
+            assert take() == "manim-late"
+            write_unmarked("manim-lost")
+            job_queue.wait_for_work(Overflowed())
+            assert take() == "manim-lost"
+            # A submission in progress: the marker stays hidden until the job JSON
+            # is written, and counts as one (requeue() hides it the same way).
+            hidden = job_queue.marker_path("queued", ".manim-submitted")
+            hidden.touch()
+            write_unmarked("manim-submitted")
+            assert not job_queue.adopt_job("manim-submitted")
+            job_queue.wait_for_work(Overflowed())
+            assert take() is None
+            hidden.rename(job_queue.marker_path("queued", "manim-submitted"))
+            assert take() == "manim-submitted"
+        finally:
+            w.close()
+            job_queue._watched = False
+            job_queue.ADOPT_INTERVAL = interval
+
+
+def race(start, results):
+    """One worker process: claim jobs as fast as it can once everyone is ready."""
+    start.wait()
+    claimed = []
+    while True:
+        _, job = job_queue.pick_job()
+        if job is None:
+            break
+        claimed.append(job["jobId"])
+    results.put(claimed)
+
+
+def test_concurrent_claims_are_exclusive():
+    ctx = mp.get_context("fork")  # the workers inherit the scratch directory
+    with tempfile.TemporaryDirectory() as tmp:
+        use_dir(tmp)
+        job_ids = [f"manim-{i}" for i in range(200)]
+        for i, job_id in enumerate(job_ids):
+            submit(job_id, user=f"u{i % 7}")
+        start, results = ctx.Event(), ctx.Queue()
+        workers = [ctx.Process(target=race, args=(start, results)) for _ in range(8)]
+        for p in workers:
+            p.start()
+        start.set()
+        claimed = [results.get(timeout=60) for _ in workers]
+        for p in workers:
+            p.join()
+
+        everything = [job_id for ids in claimed for job_id in ids]
+        assert sorted(everything) == sorted(job_ids), "a job was claimed twice or not at all"
+        assert sum(1 for ids in claimed if ids) > 1, "only one worker got to claim"
+        assert not any(job_queue.QUEUE_DIR.joinpath("queued").iterdir())
+        for job_id in job_ids:
+            assert job_queue.read_job(job_queue.job_path(job_id))["attempts"] == 1
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            print(f"{name} ...", flush=True)
+            fn()
+    print("All scheduler tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Tests for the job intake and status service.
+
+Runs job_service.py in-process against a scratch job directory and checks
+that submissions are written in the generate route's format (so a worker
+picks them up), that status is served from memory, and that long polls and
+server-sent events see a worker's status writes, with inotify and with the
+polling fallback.
+
+Usage:
+  python3 scripts/tests/manim_service_test.py
+(or collect it with pytest)
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import http.client
+from pathlib import Path
+
+WORKER_DIR = Path(__file__).resolve().parents[1] / "manim_worker"
+sys.path.insert(0, str(WORKER_DIR))
+
+import job_queue  # noqa: E402
+import job_service  # noqa: E402
+
+
+def start(tmp, inotify=True):
+    job_queue.JOB_DIR = Path(tmp) / "jobs"
+    job_queue.QUEUE_DIR = job_queue.JOB_DIR / "queue"
+    job_queue.ensure_dirs()
+    job_queue._last_adopt = 0.0
+    job_queue._schedule.clear()
+    if inotify:
+        os.environ.pop("MANIM_DISABLE_INOTIFY", None)
+    else:
+        os.environ["MANIM_DISABLE_INOTIFY"] = "1"
+    try:
+        return job_service.start_in_background("127.0.0.1", 0)
+    finally:
+        os.environ.pop("MANIM_DISABLE_INOTIFY", None)
+
+
+def request(conn, method, path, body=None):
+    conn.request(method, path, body=json.dumps(body) if body is not None else None)
+    res = conn.getresponse()
+    return res.status, json.loads(res.read())
+
+
+def worker_writes(job_id, *updates, delay=0.3):
+    """Update a job's JSON (and so its status record) from another thread, as a worker would."""
+    def run():
+        for update in updates:
+            time.sleep(delay)
+            p = job_queue.job_path(job_id)
+            job = job_queue.read_job(p)
+            job.update(update)
+            job_queue.write_job(p, job)
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+
+def test_submit_and_status():
+    with tempfile.TemporaryDirectory() as tmp:
+        service = start(tmp)
+        conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=10)
+        status, body = request(conn, "POST", "/jobs", {"sceneParams": {"sceneType": "text", "title": "Hi"}, "priority": "high"})
+        assert status == 202 and body["status"] == "queued"
+        job_id = body["jobId"]
+
+        # Same connection (keep-alive) for the batch and the lookups.
+        status, body = request(conn, "POST", "/jobs/batch", {"jobs": [
+            {"sceneParams": {"sceneType": "list"}, "userKey": "u1", "priority": "low"},
+            {"sceneParams": {"sceneType": "dfa"}, "quality": "medium"},
+        ]})
+        assert status == 202 and len(body["jobs"]) == 2
+        # A batch with one bad job queues nothing.
+        status, _ = request(conn, "POST", "/jobs/batch", {"jobs": [{"sceneParams": {"sceneType": "text"}}, {}]})
+        assert status == 400
+        assert len(list((job_queue.QUEUE_DIR / "queued").iterdir())) == 3
+
+        job = job_queue.read_job(job_queue.job_path(job_id))
+        assert job["priority"] == "normal"  # high needs the priority key
+        info = json.loads(job_queue.marker_path("queued", job_id).read_text())
+        assert info == {"user": job["userKey"], "priority": "normal", "createdAt": job["createdAt"]}
+        assert job_queue.status_path(job_queue.job_path(job_id)).exists()
+
+        status, record = request(conn, "GET", f"/jobs/{job_id}")
+        assert status == 200 and record == {"jobId": job_id, "status": "queued", "createdAt": job["createdAt"]}
+        status, body = request(conn, "GET", f"/jobs?ids={job_id},manim-missing")
+        assert body["jobs"] == {job_id: record, "manim-missing": None}
+        assert request(conn, "GET", "/jobs/manim-missing")[0] == 404
+
+        # A worker claims it like any other job.
+        p, claimed = job_queue.pick_job()
+        assert claimed is not None and claimed["sceneParams"]["sceneType"] in ("text", "dfa")
+
+
+def test_bad_requests_get_a_response():
+    with tempfile.TemporaryDirectory() as tmp:
+        service = start(tmp)
+        conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=10)
+        conn.putrequest("POST", "/jobs")
+        conn.putheader("Content-Length", "ten")
+        conn.endheaders()
+        res = conn.getresponse()
+        assert res.status == 400 and json.loads(res.read())["error"] == "Invalid Content-Length"
+
+        # A failure writing the job is answered with a 500, not a dropped connection.
+        write_job = job_queue.write_job
+
+        def full_disk(p, job):
+            raise OSError(28, "No space left on device")
+
+        job_queue.write_job = full_disk
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=10)
+            status, body = request(conn, "POST", "/jobs", {"sceneParams": {"sceneType": "text"}})
+            assert status == 500 and body == {"error": "Internal error"}
+        finally:
+            job_queue.write_job = write_job
+        conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=10)
+        assert request(conn, "POST", "/jobs", {"sceneParams": {"sceneType": "text"}})[0] == 202
+
+
+def check_long_poll(inotify):
+    with tempfile.TemporaryDirectory() as tmp:
+        service = start(tmp, inotify)
+        conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=10)
+        _, body = request(conn, "POST", "/jobs", {"sceneParams": {"sceneType": "text"}})
+        job_id = body["jobId"]
+
+        writer = worker_writes(job_id, {"status": "processing"}, {"status": "completed", "resultUrl": "/v.mp4"})
+        _, first = request(conn, "GET", f"/jobs/{job_id}/wait?timeout=10")
+        # Polling may only see the last of two quick writes.
+        assert first["job"]["status"] in ("processing", "completed")
+        second = first
+        if first["job"]["status"] == "processing":
+            _, second = request(conn, "GET", f"/jobs/{job_id}/wait?rev={first['rev']}&timeout=10")
+            assert second["rev"] > first["rev"]
+        assert second["job"]["status"] == "completed" and second["job"]["resultUrl"] == "/v.mp4"
+        writer.join()
+
+        # A finished job answers at once.
+        start_time = time.time()
+        _, again = request(conn, "GET", f"/jobs/{job_id}/wait?timeout=10")
+        assert again == second and time.time() - start_time < 1
+        # Unchanged jobs time out with the current record.
+        _, body = request(conn, "POST", "/jobs", {"sceneParams": {"sceneType": "text"}})
+        _, idle = request(conn, "GET", f"/jobs/{body['jobId']}/wait?timeout=0.2")
+        assert idle["job"]["status"] == "queued"
+
+
+def test_long_poll_inotify():
+    check_long_poll(inotify=True)
+
+
+def test_long_poll_polling():
+    check_long_poll(inotify=False)
+
+
+def test_event_stream():
+    with tempfile.TemporaryDirectory() as tmp:
+        service = start(tmp)
+        conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=10)
+        _, body = request(conn, "POST", "/jobs", {"sceneParams": {"sceneType": "text"}})
+        job_id = body["jobId"]
+
+        writer = worker_writes(
+            job_id,
+            {"status": "processing"},
+            {"progress": {"stage": "render", "animation": 1, "of": 2}},
+            {"status": "completed", "resultUrl": "/v.mp4"},
+            delay=0.3,
+        )
+        conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=10)
+        conn.request("GET", f"/jobs/{job_id}/events")
+        res = conn.getresponse()
+        assert res.getheader("Content-Type") == "text/event-stream"
+        # The stream ends after the completed event.
+        events = [block for block in res.read().decode().split("\n\n") if block.startswith("id:")]
+        writer.join()
+        records = [json.loads(e.split("data: ", 1)[1]) for e in events]
+        ids = [int(e.split("\n")[0][len("id: "):]) for e in events]
+        assert records[0]["status"] == "queued" and records[-1]["status"] == "completed"
+        assert ids == sorted(ids)
+
+        # Resuming from the last event id sends nothing: no record is newer.
+        conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=10)
+        conn.request("GET", f"/jobs/{job_id}/events", headers={"Last-Event-ID": str(ids[-1])})
+        assert "event: status" not in conn.getresponse().read().decode()
+
+
+def main():
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            print(f"{name} ...", flush=True)
+            fn()
+    print("All job service tests passed")
+
+
+if __name__ == "__main__":
+    main()